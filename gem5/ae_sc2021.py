@@ -1,5 +1,5 @@
 import os
-import subprocess
+import gem5_stats
 # import pdb; pdb.set_trace()
 # first compile then run
 binary = 'build/Garnet_standalone/gem5.opt'
@@ -49,7 +49,7 @@ for c in range(len(num_cores)):
 			output_dir= ("{0:s}/{1:d}/{3:s}/{2:s}/freq-{6:d}/vc-{4:d}/inj-{5:1.2f}".format(out_dir, num_cores[c],  bench_caps[b], routing_algorithm[rout_], vc_, injection_rate, spin_freq))
 			print ("output_dir: %s" %(output_dir))
 
-			packet_latency = subprocess.check_output("grep -nri average_flit_latency  {0:s}  | sed 's/.*system.ruby.network.average_flit_latency\s*//'".format(output_dir), shell=True)
+			packet_latency = gem5_stats.value(os.path.join(output_dir, "stats.txt"), "system.ruby.network.average_flit_latency")
 			# print packet_latency
 			pkt_lat = float(packet_latency)
 
@@ -67,7 +67,7 @@ for c in range(len(num_cores)):
 			output_dir= ("{0:s}/{1:d}/{3:s}/{2:s}/freq-{6:d}/vc-{4:d}/inj-{5:1.2f}".format(out_dir, num_cores[c],  bench_caps[b], routing_algorithm[rout_], vc_, injection_rate, spin_freq))
 
 			if(os.path.exists(output_dir)):
-				packet_latency = subprocess.check_output("grep -nri average_flit_latency  {0:s}  | sed 's/.*system.ruby.network.average_flit_latency\s*//'".format(output_dir), shell=True)
+				packet_latency = gem5_stats.value(os.path.join(output_dir, "stats.txt"), "system.ruby.network.average_flit_latency")
 				pkt_lat = float(packet_latency)
 				print ("injection_rate={1:1.2f} \t Packet Latency: {0:f} ".format(pkt_lat, injection_rate))
 				injection_rate+=0.02
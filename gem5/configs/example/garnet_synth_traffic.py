@@ -84,6 +84,41 @@ parser.add_option("--inj-vnet", type="int", default=-1,
 parser.add_option("--sim-type", type="int", default=1,
                   help="to run the garnet simulation in default mode\
                   or run it in warm-up -- cool-down mode.")
+parser.add_option("--saturation-latency", type="float", default=0,
+                  help="Exit as soon as the running average flit latency\
+                        exceeds this many cycles. The cycle is recorded as\
+                        saturated_at_cycle in stats. Set to 0 to disable.")
+parser.add_option("--saturation-backlog", type="float", default=0,
+                  help="Exit as soon as the average number of messages\
+                        queued per network interface exceeds this.\
+                        Set to 0 to disable.")
+parser.add_option("--fork-injectionrates", type="string", default="",
+                  help="Comma-separated injection rates. Warm the network up\
+                        once at --injectionrate, then fork one child per rate\
+                        into <outdir>/inj-<rate>, each simulating a further\
+                        --sim-cycles.")
+parser.add_option("--fork-warmup-cycles", type="int", default=10000,
+                  help="Number of warm-up cycles to simulate before forking.")
+parser.add_option("--fork-jobs", type="int", default=1,
+                  help="Number of forked children to run at once.")
+parser.add_option("--lean-output", action="store_true", default=False,
+                  help="Don't write config.ini, config.json or the config\
+                        dot graph. For sweeps, which regenerate them only\
+                        when needed.")
+parser.add_option("--config-only", action="store_true", default=False,
+                  help="Write the config files and exit without\
+                        simulating.")
+parser.add_option("--random-seed", type="int", default=None,
+                  help="Seed the simulator's random number generator, so\
+                        that replicate runs of one configuration differ.")
+parser.add_option("--inj-schedule", type="string", default="",
+                  help="Comma-separated rate:warmup:measure phases, e.g.\
+                        0.02:1000:10000,0.04:1000:10000. Each phase warms up\
+                        at its rate with stats reset, then measures, and its\
+                        stats are dumped as a separate block. With\
+                        --saturation-latency or --saturation-backlog set,\
+                        stops after the first phase in which the network\
+                        saturates; otherwise every phase is run.")
 
 #
 # Add the ruby specific and protocol specific options
@@ -105,14 +140,44 @@ if options.inj_vnet > 2:
           "or 2 (5-flit) or -1 (random)" % (options.inj_vnet))
     sys.exit(1)
 
+if options.random_seed is not None:
+    m5.core.seedRandom(options.random_seed)
+
+fork_rates = [float(rate) for rate in options.fork_injectionrates.split(",")
+              if rate.strip()]
+warmup_cycles = options.fork_warmup_cycles if fork_rates else 0
+
+schedule = []
+for phase in options.inj_schedule.split(","):
+    if not phase.strip():
+        continue
+    try:
+        rate, warmup, measure = phase.split(":")
+        schedule.append((float(rate), int(warmup), int(measure)))
+    except ValueError:
+        print("Error: injection schedule phase '%s' should be "
+              "rate:warmup:measure" % phase)
+        sys.exit(1)
+
+if schedule and fork_rates:
+    print("Error: --inj-schedule and --fork-injectionrates can't be combined")
+    sys.exit(1)
+
+if schedule:
+    sim_cycles = sum(warmup + measure for _, warmup, measure in schedule)
+else:
+    sim_cycles = warmup_cycles + options.sim_cycles
 
 cpus = [ GarnetSyntheticTraffic(
                      num_packets_max=options.num_packets_max,
                      single_sender=options.single_sender_id,
                      single_dest=options.single_dest_id,
-                     sim_cycles=options.sim_cycles,
+                     sim_cycles=sim_cycles,
                      traffic_type=options.synthetic,
                      inj_rate=options.injectionrate,
+                     inj_schedule_rates=[rate for rate, _, _ in schedule],
+                     inj_schedule_cycles=[warmup + measure
+                                          for _, warmup, measure in schedule],
                      inj_vnet=options.inj_vnet,
                      precision=options.precision,
                      num_dest=options.num_dirs) \
@@ -130,6 +195,9 @@ system.clk_domain = SrcClockDomain(clock = options.sys_clock,
 
 Ruby.create_system(options, False, system)
 
+system.ruby.network.saturation_latency = options.saturation_latency
+system.ruby.network.saturation_backlog = options.saturation_backlog
+
 # Create a seperate clock domain for Ruby
 system.ruby.clk_domain = SrcClockDomain(clock = options.ruby_clock,
                                         voltage_domain = system.voltage_domain)
@@ -152,10 +220,82 @@ root.system.mem_mode = 'timing'
 # Not much point in this being higher than the L1 latency
 m5.ticks.setGlobalFrequency('1ns')
 
-# instantiate configuration
-m5.instantiate()
+# Forking is not allowed with listeners enabled
+if fork_rates:
+    m5.disableAllListeners()
 
-# simulate until program terminates
-exit_event = m5.simulate(options.abs_max_tick)
+if options.lean_output:
+    m5.options.dump_config = None
+    m5.options.json_config = None
+    m5.options.dot_config = None
 
-print('Exiting @ tick', m5.curTick(), 'because', exit_event.getCause())
+# instantiate configuration
+if options.config_only:
+    m5.instantiate()
+    print('Wrote the config files to', m5.options.outdir)
+    sys.exit(0)
+else:
+    m5.instantiate()
+
+def cycles_to_ticks(cycles):
+    # Warm-up and phase lengths count cycles of the testers' clock, while
+    # simulate() takes ticks
+    return cycles * system.clk_domain.clock[0].getValue()
+
+if schedule:
+    # The testers switch rates at phase boundaries by themselves, so only
+    # stats need to be managed here. Every phase gets its own stats block,
+    # and the last one is dumped on exit like any other run.
+    for i, (rate, warmup, measure) in enumerate(schedule):
+        if i > 0:
+            m5.stats.dump()
+        m5.stats.reset()
+
+        exit_event = m5.simulate(cycles_to_ticks(warmup))
+        if exit_event.getCause() == "simulate() limit reached":
+            m5.stats.reset()
+            exit_event = m5.simulate(cycles_to_ticks(measure))
+
+        print('Phase', i, 'at injection rate', rate, 'exiting @ tick',
+              m5.curTick(), 'because', exit_event.getCause())
+
+        # Higher rates won't do any better once the network saturates
+        if exit_event.getCause() != "simulate() limit reached":
+            break
+elif not fork_rates:
+    # simulate until program terminates
+    exit_event = m5.simulate(options.abs_max_tick)
+
+    print('Exiting @ tick', m5.curTick(), 'because', exit_event.getCause())
+else:
+    # Warm up once, then fork a child per injection rate from the warm
+    # network. Each child simulates its own rate, into its own outdir.
+    exit_event = m5.simulate(cycles_to_ticks(warmup_cycles))
+    print('Warmed up @ tick', m5.curTick(), 'because', exit_event.getCause())
+
+    children = []
+    for rate in fork_rates:
+        if len(children) >= options.fork_jobs:
+            os.waitpid(children.pop(0), 0)
+
+        pid = m5.fork("%%(parent)s/inj-%1.5f" % rate)
+        if pid == 0:
+            for cpu in cpus:
+                cpu.setInjRate(rate)
+            # The warm-up may already have saturated the network, which
+            # stops the checks; every rate is checked from scratch
+            system.ruby.network.resetSaturation()
+            m5.stats.reset()
+
+            exit_event = m5.simulate(options.abs_max_tick)
+            print('Exiting @ tick', m5.curTick(), 'because',
+                  exit_event.getCause())
+
+            # Only the parent keeps forking.
+            children = []
+            break
+
+        children.append(pid)
+
+    for pid in children:
+        os.waitpid(pid, 0)
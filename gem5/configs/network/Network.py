@@ -44,7 +44,8 @@ def define_options(parser):
     parser.add_option("--network-trace-enable", action="store_true", default=False,
                        help="enable trace simulation")
     parser.add_option("--network-trace-file", type="string", default=" ",
-                       help="name of trace file")
+                       help="name of binary trace file, see \
+                       util/encode_network_trace.py")
     parser.add_option("--network-trace-max-packets", type="int", default=-1,
                       help="maximum packets in trace to inject")
     parser.add_option("--router-latency", action="store", type="int",
@@ -120,6 +121,20 @@ def define_options(parser):
                       by getting spun by the spin-ring.""")
     parser.add_option("--ni-inj", type="string", default="fcfs",
                       help="'rr'|'fcfs'")
+    parser.add_option("--idle-router-skipping", type="int", default=1,
+                      help="1: routers with no flits or credits to process \
+                      only run the DRAIN checks when woken up. 0: always \
+                      run the whole router pipeline. Results are the same.")
+    parser.add_option("--garnet-threads", type="int", default=0,
+                      help="0 or 1: run garnet routers one event at a \
+                      time. N > 1: evaluate routers that wake up back to \
+                      back in a cycle across N threads. Results are the \
+                      same. Cycles around a drain, adaptive routing and \
+                      tracing run on one thread.")
+    parser.add_option("--dump-routing-tables", type="string", default="",
+                      help="file in the output directory to dump the \
+                      minimum-weight outports of every router, per \
+                      destination NI, to.")
     parser.add_option("--inj-single-vnet", action="store",
                       type="int", default=0,\
                       help="when set it will inject all packets ejected from \
@@ -135,6 +150,16 @@ def define_options(parser):
                       help="once in idle, draino will wait this many cycles before continuing.")
     parser.add_option("--draino-latency-threshold", type="float", default=1.0,
                       help="draino will not react to a change in latency less than this magnitude.")
+    parser.add_option("--draino-policy", type="choice", default="hill_climb",
+                      choices=["hill_climb", "golden_section", "miad"],
+                      help="how draino picks the next frequency.")
+    parser.add_option("--draino-estimator", type="choice", default="cumulative",
+                      choices=["cumulative", "window", "ewma"],
+                      help="latency signal draino reacts to.")
+    parser.add_option("--draino-window", type="int", default=8,
+                      help="number of epochs in the 'window' latency estimator.")
+    parser.add_option("--draino-ewma-alpha", type="float", default=0.25,
+                      help="weight of the latest epoch in the 'ewma' latency estimator.")
 
 def create_network(options, ruby):
 
@@ -177,6 +202,9 @@ def init_network(options, network, InterfaceClass):
         network.ni_inj = options.ni_inj
         network.inj_single_vnet = options.inj_single_vnet
         network.spin_file = options.spin_file
+        network.routing_table_dump = options.dump_routing_tables
+        network.idle_router_skipping = options.idle_router_skipping
+        network.garnet_threads = options.garnet_threads
 
     if options.network == "simple":
         network.setup_buffers()
@@ -235,3 +263,9 @@ def init_network(options, network, InterfaceClass):
       network.draino_idle_cycles = options.draino_idle_cycles
       print "setting draino-latency-threshold: ", options.draino_latency_threshold
       network.draino_latency_threshold = options.draino_latency_threshold
+      print "setting draino-policy: ", options.draino_policy
+      network.draino_policy = options.draino_policy
+      print "setting draino-estimator: ", options.draino_estimator
+      network.draino_estimator = options.draino_estimator
+      network.draino_window = options.draino_window
+      network.draino_ewma_alpha = options.draino_ewma_alpha
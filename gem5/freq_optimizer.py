@@ -0,0 +1,232 @@
+"""
+Tunes the DRAIN frequency (--spin-freq) of each experiment, without sweeping every frequency.
+
+For a given number of cores, benchmark and injection rate, latency is treated as a noisy, unimodal function of log2(spin_freq).
+A golden-section search narrows the frequency range down, on a grid of FREQ_RESOLUTION in log2.
+Each step keeps the interior point it already measured, so only one new frequency is simulated per step.
+Once the range is a few points wide, any of them within CLOSE_LATENCY of the best are replicated along with it, with different random seeds,
+and the lowest mean latency wins.
+
+All tunings advance together, one round at a time.
+Every round's probes are run through run_script's scheduler and result cache, so they share one worker pool, and no point is ever simulated twice.
+
+Usage:
+  python freq_optimizer.py
+"""
+
+import copy
+import json
+import math
+import multiprocessing
+import os
+import time
+
+from result_cache import ResultCache
+from run_script import (CACHE, CACHE_SIZE, OUTPUT, RESULTS, Experiment, LinearSearch, Scheduler, SimulationConfiguration, log,
+	network_configurations, software_configurations)
+
+JSON = os.path.join(OUTPUT, "best-freq.json")
+
+# The frequency range to search, matching the brute-force sweep in data/exponential-freq-sweep.csv.
+MIN_FREQ = 256
+MAX_FREQ = 131072
+# Spacing of candidate frequencies, in log2.
+FREQ_RESOLUTION = 1.0
+# Number of seeds that each of the final candidates is simulated with.
+REPLICATES = 3
+# Final points whose latency is within this fraction of the best one are too close to call from a single seed,
+# given seed-to-seed latency noise of a couple of percent.
+CLOSE_LATENCY = 0.02
+
+# 1 / golden ratio.
+GOLDEN_SECTION = (math.sqrt(5) - 1) / 2
+
+injection_rates = [0.14]
+
+class PointSearch(LinearSearch):
+	"""
+	Measures a single injection rate, and nothing else.
+	"""
+	def __init__(self, simulation_config, step):
+		LinearSearch.__init__(self, simulation_config)
+		self.step = step
+
+	def candidates(self):
+		return [self.step]
+
+	def useless(self):
+		return set()
+
+class SeededExperiment(Experiment):
+	"""
+	An experiment at a single injection rate, simulated with a given random seed.
+	Replicates differ only in their seed, so each gets its own output directory and cache entry.
+	"""
+	def __init__(self, network_config, software_config, simulation_config, injection_rate, seed):
+		Experiment.__init__(self, network_config, software_config, simulation_config)
+		self.seed = seed
+		self.search = PointSearch(simulation_config, int(round(injection_rate / simulation_config.injection_rate_delta)))
+
+	def get_flags(self, injection_rate):
+		return Experiment.get_flags(self, injection_rate) + ["--random-seed=%d" % self.seed]
+
+	def get_output_dir(self, injection_rate):
+		return os.path.join(Experiment.get_output_dir(self, injection_rate), "seed-%d" % self.seed)
+
+	def name(self):
+		return "%s_freq-%d_seed-%d" % (Experiment.name(self), self.network_config.spin_freq, self.seed)
+
+class FrequencyTuning:
+	"""
+	The search for the best frequency of one (network, software, injection rate).
+
+	Candidate frequencies are indexed along the log2 grid.
+	Nothing is kept besides the measured latencies, and the state of the search is replayed from them each round.
+	The search itself only looks at seed 0, so that replicates cannot change its path.
+	"""
+	def __init__(self, network_config, software_config, injection_rate):
+		self.network_config = network_config
+		self.software_config = software_config
+		self.injection_rate = injection_rate
+
+		num_frequencies = int(math.floor(math.log(float(MAX_FREQ) / MIN_FREQ, 2) / FREQ_RESOLUTION)) + 1
+		self.frequencies = [int(round(MIN_FREQ * 2 ** (i * FREQ_RESOLUTION))) for i in range(num_frequencies)]
+
+		# Maps each frequency index to {seed: latency}.
+		self.latencies = {}
+
+	def latency(self, index):
+		samples = list(self.latencies[index].values())
+		return sum(samples) / len(samples)
+
+	def measured(self, index):
+		return 0 in self.latencies.get(index, {})
+
+	def section(self, lo, hi, inner):
+		"""
+		Returns the two interior points of [lo, hi], one of which is inner if it is not None.
+		The other mirrors it, so that the interval keeps its golden ratio as it shrinks.
+		"""
+		if inner is None:
+			inner = lo + int(round((hi - lo) * (1 - GOLDEN_SECTION)))
+		other = lo + hi - inner
+		if other == inner:
+			other = inner + 1
+		return min(inner, other), max(inner, other)
+
+	def bracket(self):
+		"""
+		Returns (lo, hi, missing): the current range of indices, and the probes needed to narrow it further, or to cover it once it is narrow.
+		"""
+		lo, hi = 0, len(self.frequencies) - 1
+		inner = None
+		while hi - lo > 2:
+			lower, upper = self.section(lo, hi, inner)
+			missing = [index for index in (lower, upper) if not self.measured(index)]
+			if missing:
+				return lo, hi, missing
+
+			if self.latencies[lower][0] < self.latencies[upper][0]:
+				hi, inner = upper, lower
+			else:
+				lo, inner = lower, upper
+		return lo, hi, [index for index in range(lo, hi + 1) if not self.measured(index)]
+
+	def candidates(self):
+		"""
+		Returns the indices of the final range that are close enough to its best one to need replicating.
+		"""
+		lo, hi, _ = self.bracket()
+		first = dict((index, self.latencies[index][0]) for index in range(lo, hi + 1))
+		best = min(first.values())
+		if math.isinf(best):
+			return []
+		close = [index for index in first if first[index] <= best * (1 + CLOSE_LATENCY)]
+		return close if len(close) > 1 else []
+
+	def probes(self):
+		"""
+		Returns the (index, seed) pairs to simulate next.
+		"""
+		_, _, missing = self.bracket()
+		if missing:
+			return [(index, 0) for index in missing]
+
+		return [(index, seed) for index in self.candidates() for seed in range(REPLICATES)
+			if seed not in self.latencies[index]]
+
+	def record(self, index, seed, latency):
+		self.latencies.setdefault(index, {})[seed] = latency
+
+	def best(self):
+		lo, hi, _ = self.bracket()
+		return min(range(lo, hi + 1), key=self.latency)
+
+	def make_experiment(self, simulation_config, index, seed):
+		network_config = copy.copy(self.network_config)
+		network_config.spin_freq = self.frequencies[index]
+		return SeededExperiment(network_config, self.software_config, simulation_config, self.injection_rate, seed)
+
+	def toDict(self):
+		best = self.best()
+		return {
+			"cores": self.network_config.num_cores,
+			"benchmark": self.software_config.benchmark.upper(),
+			"injection_rate": self.injection_rate,
+			"best_freq": self.frequencies[best],
+			"best_latency": self.latency(best),
+			"simulations": sum(len(samples) for samples in self.latencies.values()),
+			"latencies": dict((self.frequencies[index], self.latency(index)) for index in sorted(self.latencies)),
+		}
+
+def main():
+	for path in [OUTPUT, RESULTS]:
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	# Saturated runs stop early, and their latency is past max_packet_latency, so they simply compare as bad frequencies.
+	simulation_config = SimulationConfiguration(output_dir=RESULTS, max_packet_latency=200.0, injection_rate_delta=0.001, max_speculation=1)
+
+	tunings = []
+	for network_config in network_configurations:
+		for software_config in software_configurations:
+			for injection_rate in injection_rates:
+				tunings.append(FrequencyTuning(network_config, software_config, injection_rate))
+
+	log("Starting frequency tuning.")
+	start_time = time.time()
+
+	cache = ResultCache(CACHE)
+	round_num = 0
+	while True:
+		probes = []
+		for tuning in tunings:
+			for index, seed in tuning.probes():
+				probes.append((tuning, index, seed, tuning.make_experiment(simulation_config, index, seed)))
+		if not probes:
+			break
+
+		round_num += 1
+		log("Frequency tuning round %d: %d probes." % (round_num, len(probes)))
+
+		scheduler = Scheduler([experiment for _, _, _, experiment in probes], num_workers=multiprocessing.cpu_count(), cache=cache)
+		results = scheduler.run()
+
+		for (tuning, index, seed, experiment), measurements in zip(probes, results):
+			if not measurements:
+				# A failed probe would be retried forever, so count it as infinitely slow.
+				experiment.log("failed, treating latency as infinite")
+				tuning.record(index, seed, float("inf"))
+			else:
+				tuning.record(index, seed, measurements[0].packet_latency)
+
+	cache.prune(CACHE_SIZE)
+	log("Done frequency tuning after %s seconds." % (time.time() - start_time))
+
+	output = json.dumps([tuning.toDict() for tuning in tunings], indent=2)
+	log(output)
+	with open(JSON, "w") as f:
+		f.write(output)
+
+if __name__ == "__main__":
+	main()
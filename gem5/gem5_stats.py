@@ -0,0 +1,384 @@
+"""
+In-process reader for gem5 stats.txt files.
+
+Stats are stream-parsed into typed objects:
+  Scalar        a single value.
+  Vector        named (or indexed) entries, plus their total.
+  Distribution  summary values (samples, mean, stdev, ...) plus buckets.
+
+A stats.txt file holds one block per stats dump, and every query picks one of them (by default, the last).
+A regex selection skips everything else without parsing it, and a limit stops reading as soon as enough stats were found.
+The last block is found by reading the file backwards, so that a query for it does not read the blocks before it.
+
+For repeated queries, an index can be written next to the file (stats.txt.idx).
+It records where every stat lives, so later queries seek straight to the lines they need.
+The index is rebuilt whenever the stats file changes.
+
+Usage:
+  import gem5_stats
+  latency = gem5_stats.value("result/stats.txt", "system.ruby.network.average_flit_latency")
+  stats = gem5_stats.load("result/stats.txt", select=r"^system\.ruby\.network\.")
+"""
+
+import json
+import os
+import re
+from collections import OrderedDict
+
+BEGIN_BLOCK = "---------- Begin Simulation Statistics ----------"
+END_BLOCK = "---------- End Simulation Statistics"
+
+SEPARATOR = "::"
+INDEX_SUFFIX = ".idx"
+
+BUCKET = re.compile(r"^(-?\d+)(?:-(-?\d+))?$")
+
+class Scalar:
+	def __init__(self, name, value):
+		self.name = name
+		self.value = value
+
+	def flatten(self):
+		return {self.name: self.value}
+
+	def __repr__(self):
+		return "Scalar(%s=%s)" % (self.name, self.value)
+
+class Vector:
+	"""
+	Entries are keyed on subname, or index as a string if the stat has no subnames.
+	"""
+	def __init__(self, name, values, total=None):
+		self.name = name
+		self.values = values
+		self.total = sum(values.values()) if total is None else total
+
+	def __getitem__(self, key):
+		return self.values[str(key)]
+
+	def flatten(self):
+		flat = dict((self.name + SEPARATOR + key, value) for key, value in self.values.items())
+		flat[self.name + SEPARATOR + "total"] = self.total
+		return flat
+
+	def __repr__(self):
+		return "Vector(%s, %d entries, total=%s)" % (self.name, len(self.values), self.total)
+
+class Distribution:
+	"""
+	Summary values are kept in a dictionary, e.g. summary["mean"].
+	Buckets are a list of (low, high, count), in order.
+	"""
+	def __init__(self, name, summary, buckets):
+		self.name = name
+		self.summary = summary
+		self.buckets = buckets
+
+	def __getattr__(self, key):
+		try:
+			return self.__dict__["summary"][key]
+		except KeyError:
+			raise AttributeError(key)
+
+	def flatten(self):
+		flat = dict((self.name + SEPARATOR + key, value) for key, value in self.summary.items())
+		for low, high, count in self.buckets:
+			bucket = "%d" % low if low == high else "%d-%d" % (low, high)
+			flat[self.name + SEPARATOR + bucket] = count
+		return flat
+
+	def __repr__(self):
+		return "Distribution(%s, %d buckets, samples=%s)" % (self.name, len(self.buckets), self.summary.get("samples"))
+
+def parse_value(text):
+	try:
+		return float(text)
+	except ValueError:
+		return float("nan")
+
+def parse_line(line):
+	"""
+	Split a stats line into (base name, subname or None, values).
+	Oneline vectors and distributions yield a list of values, and no subname.
+	"""
+	line = line.split("#", 1)[0]
+
+	if "|" in line:
+		segments = line.split("|")
+		values = [parse_value(segment.split()[0]) for segment in segments[1:] if segment.strip()]
+		return segments[0].strip(), None, values
+
+	fields = line.split()
+	base, separator, key = fields[0].partition(SEPARATOR)
+	return base, key if separator else None, parse_value(fields[1])
+
+def build(base, entries):
+	"""
+	Turn all parsed lines of one stat into its typed object.
+	"""
+	keys = OrderedDict()
+	oneline = None
+	scalar = None
+	for key, values in entries:
+		if isinstance(values, list):
+			oneline = values
+		elif key is None:
+			scalar = values
+		else:
+			keys[key] = values
+
+	if "samples" in keys:
+		buckets = []
+		summary = OrderedDict()
+		for key, value in keys.items():
+			match = BUCKET.match(key)
+			if match:
+				low = int(match.group(1))
+				high = int(match.group(2)) if match.group(2) is not None else low
+				buckets.append((low, high, value))
+			else:
+				summary[key] = value
+
+		if oneline is not None:
+			size = int(summary.get("bucket_size", 1))
+			low = int(summary.get("min_bucket", 0))
+			for count in oneline:
+				buckets.append((low, low + size - 1, count))
+				low += size
+
+		return Distribution(base, summary, buckets)
+
+	if oneline is not None:
+		return Vector(base, OrderedDict((str(i), value) for i, value in enumerate(oneline)), keys.get("total"))
+
+	if keys:
+		total = keys.pop("total", None)
+		return Vector(base, keys, total)
+
+	return Scalar(base, scalar)
+
+def build_all(lines):
+	"""
+	Group (base, key, values) lines by base name, in order, and build each stat.
+	"""
+	grouped = OrderedDict()
+	for base, key, values in lines:
+		grouped.setdefault(base, []).append((key, values))
+	return OrderedDict((base, build(base, entries)) for base, entries in grouped.items())
+
+def scan(f, select=None, block=-1, limit=None, on_line=None):
+	"""
+	Stream through a stats file, and return the lines of the requested block.
+	Lines are parsed only if their base name matches select.
+	Reading stops as soon as limit stats of the requested block have been found, or the block has ended.
+	on_line, if given, is called for every stat line, as on_line(block index, base name, offset).
+	"""
+	block_index = -1
+	in_block = False
+	lines = []
+	bases = set()
+
+	offset = f.tell()
+	for line in iter(f.readline, ""):
+		line_offset = offset
+		offset += len(line)
+
+		if line.startswith(BEGIN_BLOCK):
+			block_index += 1
+			in_block = True
+			# Only the last block is kept, unless a specific one is requested.
+			if block < 0:
+				lines = []
+				bases = set()
+			continue
+
+		if line.startswith(END_BLOCK):
+			in_block = False
+			if block_index == block:
+				break
+			continue
+
+		if not in_block or not line.strip():
+			continue
+
+		wanted = block < 0 or block_index == block
+		if not wanted and on_line is None:
+			continue
+
+		base = line.split(None, 1)[0].split("|", 1)[0].partition(SEPARATOR)[0]
+		if on_line is not None:
+			on_line(block_index, base, line_offset)
+
+		if not wanted or (select is not None and not select.search(base)):
+			continue
+
+		if limit is not None and base not in bases and len(bases) >= limit:
+			if block >= 0 and on_line is None:
+				break
+			continue
+
+		bases.add(base)
+		lines.append(parse_line(line))
+
+	if block >= 0 and block_index < block:
+		raise IndexError("%s has no stats block %d" % (getattr(f, "name", "stats file"), block))
+
+	return lines
+
+def last_block_offset(path, chunk_size=1 << 16):
+	"""
+	Returns the offset of the last block's begin line, found by reading the file backwards from its end, or None if it has no blocks.
+	"""
+	marker = BEGIN_BLOCK.encode("ascii")
+	with open(path, "rb") as f:
+		f.seek(0, os.SEEK_END)
+		end = f.tell()
+		carry = b""
+		while end > 0:
+			start = max(0, end - chunk_size)
+			f.seek(start)
+			# Keep the head of the chunk after this one, in case the marker straddles them.
+			data = f.read(end - start) + carry
+			pos = data.rfind(marker)
+			if pos >= 0:
+				return start + pos
+			carry = data[:len(marker) - 1]
+			end = start
+	return None
+
+class StatsFile:
+	"""
+	A single stats.txt file.
+	If use_index is set, the first query builds an index next to the file, and later queries use it.
+	"""
+	def __init__(self, path, use_index=False):
+		self.path = path
+		self.use_index = use_index
+		self.index = None
+
+	def index_path(self):
+		return self.path + INDEX_SUFFIX
+
+	def signature(self):
+		st = os.stat(self.path)
+		return [st.st_size, st.st_mtime]
+
+	def load_index(self):
+		if self.index is not None:
+			return self.index
+
+		try:
+			with open(self.index_path()) as f:
+				index = json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+
+		if index.get("signature") != self.signature():
+			return None
+
+		self.index = index
+		return index
+
+	def build_index(self):
+		"""
+		Read the whole file once, recording the offset of the first line of each stat in every block.
+		"""
+		blocks = []
+
+		def on_line(block_index, base, offset):
+			while len(blocks) <= block_index:
+				blocks.append(OrderedDict())
+			block = blocks[block_index]
+			if base not in block:
+				block[base] = [offset, 0]
+			block[base][1] += 1
+
+		signature = self.signature()
+		with open(self.path) as f:
+			scan(f, block=-1, on_line=on_line)
+
+		index = {"signature": signature, "blocks": blocks}
+
+		# The index is only an accelerator, so failing to write it is fine.
+		try:
+			tmp_path = "%s.%d.tmp" % (self.index_path(), os.getpid())
+			with open(tmp_path, "w") as f:
+				json.dump(index, f)
+			os.rename(tmp_path, self.index_path())
+		except (IOError, OSError):
+			pass
+
+		self.index = index
+		return index
+
+	def num_blocks(self):
+		index = self.load_index() or self.build_index()
+		return len(index["blocks"])
+
+	def load(self, select=None, block=-1, limit=None):
+		"""
+		Returns an ordered dictionary, from stat name to typed stat, for one block.
+		select may be a regex (string or compiled), matched against stat names.
+		"""
+		if isinstance(select, str):
+			select = re.compile(select)
+
+		index = self.load_index()
+		if index is None and self.use_index:
+			index = self.build_index()
+
+		if index is None:
+			offset = last_block_offset(self.path) if block < 0 else None
+			with open(self.path) as f:
+				if offset is None:
+					return build_all(scan(f, select, block, limit))
+				# Only the last block is read, and reading stops once limit stats were found.
+				f.seek(offset)
+				return build_all(scan(f, select, 0, limit))
+
+		if not index["blocks"]:
+			raise IndexError("%s has no stats blocks" % self.path)
+
+		entries = index["blocks"][block]
+		names = [name for name in entries if select is None or select.search(name)]
+		if limit is not None:
+			names = names[:limit]
+
+		lines = []
+		with open(self.path) as f:
+			for name in names:
+				offset, count = entries[name]
+				f.seek(offset)
+				for _ in range(count):
+					lines.append(parse_line(f.readline()))
+		return build_all(lines)
+
+	def get(self, name, block=-1):
+		stats = self.load("^%s$" % re.escape(name), block, limit=1)
+		if name not in stats:
+			raise KeyError("%s not found in %s" % (name, self.path))
+		return stats[name]
+
+	def value(self, name, block=-1):
+		"""
+		Shortcut for the value of a single scalar stat.
+		"""
+		return self.get(name, block).value
+
+def load(path, select=None, block=-1, limit=None, use_index=False):
+	return StatsFile(path, use_index).load(select, block, limit)
+
+def get(path, name, block=-1, use_index=False):
+	return StatsFile(path, use_index).get(name, block)
+
+def value(path, name, block=-1, use_index=False):
+	return StatsFile(path, use_index).value(name, block)
+
+def flatten(stats):
+	"""
+	Flatten typed stats into a dictionary of plain floats, keyed as they appear in stats.txt.
+	"""
+	flat = {}
+	for stat in stats.values():
+		flat.update(stat.flatten())
+	return flat
@@ -1,7 +1,7 @@
 # Hello World program in Python
 import os
 import sys
-import subprocess
+import gem5_stats
 
 # print "Hello World!\n"
 # bench_caps=[ "UNIFORM_RANDOM", "BIT_COMPLEMENT", "BIT_REVERSE", "BIT_ROTATION", "TRANSPOSE", "SHUFFLE" ]
@@ -42,7 +42,7 @@ for b in range(len(bench)):
 		print ("output_dir: %s" %(output_dir))
 		# print("grep -nri average_flit_latency {0:s} | sed 's/.*system.ruby.network.average_flit_latency\s*//'".format(output_dir))
 		# packet_latency = subprocess.check_output("grep -nri average_marked_flt_latency  {0:s}  | sed 's/.*system.ruby.network.average_marked_flt_latency\s*//'".format(output_dir), shell=True)
-		packet_latency = subprocess.check_output("grep -nri average_flit_latency  {0:s}  | sed 's/.*system.ruby.network.average_flit_latency\s*//'".format(output_dir), shell=True)
+		packet_latency = gem5_stats.value(os.path.join(output_dir, "stats.txt"), "system.ruby.network.average_flit_latency")
 		print packet_latency
 		pkt_lat = float(packet_latency)
 		# print ("Packet Latency: %f"%((float)packet_latency))
@@ -0,0 +1,178 @@
+"""
+A persistent, content-addressed cache of simulation results.
+
+Each sweep point is keyed on a hash of everything that determines its outcome:
+the simulator binary, the input files it reads (topology, spin ring, config script), and its full list of flags.
+Entries store the parsed stats of the point, so a rerun only needs to simulate points that are missing.
+If the binary or any input changes, every key changes with it, and stale entries are simply never hit again.
+Space is reclaimed by evicting the least recently used entries, until the cache fits within a size budget.
+
+Usage:
+  python result_cache.py list
+  python result_cache.py stats
+  python result_cache.py prune --max-size 512M
+  python result_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+CACHE_DIR = "./result_cache"
+ENTRY_SUFFIX = ".json"
+
+# Hashing a large binary for every point is slow, so file hashes are remembered until the file changes.
+file_hashes = {}
+
+def hash_file(path):
+	st = os.stat(path)
+	signature = (os.path.abspath(path), st.st_size, st.st_mtime)
+
+	if signature not in file_hashes:
+		h = hashlib.sha1()
+		with open(path, "rb") as f:
+			for chunk in iter(lambda: f.read(1 << 20), b""):
+				h.update(chunk)
+		file_hashes[signature] = h.hexdigest()
+
+	return file_hashes[signature]
+
+def make_key(files, flags):
+	"""
+	Hash the contents of all input files, alongside the flags they are run with.
+	"""
+	h = hashlib.sha1()
+	for path in files:
+		h.update(hash_file(path).encode("utf-8"))
+		h.update(b"\0")
+	h.update("\0".join(flags).encode("utf-8"))
+	return h.hexdigest()
+
+def parse_size(text):
+	"""
+	Parse a human-readable size, such as 512M or 2G, into bytes.
+	"""
+	units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+	text = text.strip().upper().rstrip("B")
+	if text and text[-1] in units:
+		return int(float(text[:-1]) * units[text[-1]])
+	return int(text)
+
+def format_size(size):
+	for unit in ["B", "K", "M", "G"]:
+		if size < 1024:
+			return "%.1f%s" % (size, unit)
+		size /= 1024.0
+	return "%.1fT" % size
+
+class ResultCache:
+	"""
+	A directory of entries, one JSON file per key.
+	A file's modification time doubles as its last use, which is bumped on every hit.
+	"""
+	def __init__(self, cache_dir=CACHE_DIR):
+		self.cache_dir = cache_dir
+		if not os.path.isdir(cache_dir):
+			os.makedirs(cache_dir)
+
+	def path(self, key):
+		return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+	def get(self, key):
+		"""
+		Returns the cached stats for a key, or None if it has never been stored.
+		"""
+		path = self.path(key)
+		try:
+			with open(path) as f:
+				entry = json.load(f)
+		except (IOError, OSError, ValueError):
+			return None
+
+		os.utime(path, None)
+		return entry["stats"]
+
+	def put(self, key, flags, stats):
+		# Write to a temporary file first, so readers never see a partial entry.
+		path = self.path(key)
+		tmp_path = "%s.%d.tmp" % (path, os.getpid())
+		with open(tmp_path, "w") as f:
+			json.dump({"key": key, "flags": flags, "stats": stats}, f)
+		os.rename(tmp_path, path)
+
+	def entries(self):
+		"""
+		Returns (key, size, last_used) for every entry, least recently used first.
+		"""
+		entries = []
+		for name in os.listdir(self.cache_dir):
+			if not name.endswith(ENTRY_SUFFIX):
+				continue
+			st = os.stat(os.path.join(self.cache_dir, name))
+			entries.append((name[:-len(ENTRY_SUFFIX)], st.st_size, st.st_mtime))
+		return sorted(entries, key=lambda entry: entry[2])
+
+	def flags(self, key):
+		with open(self.path(key)) as f:
+			return json.load(f)["flags"]
+
+	def size(self):
+		return sum(size for _, size, _ in self.entries())
+
+	def prune(self, max_size):
+		"""
+		Evict least recently used entries until the cache is at most max_size bytes.
+		Returns the number of evicted entries.
+		"""
+		entries = self.entries()
+		total = sum(size for _, size, _ in entries)
+
+		evicted = 0
+		for key, size, _ in entries:
+			if total <= max_size:
+				break
+			os.remove(self.path(key))
+			total -= size
+			evicted += 1
+		return evicted
+
+	def clear(self):
+		return self.prune(0)
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Inspect and prune the simulation result cache.")
+	parser.add_argument("--cache-dir", default=CACHE_DIR)
+
+	subparsers = parser.add_subparsers(dest="command")
+	subparsers.add_parser("list", help="list entries, least recently used first")
+	subparsers.add_parser("stats", help="summarize the size of the cache")
+	prune_parser = subparsers.add_parser("prune", help="evict least recently used entries")
+	prune_parser.add_argument("--max-size", required=True, help="size to shrink the cache to, e.g. 512M")
+	subparsers.add_parser("clear", help="evict every entry")
+
+	args = parser.parse_args(argv)
+	cache = ResultCache(args.cache_dir)
+
+	if args.command == "list":
+		for key, size, last_used in cache.entries():
+			flags = [flag for flag in cache.flags(key) if flag.startswith(("--synthetic", "--num-cpus", "--injectionrate"))]
+			print("%s %8s %s %s" % (key, format_size(size), time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used)), " ".join(flags)))
+	elif args.command == "stats":
+		entries = cache.entries()
+		print("entries: %d" % len(entries))
+		print("size: %s" % format_size(sum(size for _, size, _ in entries)))
+		if entries:
+			print("oldest use: %s" % time.ctime(entries[0][2]))
+			print("newest use: %s" % time.ctime(entries[-1][2]))
+	elif args.command == "prune":
+		print("evicted %d entries." % cache.prune(parse_size(args.max_size)))
+	elif args.command == "clear":
+		print("evicted %d entries." % cache.clear())
+	else:
+		parser.print_help()
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -7,8 +7,12 @@ import subprocess
 import json
 import multiprocessing
 import signal
+import sys
 import time
 
+import gem5_stats
+from result_cache import ResultCache, make_key
+
 BINARY = 'build/Garnet_standalone/gem5.opt'
 SIMULATOR = 'configs/example/garnet_synth_traffic.py'
 OUTPUT = "./result"
@@ -17,6 +21,10 @@ LOGS = os.path.join(OUTPUT, "log.log")
 RESULTS = os.path.join(OUTPUT, "results")
 JSON = os.path.join(OUTPUT, "output.json")
 
+# Results are cached outside of OUTPUT, so that they survive between runs.
+CACHE = "./result_cache"
+CACHE_SIZE = 1 << 30
+
 log_lock = multiprocessing.Lock()
 
 def log(text):
@@ -64,34 +72,181 @@ class SimulationConfiguration:
 	"""
 	Defines the meta-level configuration of this simulation.
 	"""
-	def __init__(self, output_dir, max_packet_latency, injection_rate_delta, max_speculation):
+	def __init__(self, output_dir, max_packet_latency, injection_rate_delta, max_speculation, search="linear", knee_budget=0, lean_output=False, keep_stats=True):
 		self.output_dir = output_dir
 		self.max_packet_latency = max_packet_latency
 		self.injection_rate_delta = injection_rate_delta
+		# The most injection rates of a single experiment that may be in flight at once.
+		# Anything past the first is speculative, and is wasted if a lower rate saturates.
 		self.max_speculation = max_speculation
+		# How injection rates are chosen, either "linear" or "bisection".
+		# Linear walks upwards in steps of injection_rate_delta until saturation.
+		# Bisection brackets the saturation knee exponentially, then narrows it down to injection_rate_delta.
+		self.search = search
+		# In bisection mode, the number of extra points to spend just below the knee, spaced by injection_rate_delta.
+		self.knee_budget = knee_budget
+		# Whether each point only keeps its config hash and flags, and the stats that were read back.
+		# The simulator then skips config.ini, config.json and the dot graph, which write_config() regenerates on demand.
+		self.lean_output = lean_output
+		# Whether lean-output points still keep stats.txt, which ae_sc2021.py, sat_thrpt.py and main.py read.
+		self.keep_stats = keep_stats
 
 
 class Measurement:
 	"""
 	A single experimental measured latency, given some injection rate.
 	"""
-	def __init__(self, injection_rate, packet_latency):
+	def __init__(self, injection_rate, packet_latency, saturated=False):
 		self.injection_rate = injection_rate
 		self.packet_latency = packet_latency
+		# Whether the simulator stopped early, having found the network saturated.
+		self.saturated = saturated
 	
 	def toDict(self):
 		return {"injection_rate": self.injection_rate, "packet_latency": self.packet_latency}
 
+class LinearSearch:
+	"""
+	Decides which injection rates an experiment should try next, by walking upwards in single steps until saturation.
+	Other searches override candidates().
+
+	Injection rates are handled as integer steps along a grid of injection_rate_delta, so that rates can be compared exactly.
+	A search never blocks. The scheduler asks it for the next step whenever a core is free, and reports back each measurement.
+	Any step that is handed out, but not yet measured, is speculative.
+	"""
+	def __init__(self, simulation_config):
+		self.simulation_config = simulation_config
+		self.max_step = int(round(1.0 / simulation_config.injection_rate_delta))
+
+		self.measurements = {}
+		self.pending = set()
+		self.failed = set()
+
+	def is_saturated(self, step):
+		measurement = self.measurements[step]
+		return measurement.saturated or measurement.packet_latency > self.simulation_config.max_packet_latency
+
+	def bracket(self):
+		"""
+		Returns (lo, hi), where hi is the lowest saturated step (or None), and lo is the highest unsaturated step below it.
+		"""
+		saturated = [step for step in self.measurements if self.is_saturated(step)]
+		hi = min(saturated) if saturated else None
+		below = [step for step in self.measurements if hi is None or step < hi]
+		lo = max(below) if below else 0
+		return lo, hi
+
+	def issued(self, step):
+		return step in self.measurements or step in self.pending or step in self.failed
+
+	def candidates(self):
+		"""
+		Steps that would be useful to measure, in the order they should be tried.
+		"""
+		_, hi = self.bracket()
+		if hi is not None:
+			return []
+
+		issued = list(self.measurements) + list(self.pending) + list(self.failed)
+		return [max(issued) + 1 if issued else 1]
+
+	def next_step(self):
+		if len(self.pending) >= self.simulation_config.max_speculation:
+			return None
+
+		for step in self.candidates():
+			if 0 < step <= self.max_step and not self.issued(step):
+				self.pending.add(step)
+				return step
+		return None
+
+	def record(self, step, measurement):
+		self.pending.discard(step)
+		self.measurements[step] = measurement
+
+	def discard(self, step):
+		"""
+		Forget a step that was cancelled or failed, without ever retrying it.
+		"""
+		self.pending.discard(step)
+		self.failed.add(step)
+
+	def useless(self):
+		"""
+		Pending steps past saturation, which should be cancelled.
+		"""
+		_, hi = self.bracket()
+		if hi is None:
+			return set()
+		return set(step for step in self.pending if step > hi)
+
+	def is_done(self):
+		return not self.pending and not any(not self.issued(step) and 0 < step <= self.max_step for step in self.candidates())
+
+class BisectionSearch(LinearSearch):
+	"""
+	Find the saturation knee without simulating every low-load point.
+
+	First, steps are probed exponentially until one saturates, which brackets the knee.
+	Then, the bracket is split into max_speculation + 1 pieces, and all interior points are tried at once.
+	This repeats until the bracket is a single step wide.
+	Finally, knee_budget extra points are measured densely just below the knee.
+	"""
+	def candidates(self):
+		lo, hi = self.bracket()
+
+		if hi is None:
+			issued = list(self.measurements) + list(self.pending) + list(self.failed)
+			if not issued:
+				return [1]
+			return [min(max(issued) * 2, self.max_step)]
+
+		if hi - lo > 1:
+			pieces = min(self.simulation_config.max_speculation + 1, hi - lo)
+			return [lo + (hi - lo) * i // pieces for i in range(1, pieces)]
+
+		return list(reversed(range(lo - self.simulation_config.knee_budget, lo)))
+
+searches = {
+	"linear": LinearSearch,
+	"bisection": BisectionSearch,
+}
+
+def get_cache_key(flags):
+	"""
+	The content hash of a simulation, which also identifies its configuration.
+	Anything that may change the simulated outcome must be part of the key: the simulator, its inputs, and its flags.
+	"""
+	files = [BINARY, SIMULATOR] + [flag.split("=", 1)[1] for flag in flags if flag.startswith(("--conf-file=", "--spin-file="))]
+	return make_key(files, flags)
+
+def write_config(point_dir, output_dir):
+	"""
+	Generate the config files of the lean-output simulation in point_dir, into output_dir.
+	The flags of the simulation are read back from point_dir, and the configuration is only instantiated, not simulated.
+	"""
+	with open(os.path.join(point_dir, "config.hash")) as f:
+		key = f.read().strip()
+	with open(os.path.join(point_dir, "config.flags")) as f:
+		flags = json.load(f)
+
+	if get_cache_key(flags) != key:
+		print("Warning: the simulator or its inputs changed since %s was simulated." % key)
+
+	return subprocess.call([BINARY, "-d", output_dir, SIMULATOR] + flags + ["--config-only"])
+
 class Experiment:
 	"""
 	An experiment consists of a single hardware configuration, paired alongside a single software configuration.
 	While running an experiment, packet latencies are collection across increasing injection rates.
+	Which rates are tried is up to the experiment's search, while the scheduler decides when they are run.
 	"""
 
 	def __init__(self, network_config, software_config, simulation_config):
 		self.network_config = network_config
 		self.software_config = software_config
 		self.simulation_config = simulation_config
+		self.search = searches[simulation_config.search](simulation_config)
 
 	def get_flags(self, injection_rate):
 		return [
@@ -127,7 +282,10 @@ class Experiment:
 			# As we change this injection rate, we should see a change in the latency as the network approaches saturation.
 			"--inj-vnet=0",
 			"--injectionrate=%1.5f"		% injection_rate,
-			"--precision=6"
+			"--precision=6",
+
+			# Stop as soon as the network is known to be saturated, rather than simulating every remaining cycle.
+			"--saturation-latency=%f"	% self.simulation_config.max_packet_latency,
 		]
 		
 	def get_output_dir(self, injection_rate):
@@ -141,121 +299,45 @@ class Experiment:
 			"inj-%1.5f" 		% injection_rate
 		)
 	
-	def run(self):
-		log("Starting experiment: %s" % self.name())
-
-		# Make sure that this experiment can create more subprocesses.
-		curr_proc = multiprocessing.current_process()
-		curr_proc.daemon = False
-
-		manager = multiprocessing.Manager()
-
-		# We don't know how many injection rates will be tried out.
-		# So, whenever a worker becomes available, it will try out a new rate.
-		# When the one finds that the experiment is complete, it will signal that to everyone.
-		last_injection_rate = 0
-		done = manager.Event()
-
-		# Since we do not know how many injection rates should be tried, any parallelism here is speculative.
-		# The penalty is that by running multiple at once, we may slow down others.
-		# So, we balance how far we speculate by limiting the number of workers.
-		workers = manager.Semaphore(self.simulation_config.max_speculation)
-		# Once a worker discovers we are done, we need to cancel any uncompleted speculation.
-		# To do this, we add all workers to a list as they are created, and pass their index to the workers themselves.
-		# In the dictionary, we map these indices to the actual worker process.
-		# When a worker completes, we simply unmap them from the dictionary.
-		# Then, at the end, any still-mapped workers can be terminated.
-		workers_list = []
-		workers_dict = manager.dict()
-
-		# Whenever the datastructures above are mutated, they must be access controlled.
-		# Exceptions are already thread-safe structures.
-		lock = manager.Lock()
-
-		# Completed results from each worker.
-		measurements_queue = manager.Queue()
-
-		def worker(injection_rate):
-			def worker_log(message):
-				self.log("worker %1.5f -> %s" % (injection_rate, message))
-
-			output_dir = self.get_output_dir(injection_rate)
-			worker_log("starting")
-
-			# Run simulator with provided configuration.
-			subprocess.call([BINARY, "-d", output_dir, SIMULATOR] + self.get_flags(injection_rate))
-
-			# Scan through the simulator's output, to specificially find the average flit latency.
-			_, packet_latency = subprocess.check_output([
-				"grep", "system.ruby.network.average_flit_latency", os.path.join(output_dir, "stats.txt"),
-			]).split()
-			packet_latency = float(packet_latency)
-			
-			measurements_queue.put(Measurement(injection_rate, packet_latency))
-
-			worker_log("done, with latency %f" % packet_latency)
-			if packet_latency > self.simulation_config.max_packet_latency:
-				done.set()
-				worker_log("reached latency limit")
-
-			# TODO: this may already be threadsafe.
-			lock.acquire()
-			workers_dict.pop(injection_rate)
-			lock.release()
-			workers.release()
-
-    # Until we are done this experiment, keep dispatching workers.
-		while not done.is_set():
-			workers.acquire()
-			lock.acquire()
-
-			# It's possible that in the time it took us to acquire a worker, the experiment finished.
-			if done.is_set():
-				workers.release()
-				lock.release()
-				break
-
-			last_injection_rate += self.simulation_config.injection_rate_delta
-
-			injection_rate = last_injection_rate
-
-			worker_process = multiprocessing.Process(target=worker, args=[injection_rate])
-			worker_index = len(workers_list)
-
-			workers_dict[injection_rate] = worker_index
-			workers_list.append(worker_process)
-			
-			lock.release()
-			
-			worker_process.start()
-
-		# At this point, all meaningful work for this experiment is completed.
-		# But, there may still be speculative processes running.
-		self.log("exited")
-		
-		# TODO: only terminate higher rate stragglers.
-		# For now, we assume that the workers complete in order.
-		lock.acquire()
-
-		num_stragglers = len(workers_dict)
-		for straggler_index in workers_dict.values():
-			self.log("terminating worker number %d." % straggler_index)
-			# Terminating a process doesn't kill its children, so do so manually.
-			os.system("pkill -P %d" % workers_list[straggler_index].pid)
-			workers_list[straggler_index].terminate()
-
-			self.log("terminated worker number %d." % straggler_index)
-
-		lock.release()
-
-		self.log("terminated %d stragglers." % num_stragglers)
-
-		# Now, convert the measurements queue back into a normal list.
-		measurements_queue.put(None)
-		measurements = list(iter(measurements_queue.get, None))
-
-		self.log("done. generated %d measurements." % len(measurements))
-		return measurements
+	def get_command(self, injection_rate):
+		# Lean output doesn't change the results, so it isn't part of the flags, nor of the cache key.
+		lean_flags = ["--lean-output"] if self.simulation_config.lean_output else []
+		return [BINARY, "-d", self.get_output_dir(injection_rate), SIMULATOR] + self.get_flags(injection_rate) + lean_flags
+
+	def get_cache_key(self, injection_rate):
+		return get_cache_key(self.get_flags(injection_rate))
+
+	def read_stats(self, injection_rate):
+		"""
+		Read back the stats of a completed simulation.
+		"""
+		stats = gem5_stats.load(os.path.join(self.get_output_dir(injection_rate), "stats.txt"), select=r"^system\.ruby\.network\.")
+		return gem5_stats.flatten(stats)
+
+	def write_lean_output(self, injection_rate, key, stats):
+		"""
+		Write the config hash and flags of a completed simulation next to its outputs, along with the stats that were read back.
+		Unless the simulation config keeps them, stats.txt is then removed.
+		"""
+		output_dir = self.get_output_dir(injection_rate)
+		with open(os.path.join(output_dir, "config.hash"), "w") as f:
+			f.write(key + "\n")
+		with open(os.path.join(output_dir, "config.flags"), "w") as f:
+			json.dump(self.get_flags(injection_rate), f, indent=2)
+		with open(os.path.join(output_dir, "stats.json"), "w") as f:
+			json.dump(stats, f, indent=2, sort_keys=True)
+		if not self.simulation_config.keep_stats:
+			os.remove(os.path.join(output_dir, "stats.txt"))
+
+	def get_measurement(self, injection_rate, stats):
+		saturated = stats.get("system.ruby.network.saturated_at_cycle", 0) > 0
+		return Measurement(injection_rate, stats["system.ruby.network.average_flit_latency"], saturated)
+
+	def get_injection_rate(self, step):
+		return round(step * self.simulation_config.injection_rate_delta, 5)
+
+	def measurements(self):
+		return [self.search.measurements[step] for step in sorted(self.search.measurements)]
 
 	def toDict(self):
 		return {
@@ -270,6 +352,116 @@ class Experiment:
 	def log(self, message):
 		log("Experiment: %s -> %s" % (self.name(), message))
 
+class Scheduler:
+	"""
+	Runs all experiments at once, on a fixed budget of simulator processes.
+
+	This is the only process that launches the simulator, so the machine is never oversubscribed.
+	Whenever a worker slot is free, it goes to the least-advanced experiment that still has a useful injection rate to try.
+	Once an experiment saturates, any of its speculative jobs past saturation are cancelled here.
+	Jobs that are already in the result cache are answered immediately, without using a worker.
+	"""
+	def __init__(self, experiments, num_workers, cache):
+		self.experiments = experiments
+		self.num_workers = num_workers
+		self.cache = cache
+
+		# Maps each running simulator process to its (experiment, step).
+		self.running = {}
+
+	def advancement(self, experiment):
+		return len(experiment.search.measurements) + len(experiment.search.pending)
+
+	def dispatch(self):
+		while len(self.running) < self.num_workers:
+			for experiment in sorted(self.experiments, key=self.advancement):
+				step = experiment.search.next_step()
+				if step is not None:
+					break
+			else:
+				return
+
+			injection_rate = experiment.get_injection_rate(step)
+			experiment.log("worker %1.5f -> starting" % injection_rate)
+
+			stats = self.cache.get(experiment.get_cache_key(injection_rate))
+			if stats is not None:
+				self.record(experiment, step, stats, "done (cached)")
+				continue
+
+			process = subprocess.Popen(experiment.get_command(injection_rate))
+			self.running[process] = (experiment, step)
+
+	def cancel(self, process):
+		experiment, step = self.running.pop(process)
+		process.kill()
+		process.wait()
+
+		experiment.search.discard(step)
+		experiment.log("worker %1.5f -> cancelled" % experiment.get_injection_rate(step))
+
+	def complete(self, process):
+		experiment, step = self.running.pop(process)
+		injection_rate = experiment.get_injection_rate(step)
+
+		if process.returncode != 0:
+			experiment.search.discard(step)
+			experiment.log("worker %1.5f -> failed, with code %d" % (injection_rate, process.returncode))
+			return
+
+		stats = experiment.read_stats(injection_rate)
+		key = experiment.get_cache_key(injection_rate)
+		self.cache.put(key, experiment.get_flags(injection_rate), stats)
+		if experiment.simulation_config.lean_output:
+			experiment.write_lean_output(injection_rate, key, stats)
+		self.record(experiment, step, stats, "done")
+
+	def record(self, experiment, step, stats, status):
+		injection_rate = experiment.get_injection_rate(step)
+		measurement = experiment.get_measurement(injection_rate, stats)
+		experiment.search.record(step, measurement)
+
+		experiment.log("worker %1.5f -> %s, with latency %f" % (injection_rate, status, measurement.packet_latency))
+		if experiment.search.is_saturated(step):
+			experiment.log("worker %1.5f -> reached latency limit" % injection_rate)
+
+	def run(self):
+		for experiment in self.experiments:
+			log("Starting experiment: %s" % experiment.name())
+
+		remaining = list(self.experiments)
+
+		try:
+			while True:
+				# Speculation past saturation is never useful, so cancel it before handing out more work.
+				for process, (experiment, step) in list(self.running.items()):
+					if step in experiment.search.useless():
+						self.cancel(process)
+
+				for experiment in list(remaining):
+					if experiment.search.is_done():
+						experiment.log("exited")
+						experiment.log("done. generated %d measurements." % len(experiment.search.measurements))
+						remaining.remove(experiment)
+
+				self.dispatch()
+
+				if not self.running:
+					break
+
+				finished = [process for process in self.running if process.poll() is not None]
+				if not finished:
+					time.sleep(0.1)
+
+				for process in finished:
+					self.complete(process)
+		finally:
+			# On any error, make sure no simulators are left behind.
+			for process in list(self.running):
+				self.cancel(process)
+
+		return [experiment.measurements() for experiment in self.experiments]
+
 # A number of different routing algorithms are supported.
 # These correspond to the settings used within Gem5.
 routing_algorithms = {
@@ -308,9 +500,6 @@ software_configurations = [
 	SoftwareConfiguration(benchmark="transpose", cycles=1e5)
 ]
 
-def run_experiment(experiment):
-	return experiment.run()
-
 def main():
 	# Build simulator.
 	# os.system("scons -j15 {}".format(BINARY))
@@ -321,7 +510,7 @@ def main():
 	subprocess.call("mkdir %s" % OUTPUT, shell=True)
 	subprocess.call('mkdir %s' % RESULTS, shell=True)
 
-	simulation_config = SimulationConfiguration(output_dir=RESULTS, max_packet_latency=200.0, injection_rate_delta=0.001, max_speculation=5)
+	simulation_config = SimulationConfiguration(output_dir=RESULTS, max_packet_latency=200.0, injection_rate_delta=0.001, max_speculation=5, search="bisection", knee_budget=8, lean_output=True)
 
 	# Prepare experiments.
 	experiments = []
@@ -329,13 +518,15 @@ def main():
 		for software_config in software_configurations:
 			experiments.append(Experiment(network_config, software_config, simulation_config))
 	
-	# Run all experiments using multithreading.
+	# Run all experiments at once, sharing one simulator per core.
 	# Note: this assumes that experiments do not try to write to the same location, or otherwise break independence.
 	log("Starting experiments.")
 	start_time = time.time()
 
-	pool = multiprocessing.Pool()
-	results = pool.map(run_experiment, experiments)
+	cache = ResultCache(CACHE)
+	scheduler = Scheduler(experiments, num_workers=multiprocessing.cpu_count(), cache=cache)
+	results = scheduler.run()
+	cache.prune(CACHE_SIZE)
 
 	log("Done all experiments after %s seconds." % (time.time() - start_time))
 
@@ -351,4 +542,9 @@ def main():
 	log(output)
 	with open(JSON, "w") as f:
 		f.write(output)
-main()
+
+if __name__ == "__main__":
+	# run_script.py config <point dir> <dir> writes out the config files of a lean-output point.
+	if len(sys.argv) == 4 and sys.argv[1] == "config":
+		sys.exit(write_config(sys.argv[2], sys.argv[3]))
+	main()
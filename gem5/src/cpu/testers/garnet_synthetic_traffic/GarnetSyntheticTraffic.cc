@@ -30,6 +30,7 @@
 
 #include "cpu/testers/garnet_synthetic_traffic/GarnetSyntheticTraffic.hh"
 
+#include <algorithm>
 #include <cmath>
 #include <iomanip>
 #include <set>
@@ -92,6 +93,13 @@ GarnetSyntheticTraffic::GarnetSyntheticTraffic(const Params *p)
       trafficType(p->traffic_type),
       injRate(p->inj_rate),
       injVnet(p->inj_vnet),
+      injScheduleRates(p->inj_schedule_rates),
+      injScheduleCycles(p->inj_schedule_cycles),
+      injPhase(0),
+      injPhaseEnd(0),
+      nextInjCycle(0),
+      injRateChanged(true),
+      lastTickCycle(0),
       precision(p->precision),
       responseLimit(p->response_limit),
       masterId(p->system->getMasterId(this))
@@ -106,6 +114,14 @@ GarnetSyntheticTraffic::GarnetSyntheticTraffic(const Params *p)
     }
     traffic = trafficStringToEnum[trafficType];
 
+    fatal_if(injScheduleRates.size() != injScheduleCycles.size(),
+             "%s: injection schedule has %d rates but %d phase lengths\n",
+             name(), injScheduleRates.size(), injScheduleCycles.size());
+    if (!injScheduleRates.empty()) {
+        injRate = injScheduleRates[0];
+        injPhaseEnd = injScheduleCycles[0];
+    }
+
     id = TESTER_NETWORK++;
     DPRINTF(GarnetSyntheticTraffic,"Config Created: Name = %s , and id = %d\n",
             name(), id);
@@ -126,6 +142,26 @@ GarnetSyntheticTraffic::init()
     numPacketsSent = 0;
 }
 
+DrainState
+GarnetSyntheticTraffic::drain()
+{
+    if (tickEvent.scheduled())
+        deschedule(tickEvent);
+
+    // A packet refused by the RubyPort still has to go out
+    return retryPkt ? DrainState::Draining : DrainState::Drained;
+}
+
+void
+GarnetSyntheticTraffic::drainResume()
+{
+    // Ticks resume at once, which also counts the drained cycles as
+    // idle, and the next packet is sampled afresh
+    injRateChanged = true;
+    if (!tickEvent.scheduled())
+        schedule(tickEvent, clockEdge());
+}
+
 
 void
 GarnetSyntheticTraffic::completeRequest(PacketPtr pkt)
@@ -141,50 +177,85 @@ GarnetSyntheticTraffic::completeRequest(PacketPtr pkt)
 }
 
 
+// Upper bound on the gap between two ticks
+static const Cycles MaxInjGap(1ULL << 40);
+
+double
+GarnetSyntheticTraffic::injProbability() const
+{
+    // The probability of sending in a cycle, if a random number between 0
+    // and 10^precision were drawn every cycle, and a packet sent if this
+    // number is < injRate*(10^precision).
+    // (injection rate's range depends on precision)
+    double injRange = pow((double) 10, (double) precision);
+    double sending = std::min(std::max(ceil(injRate*injRange), 0.0),
+                              injRange + 1);
+    return sending / (injRange + 1);
+}
+
+Cycles
+GarnetSyntheticTraffic::sampleInjGap() const
+{
+    // Sending is an independent trial every cycle, so the number of idle
+    // cycles until the next packet is geometrically distributed.
+    double p = injProbability();
+    if (p >= 1)
+        return Cycles(0);
+    if (p <= 0)
+        return MaxInjGap;
+
+    double gap = floor(log1p(-random_mt.random<double>()) / log1p(-p));
+    return gap < MaxInjGap ? Cycles(gap) : MaxInjGap;
+}
+
 void
 GarnetSyntheticTraffic::tick()
 {
-    if (++noResponseCycles >= responseLimit) {
+    // Ticks are skipped between packets, so catch up on the idle cycles
+    Cycles now = curCycle();
+    noResponseCycles += now - lastTickCycle;
+    lastTickCycle = now;
+    if (noResponseCycles >= responseLimit) {
 //        fatal("%s deadlocked at cycle %d\n", name(), curTick());
     }
 
-    // make new request based on injection rate
-    // (injection rate's range depends on precision)
-    // - generate a random number between 0 and 10^precision
-    // - send pkt if this number is < injRate*(10^precision)
-    bool sendAllowedThisCycle;
-    double injRange = pow((double) 10, (double) precision);
-    unsigned trySending = random_mt.random<unsigned>(0, (int) injRange);
-    if (trySending < injRate*injRange)
-        sendAllowedThisCycle = true;
-    else
-        sendAllowedThisCycle = false;
+    if (advanceInjSchedule() || injRateChanged) {
+        injRateChanged = false;
+        nextInjCycle = now + sampleInjGap();
+    }
 
     // always generatePkt unless fixedPkts or singleSender is enabled
-    if (sendAllowedThisCycle) {
-        bool senderEnable = true;
+    bool senderEnable = true;
 
-        if (numPacketsMax >= 0 && numPacketsSent >= numPacketsMax)
-            senderEnable = false;
+    if (numPacketsMax >= 0 && numPacketsSent >= numPacketsMax)
+        senderEnable = false;
 
-        if (singleSender >= 0 && id != singleSender)
-            senderEnable = false;
+    if (singleSender >= 0 && id != singleSender)
+        senderEnable = false;
 
+    if (now >= nextInjCycle) {
         if (senderEnable)
             generatePkt();
+        nextInjCycle = now + Cycles(1) + sampleInjGap();
     }
 
-    // Schedule wakeup
+    // Schedule wakeup at the next packet, or whenever something else
+    // needs to happen first
+    Cycles wakeup = senderEnable ? nextInjCycle : now + MaxInjGap;
+    if (injPhase + 1 < injScheduleRates.size())
+        wakeup = std::min(wakeup, injPhaseEnd);
+
     if (sim_type == 1) {
         if (curTick() >= simCycles)
             exitSimLoop("Network Tester completed simCycles");
         else {
+            wakeup = std::min(wakeup, ticksToCycles(simCycles));
             if (!tickEvent.scheduled())
-                schedule(tickEvent, clockEdge(Cycles(1)));
+                schedule(tickEvent, clockEdge(wakeup - now));
         }
     } else if(sim_type == 2) {
         if (!tickEvent.scheduled())
-        schedule(tickEvent, clockEdge(Cycles(1)));
+        schedule(tickEvent, clockEdge(wakeup - now));
 //        fatal("sim_type: %d is not implemented currently!", sim_type);
     } else {
         fatal("unknown 'sim_type: %d' option given", sim_type);
@@ -350,7 +421,40 @@ GarnetSyntheticTraffic::doRetry()
 {
     if (cachePort.sendTimingReq(retryPkt)) {
         retryPkt = NULL;
+        if (drainState() == DrainState::Draining)
+            signalDrainDone();
+    }
+}
+
+void
+GarnetSyntheticTraffic::setInjRate(double inj_rate)
+{
+    DPRINTF(GarnetSyntheticTraffic, "Injection rate changed from %f to %f\n",
+            injRate, inj_rate);
+    injRate = inj_rate;
+
+    // Pick up the new rate on the next cycle, rather than at the next
+    // packet sampled at the old rate
+    injRateChanged = true;
+    if (tickEvent.scheduled() && tickEvent.when() > clockEdge(Cycles(1)))
+        reschedule(tickEvent, clockEdge(Cycles(1)));
+}
+
+bool
+GarnetSyntheticTraffic::advanceInjSchedule()
+{
+    // The last phase lasts until the simulation ends
+    bool advanced = false;
+    while (injPhase + 1 < injScheduleRates.size() &&
+           curCycle() >= injPhaseEnd) {
+        injPhase++;
+        injPhaseEnd += injScheduleCycles[injPhase];
+        DPRINTF(GarnetSyntheticTraffic, "Injection phase %d starts\n",
+                injPhase);
+        setInjRate(injScheduleRates[injPhase]);
+        advanced = true;
     }
+    return advanced;
 }
 
 void
@@ -32,6 +32,7 @@
 #define __CPU_GARNET_SYNTHETIC_TRAFFIC_HH__
 
 #include <set>
+#include <vector>
 
 #include "base/statistics.hh"
 #include "mem/mem_object.hh"
@@ -61,6 +62,12 @@ class GarnetSyntheticTraffic : public MemObject
 
     virtual void init();
 
+    // Draining stops injection until the tester's requests are through
+    // the RubyPort, so that m5.fork() can drain the system. The network
+    // itself is not drained, forked children start from it warm.
+    DrainState drain() override;
+    void drainResume() override;
+
     // main simulation loop (one cycle)
     void tick();
 
@@ -75,6 +82,12 @@ class GarnetSyntheticTraffic : public MemObject
     inline int
         get_sim_type() { return sim_type;}
 
+    /**
+     * Change the injection rate of a running tester. Used to sweep
+     * injection rates from children forked off a warmed-up network.
+     */
+    void setInjRate(double inj_rate);
+
   protected:
     EventFunctionWrapper tickEvent;
 
@@ -131,6 +144,21 @@ class GarnetSyntheticTraffic : public MemObject
     TrafficType traffic; // enum from string
     double injRate;
     int injVnet;
+
+    // Injection schedule: the rate of each phase, and when the current
+    // phase ends. Empty if injRate is used throughout.
+    std::vector<double> injScheduleRates;
+    std::vector<Cycles> injScheduleCycles;
+    unsigned injPhase;
+    Cycles injPhaseEnd;
+
+    // The tester only ticks on cycles that send a packet (or that end a
+    // phase or the simulation), instead of trying to send every cycle.
+    Cycles nextInjCycle;
+    // Set when the next packet needs to be sampled at a new rate
+    bool injRateChanged;
+    Cycles lastTickCycle;
+
     int precision;
 
     const Cycles responseLimit;
@@ -142,6 +170,9 @@ class GarnetSyntheticTraffic : public MemObject
     void generatePkt();
     void sendPkt(PacketPtr pkt);
     void initTrafficType();
+    bool advanceInjSchedule();
+    double injProbability() const;
+    Cycles sampleInjGap() const;
 
     void doRetry();
 
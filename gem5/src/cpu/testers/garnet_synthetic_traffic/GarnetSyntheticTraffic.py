@@ -27,6 +27,7 @@
 # Authors: Tushar Krishna
 
 from MemObject import MemObject
+from m5.SimObject import *
 from m5.params import *
 from m5.proxy import *
 
@@ -46,6 +47,11 @@ class GarnetSyntheticTraffic(MemObject):
                                  Default depends on traffic_type")
     traffic_type = Param.String("uniform_random", "Traffic type")
     inj_rate = Param.Float(0.1, "Packet injection rate")
+    inj_schedule_rates = VectorParam.Float([], "Injection rate of each \
+                            phase of an injection schedule. \
+                            Overrides inj_rate if given")
+    inj_schedule_cycles = VectorParam.Cycles([], "Length of each phase \
+                            of the injection schedule, in cycles")
     inj_vnet = Param.Int(-1, "Vnet to inject in. \
                               0 and 1 are 1-flit, 2 is 5-flit. \
                                 Default is to inject in all three vnets")
@@ -56,3 +62,7 @@ class GarnetSyntheticTraffic(MemObject):
     test = MasterPort("Port to the memory system to test")
     system = Param.System(Parent.any, "System we belong to")
     sim_type = Param.Int(1, "type of simulation done in garnet")
+
+    cxx_exports = [
+        PyBindMethod("setInjRate"),
+    ]
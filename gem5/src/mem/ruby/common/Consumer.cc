@@ -41,10 +41,7 @@ Consumer::scheduleEventAbsolute(Tick evt_time)
 {
     if (!alreadyScheduled(evt_time)) {
         // This wakeup is not redundant
-        auto *evt = new EventFunctionWrapper(
-            [this]{ wakeup(); }, "Consumer Event", true);
-
-        em->schedule(evt, evt_time);
+        em->schedule(createWakeupEvent(), evt_time);
         insertScheduledWakeupTime(evt_time);
     }
 
@@ -53,3 +50,10 @@ Consumer::scheduleEventAbsolute(Tick evt_time)
     set<Tick>::iterator eit = m_scheduled_wakeups.lower_bound(t);
     m_scheduled_wakeups.erase(bit,eit);
 }
+
+Event *
+Consumer::createWakeupEvent()
+{
+    return new EventFunctionWrapper([this]{ wakeup(); }, "Consumer Event",
+                                    true);
+}
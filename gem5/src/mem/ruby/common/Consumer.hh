@@ -73,6 +73,10 @@ class Consumer
   protected:
     void scheduleEvent(Cycles timeDelta);
 
+    // Creates the self-deleting event, scheduled by
+    // scheduleEventAbsolute(), that calls wakeup()
+    virtual Event *createWakeupEvent();
+
   private:
     std::set<Tick> m_scheduled_wakeups;
     ClockedObject *em;
@@ -33,6 +33,8 @@
 
 #include "mem/ruby/network/garnet2.0/Credit.hh"
 
+#include "mem/ruby/network/garnet2.0/FlitPool.hh"
+
 // Credit Signal for buffers inside VC
 // Carries m_vc (inherits from flit.hh)
 // and m_is_free_signal (whether VC is free or not)
@@ -44,3 +46,16 @@ Credit::Credit(int vc, bool is_free_signal, Cycles curTime)
     m_is_free_signal = is_free_signal;
     m_time = curTime;
 }
+
+void *
+Credit::operator new(size_t size)
+{
+    assert(size == sizeof(Credit));
+    return FlitPool<Credit>::allocate();
+}
+
+void
+Credit::operator delete(void *p, size_t size)
+{
+    FlitPool<Credit>::release(p);
+}
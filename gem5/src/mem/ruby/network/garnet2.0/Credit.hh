@@ -51,6 +51,10 @@ class Credit : public flit
     Credit() {};
     Credit(int vc, bool is_free_signal, Cycles curTime);
 
+    // Credits are allocated from a FlitPool of their own
+    static void *operator new(size_t size);
+    static void operator delete(void *p, size_t size);
+
     bool is_free_signal() { return m_is_free_signal; }
 
   private:
@@ -47,6 +47,7 @@ CrossbarSwitch::CrossbarSwitch(Router *router)
     m_router = router;
     m_num_vcs = m_router->get_num_vcs();
     m_crossbar_activity = 0;
+    m_num_buffered_flits = 0;
 }
 
 CrossbarSwitch::~CrossbarSwitch()
@@ -95,6 +96,7 @@ CrossbarSwitch::wakeup()
             // in the next cycle
             m_output_unit[outport]->insert_flit(t_flit);
             m_switch_buffer[inport]->getTopFlit();
+            m_num_buffered_flits--;
             m_crossbar_activity++;
         }
     }
@@ -54,7 +54,12 @@ class CrossbarSwitch : public Consumer
     void print(std::ostream& out) const {};
 
     inline void update_sw_winner(int inport, flit *t_flit)
-    { m_switch_buffer[inport]->insert(t_flit); }
+    {
+        m_switch_buffer[inport]->insert(t_flit);
+        m_num_buffered_flits++;
+    }
+
+    inline bool isEmpty() { return m_num_buffered_flits == 0; }
 
     inline double get_crossbar_activity() { return m_crossbar_activity; }
 
@@ -65,6 +70,7 @@ class CrossbarSwitch : public Consumer
     int m_num_vcs;
     int m_num_inports;
     double m_crossbar_activity;
+    int m_num_buffered_flits;
     Router *m_router;
     std::vector<flitBuffer *> m_switch_buffer;
     std::vector<OutputUnit *> m_output_unit;
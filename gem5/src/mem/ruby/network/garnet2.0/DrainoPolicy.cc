@@ -0,0 +1,341 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#include "mem/ruby/network/garnet2.0/DrainoPolicy.hh"
+
+#include <algorithm>
+#include <cmath>
+
+#include "base/logging.hh"
+#include "base/trace.hh"
+#include "debug/Draino.hh"
+
+static std::string
+drainoStateName(DrainoStates state)
+{
+    switch (state) {
+        case DrainoStates::IDLE:
+            return "IDLE";
+        case DrainoStates::IDLE_LAST:
+            return "IDLE_LAST";
+        case DrainoStates::INCREASE_SET:
+            return "INCREASING_SET";
+        case DrainoStates::INCREASE_TEST:
+            return "INCREASING_TEST";
+        case DrainoStates::DECREASE_SET:
+            return "DECREASING_SET";
+        case DrainoStates::DECREASE_TEST:
+            return "DECREASING_TEST";
+        default:
+            break;
+    }
+    return "UNKNOWN";
+}
+
+DrainoLatencyEstimator::DrainoLatencyEstimator(const GarnetNetworkParams *p)
+    : m_window_size(p->draino_window), m_alpha(p->draino_ewma_alpha),
+      m_total_latency(0), m_total_flits(0),
+      m_window_latency(0), m_window_flits(0),
+      m_ewma(0), m_ewma_valid(false)
+{
+    if (p->draino_estimator == "cumulative") {
+        m_kind = CUMULATIVE;
+    } else if (p->draino_estimator == "window") {
+        m_kind = WINDOW;
+        fatal_if(m_window_size == 0, "draino_window must be positive\n");
+    } else if (p->draino_estimator == "ewma") {
+        m_kind = EWMA;
+        fatal_if(m_alpha <= 0 || m_alpha > 1,
+                 "draino_ewma_alpha must be in (0, 1]\n");
+    } else {
+        fatal("Unknown DrainO latency estimator: %s\n", p->draino_estimator);
+    }
+}
+
+double
+DrainoLatencyEstimator::update(double epoch_latency, double epoch_flits)
+{
+    m_total_latency += epoch_latency;
+    m_total_flits += epoch_flits;
+
+    // Without any received flits there is no estimate yet
+    if (m_kind == CUMULATIVE)
+        return m_total_flits > 0 ? m_total_latency / m_total_flits : NAN;
+
+    if (m_kind == WINDOW) {
+        m_window.push_back(std::make_pair(epoch_latency, epoch_flits));
+        m_window_latency += epoch_latency;
+        m_window_flits += epoch_flits;
+        if (m_window.size() > m_window_size) {
+            m_window_latency -= m_window.front().first;
+            m_window_flits -= m_window.front().second;
+            m_window.pop_front();
+        }
+        return m_window_flits > 0 ? m_window_latency / m_window_flits : NAN;
+    }
+
+    // An epoch without any received flits carries no information
+    if (epoch_flits > 0) {
+        double epoch_average = epoch_latency / epoch_flits;
+        if (m_ewma_valid) {
+            m_ewma += m_alpha * (epoch_average - m_ewma);
+        } else {
+            m_ewma = epoch_average;
+            m_ewma_valid = true;
+        }
+    }
+    return m_ewma_valid ? m_ewma : NAN;
+}
+
+void
+DrainoLatencyEstimator::reset()
+{
+    m_total_latency = 0;
+    m_total_flits = 0;
+    m_window.clear();
+    m_window_latency = 0;
+    m_window_flits = 0;
+    m_ewma = 0;
+    m_ewma_valid = false;
+}
+
+DrainoPolicy::DrainoPolicy(const std::string &name,
+                           const GarnetNetworkParams *p)
+    : m_name(name),
+      m_latency_threshold(p->draino_latency_threshold),
+      m_idle_cycles(p->draino_idle_cycles),
+      m_min_frequency(p->draino_min_freq),
+      m_max_frequency(p->draino_max_freq)
+{
+    fatal_if(m_min_frequency <= 0 || m_min_frequency > m_max_frequency,
+             "DrainO frequency range [%d, %d] is invalid\n",
+             m_min_frequency, m_max_frequency);
+}
+
+DrainoPolicy *
+DrainoPolicy::create(const std::string &name, const GarnetNetworkParams *p)
+{
+    if (p->draino_policy == "hill_climb")
+        return new HillClimbPolicy(name, p);
+    else if (p->draino_policy == "golden_section")
+        return new GoldenSectionPolicy(name, p);
+    else if (p->draino_policy == "miad")
+        return new MiadPolicy(name, p);
+
+    fatal("Unknown DrainO policy: %s\n", p->draino_policy);
+}
+
+int
+DrainoPolicy::clamp(int frequency) const
+{
+    return std::min(std::max(frequency, m_min_frequency), m_max_frequency);
+}
+
+HillClimbPolicy::HillClimbPolicy(const std::string &name,
+                                 const GarnetNetworkParams *p)
+    : DrainoPolicy(name, p),
+      m_last_latency(0),
+      m_previous_frequency(0),
+      m_elapsed_idle_cycles(0),
+      m_state(DrainoStates::IDLE),
+      m_last_increased(true)
+{
+}
+
+int
+HillClimbPolicy::update(int frequency, double latency)
+{
+    DPRINTF(Draino, "Start. State = %s, Frequency = %d\n",
+            drainoStateName(m_state), frequency);
+
+    switch (m_state) {
+        case DrainoStates::IDLE:
+            m_elapsed_idle_cycles += 1;
+            if (m_elapsed_idle_cycles == m_idle_cycles) {
+                m_state = DrainoStates::IDLE_LAST;
+            }
+            break;
+        case DrainoStates::IDLE_LAST:
+            m_elapsed_idle_cycles = 0;
+
+            if (m_last_increased) {
+                m_state = DrainoStates::DECREASE_SET;
+                m_last_increased = false;
+            } else {
+                m_state = DrainoStates::INCREASE_SET;
+                m_last_increased = true;
+            }
+            break;
+        case DrainoStates::INCREASE_SET:
+            DPRINTF(Draino, "increasing frequency.\n");
+            m_previous_frequency = frequency;
+            frequency = m_previous_frequency * 2;
+            m_last_latency = latency;
+            m_state = DrainoStates::INCREASE_TEST;
+            break;
+        case DrainoStates::INCREASE_TEST:
+            if (latency - m_last_latency > m_latency_threshold) {
+                DPRINTF(Draino, "average latency increased.\n");
+                frequency = m_previous_frequency;
+                m_state = DrainoStates::IDLE;
+            } else {
+                DPRINTF(Draino, "average latency decreased or level.\n");
+                m_state = DrainoStates::INCREASE_SET;
+            }
+            break;
+
+        case DrainoStates::DECREASE_SET:
+            DPRINTF(Draino, "decreasing frequency.\n");
+            if (frequency <= m_min_frequency) {
+                m_state = DrainoStates::IDLE;
+                break;
+            }
+            m_previous_frequency = frequency;
+            frequency = m_previous_frequency / 2;
+            m_last_latency = latency;
+            m_state = DrainoStates::DECREASE_TEST;
+            break;
+        case DrainoStates::DECREASE_TEST:
+            if (latency - m_last_latency > m_latency_threshold) {
+                DPRINTF(Draino, "average latency increased.\n");
+                frequency = m_previous_frequency;
+                m_state = DrainoStates::IDLE;
+            } else {
+                DPRINTF(Draino, "average latency decreased or level.\n");
+                m_state = DrainoStates::DECREASE_SET;
+            }
+            break;
+        default:
+            panic("Unexpected DrainO state %d\n", m_state);
+    }
+
+    DPRINTF(Draino, "-----> %s\n", drainoStateName(m_state));
+    return frequency;
+}
+
+// 1 / golden ratio
+static const double GOLDEN_SECTION = 0.6180339887498949;
+
+GoldenSectionPolicy::GoldenSectionPolicy(const std::string &name,
+                                         const GarnetNetworkParams *p)
+    : DrainoPolicy(name, p),
+      m_tolerance(p->draino_search_tolerance),
+      m_elapsed_idle_cycles(0),
+      m_lo(0), m_hi(0), m_lower(0), m_upper(0),
+      m_lower_latency(0), m_upper_latency(0),
+      m_have_lower(false), m_have_upper(false),
+      m_probe(NONE)
+{
+    fatal_if(m_tolerance <= 0, "draino_search_tolerance must be positive\n");
+}
+
+int
+GoldenSectionPolicy::toFrequency(double x) const
+{
+    return clamp((int) std::round(std::pow(2.0, x)));
+}
+
+int
+GoldenSectionPolicy::update(int frequency, double latency)
+{
+    if (m_probe == NONE) {
+        m_elapsed_idle_cycles += 1;
+        if (m_elapsed_idle_cycles < m_idle_cycles)
+            return frequency;
+
+        DPRINTF(Draino, "starting golden-section search.\n");
+        m_elapsed_idle_cycles = 0;
+        m_lo = std::log2((double) m_min_frequency);
+        m_hi = std::log2((double) m_max_frequency);
+        m_lower = m_hi - GOLDEN_SECTION * (m_hi - m_lo);
+        m_upper = m_lo + GOLDEN_SECTION * (m_hi - m_lo);
+        m_have_lower = false;
+        m_have_upper = false;
+    } else if (m_probe == LOWER) {
+        m_lower_latency = latency;
+        m_have_lower = true;
+    } else {
+        m_upper_latency = latency;
+        m_have_upper = true;
+    }
+
+    // Keep the side of the interval with the better probe. The surviving
+    // probe becomes one of the new pair, so only one needs measuring.
+    if (m_have_lower && m_have_upper) {
+        if (m_lower_latency < m_upper_latency) {
+            m_hi = m_upper;
+            m_upper = m_lower;
+            m_upper_latency = m_lower_latency;
+            m_lower = m_hi - GOLDEN_SECTION * (m_hi - m_lo);
+            m_have_lower = false;
+        } else {
+            m_lo = m_lower;
+            m_lower = m_upper;
+            m_lower_latency = m_upper_latency;
+            m_upper = m_lo + GOLDEN_SECTION * (m_hi - m_lo);
+            m_have_upper = false;
+        }
+        DPRINTF(Draino, "search interval is now [%d, %d].\n",
+                toFrequency(m_lo), toFrequency(m_hi));
+    }
+
+    if (m_hi - m_lo < m_tolerance) {
+        DPRINTF(Draino, "search converged.\n");
+        m_probe = NONE;
+        return toFrequency((m_lo + m_hi) / 2);
+    }
+
+    m_probe = m_have_lower ? UPPER : LOWER;
+    return toFrequency(m_probe == LOWER ? m_lower : m_upper);
+}
+
+MiadPolicy::MiadPolicy(const std::string &name, const GarnetNetworkParams *p)
+    : DrainoPolicy(name, p),
+      m_factor(p->draino_miad_factor),
+      m_step(p->draino_miad_step),
+      m_last_latency(0),
+      m_last_latency_valid(false)
+{
+    fatal_if(m_factor <= 1, "draino_miad_factor must be greater than 1\n");
+}
+
+int
+MiadPolicy::update(int frequency, double latency)
+{
+    // Keep backing off until latency is back within the threshold of
+    // the last good epoch.
+    int next;
+    if (m_last_latency_valid &&
+        latency - m_last_latency > m_latency_threshold) {
+        DPRINTF(Draino, "average latency increased, backing off.\n");
+        next = frequency - m_step;
+    } else {
+        next = (int) (frequency * m_factor);
+        m_last_latency = latency;
+        m_last_latency_valid = true;
+    }
+    return clamp(next);
+}
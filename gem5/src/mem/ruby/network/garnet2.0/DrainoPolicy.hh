@@ -0,0 +1,182 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#ifndef __MEM_RUBY_NETWORK_GARNET2_0_DRAINOPOLICY_HH__
+#define __MEM_RUBY_NETWORK_GARNET2_0_DRAINOPOLICY_HH__
+
+#include <deque>
+#include <string>
+
+#include "params/GarnetNetwork.hh"
+
+// DrainO tunes the DRAIN frequency (the number of cycles between two
+// drains, m_spin_thrshld) at runtime. Once per DRAIN epoch, the network
+// feeds its latency counters into an estimator, and hands the estimate to
+// a policy, which picks the frequency to use next.
+
+// Turns the network's cumulative latency counters into a latency signal.
+//  cumulative: average since the last stats reset.
+//  window: average over the last draino_window epochs.
+//  ewma: exponentially weighted average of per-epoch averages.
+class DrainoLatencyEstimator
+{
+  public:
+    DrainoLatencyEstimator(const GarnetNetworkParams *p);
+
+    // Takes the latency and number of flits received in the last
+    // epoch, returns the current estimate, or NaN while there is none.
+    double update(double epoch_latency, double epoch_flits);
+    // Forgets all epochs, when stats are reset.
+    void reset();
+
+  private:
+    enum Kind { CUMULATIVE, WINDOW, EWMA };
+    Kind m_kind;
+    unsigned m_window_size;
+    double m_alpha;
+
+    // Totals since the last reset
+    double m_total_latency;
+    double m_total_flits;
+
+    // (latency, flits) of each epoch in the window, and their sums
+    std::deque<std::pair<double, double> > m_window;
+    double m_window_latency;
+    double m_window_flits;
+
+    double m_ewma;
+    bool m_ewma_valid;
+};
+
+class DrainoPolicy
+{
+  public:
+    DrainoPolicy(const std::string &name, const GarnetNetworkParams *p);
+    virtual ~DrainoPolicy() {}
+
+    // Called once per epoch that has a latency estimate, with the
+    // current frequency and the estimate. Returns the frequency to use
+    // next.
+    virtual int update(int frequency, double latency) = 0;
+
+    const std::string &name() const { return m_name; }
+
+    static DrainoPolicy *create(const std::string &name,
+                                const GarnetNetworkParams *p);
+
+  protected:
+    int clamp(int frequency) const;
+
+    std::string m_name;
+    // The minimum change in latency to react to.
+    double m_latency_threshold;
+    // Number of epochs to stay idle between searches.
+    int m_idle_cycles;
+    int m_min_frequency;
+    int m_max_frequency;
+};
+
+enum DrainoStates {
+  IDLE,
+  IDLE_LAST,
+
+  INCREASE_SET,
+  INCREASE_MEASURE,
+  INCREASE_TEST,
+
+  DECREASE_SET,
+  DECREASE_MEASURE,
+  DECREASE_TEST,
+};
+
+// The original DrainO controller: alternately keep doubling or halving
+// the frequency, for as long as latency does not get worse, then idle.
+class HillClimbPolicy : public DrainoPolicy
+{
+  public:
+    HillClimbPolicy(const std::string &name, const GarnetNetworkParams *p);
+    int update(int frequency, double latency);
+
+  private:
+    // Latency value at the state of the measurement period.
+    double m_last_latency;
+    // Frequency before the current experiment.
+    int m_previous_frequency;
+    // Total cycles spent in idle, so far.
+    int m_elapsed_idle_cycles;
+    // Current state of the FSM.
+    DrainoStates m_state;
+    // Type of the last experiment, used to alternate between them.
+    bool m_last_increased;
+};
+
+// Golden-section search for the frequency with the lowest latency, over
+// log2(frequency) between the min and max frequency. Each probe is
+// measured for one epoch. Once the interval is narrower than
+// draino_search_tolerance, its midpoint is held while idle, and the
+// search starts over.
+class GoldenSectionPolicy : public DrainoPolicy
+{
+  public:
+    GoldenSectionPolicy(const std::string &name,
+                        const GarnetNetworkParams *p);
+    int update(int frequency, double latency);
+
+  private:
+    enum Probe { NONE, LOWER, UPPER };
+
+    int toFrequency(double x) const;
+
+    double m_tolerance;
+    int m_elapsed_idle_cycles;
+
+    // Search interval, and its two probes with their latencies
+    double m_lo, m_hi;
+    double m_lower, m_upper;
+    double m_lower_latency, m_upper_latency;
+    bool m_have_lower, m_have_upper;
+    // Probe being measured this epoch
+    Probe m_probe;
+};
+
+// Multiplicative-increase/additive-decrease: grow the frequency by
+// draino_miad_factor while latency does not get worse, and back off by
+// draino_miad_step for as long as it is worse than the last good epoch.
+class MiadPolicy : public DrainoPolicy
+{
+  public:
+    MiadPolicy(const std::string &name, const GarnetNetworkParams *p);
+    int update(int frequency, double latency);
+
+  private:
+    double m_factor;
+    int m_step;
+    // Latency of the last good epoch
+    double m_last_latency;
+    bool m_last_latency_valid;
+};
+
+#endif // __MEM_RUBY_NETWORK_GARNET2_0_DRAINOPOLICY_HH__
@@ -0,0 +1,126 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#ifndef __MEM_RUBY_NETWORK_GARNET2_0_FLITPOOL_HH__
+#define __MEM_RUBY_NETWORK_GARNET2_0_FLITPOOL_HH__
+
+#include <cstddef>
+#include <cstdint>
+#include <new>
+
+// Free-list allocator for the objects garnet creates and destroys once per
+// flit: flits and credits. Objects are carved out of slabs of SlabSize,
+// and freed objects are kept on a free list to be handed out again, so
+// the heap is only touched once per slab. Slabs are never returned.
+//
+// flit and Credit route their operator new/delete here.
+template <class T>
+class FlitPool
+{
+  public:
+    static void *
+    allocate()
+    {
+        if (m_free == nullptr)
+            grow();
+
+        FreeNode *node = m_free;
+        m_free = node->next;
+
+        m_allocations++;
+        m_live++;
+        if (m_live > m_peak_live)
+            m_peak_live = m_live;
+        return node;
+    }
+
+    static void
+    release(void *p)
+    {
+        if (p == nullptr)
+            return;
+
+        FreeNode *node = static_cast<FreeNode *>(p);
+        node->next = m_free;
+        m_free = node;
+        m_live--;
+    }
+
+    // Objects allocated since the last stats reset
+    static uint64_t allocations() { return m_allocations; }
+    // Slabs allocated from the heap, in total
+    static uint64_t slabs() { return m_slabs; }
+    // Objects currently allocated, and the most there were at once
+    static uint64_t live() { return m_live; }
+    static uint64_t peakLive() { return m_peak_live; }
+
+    static void
+    resetStats()
+    {
+        m_allocations = 0;
+        m_peak_live = m_live;
+    }
+
+  private:
+    union FreeNode
+    {
+        FreeNode *next;
+        alignas(T) char storage[sizeof(T)];
+    };
+
+    static const int SlabSize = 1024;
+
+    static void
+    grow()
+    {
+        FreeNode *slab = static_cast<FreeNode *>(
+            ::operator new(SlabSize * sizeof(FreeNode)));
+        for (int i = SlabSize - 1; i >= 0; i--) {
+            slab[i].next = m_free;
+            m_free = &slab[i];
+        }
+        m_slabs++;
+    }
+
+    static FreeNode *m_free;
+    static uint64_t m_allocations;
+    static uint64_t m_slabs;
+    static uint64_t m_live;
+    static uint64_t m_peak_live;
+};
+
+template <class T>
+typename FlitPool<T>::FreeNode *FlitPool<T>::m_free = nullptr;
+template <class T>
+uint64_t FlitPool<T>::m_allocations = 0;
+template <class T>
+uint64_t FlitPool<T>::m_slabs = 0;
+template <class T>
+uint64_t FlitPool<T>::m_live = 0;
+template <class T>
+uint64_t FlitPool<T>::m_peak_live = 0;
+
+#endif // __MEM_RUBY_NETWORK_GARNET2_0_FLITPOOL_HH__
@@ -34,6 +34,7 @@
 #include "mem/ruby/network/garnet2.0/GarnetNetwork.hh"
 
 #include <cassert>
+#include <cmath>
 #include <cstring>
 #include <stdio.h>
 #include <unistd.h>
@@ -43,16 +44,21 @@
 #include "debug/Draino.hh"
 
 #include "base/cast.hh"
+#include "base/output.hh"
 #include "base/stl_helpers.hh"
 #include "mem/ruby/common/NetDest.hh"
 #include "mem/ruby/system/Sequencer.hh"
 #include "mem/ruby/network/MessageBuffer.hh"
 #include "mem/ruby/network/garnet2.0/CommonTypes.hh"
+#include "mem/ruby/network/garnet2.0/Credit.hh"
 #include "mem/ruby/network/garnet2.0/CreditLink.hh"
+#include "mem/ruby/network/garnet2.0/FlitPool.hh"
 #include "mem/ruby/network/garnet2.0/GarnetLink.hh"
 #include "mem/ruby/network/garnet2.0/NetworkInterface.hh"
 #include "mem/ruby/network/garnet2.0/NetworkLink.hh"
+#include "mem/ruby/network/garnet2.0/NetworkTrace.hh"
 #include "mem/ruby/network/garnet2.0/Router.hh"
+#include "mem/ruby/network/garnet2.0/RouterThreadPool.hh"
 #include "mem/ruby/network/garnet2.0/RoutingUnit.hh"
 #include "mem/ruby/network/garnet2.0/InputUnit.hh"
 #include "mem/ruby/network/garnet2.0/OutputUnit.hh"
@@ -73,7 +79,9 @@ using m5::stl_helpers::deletePointers;
  */
 
 GarnetNetwork::GarnetNetwork(const Params *p)
-    : Network(p), Consumer(this)
+    : Network(p), Consumer(this),
+      saturationCheckEvent([this]{ checkSaturation(); },
+                           "GarnetNetwork saturation check")
 {
     m_num_rows = p->num_rows;
     m_ni_flit_size = p->ni_flit_size;
@@ -122,6 +130,16 @@ GarnetNetwork::GarnetNetwork(const Params *p)
     draino_freq = p->draino_freq;
     draino_latency_threshold = p->draino_latency_threshold;
     draino_idle_cycles = p->draino_idle_cycles;
+    m_draino_estimator = new DrainoLatencyEstimator(p);
+    m_draino_policy = DrainoPolicy::create(name() + ".draino", p);
+    m_draino_series_length = p->draino_series_length;
+    m_window_flit_network_latency = 0;
+    m_window_flits_received = 0;
+
+    // Early termination options from commandline:
+    m_saturation_latency = p->saturation_latency;
+    m_saturation_backlog = p->saturation_backlog;
+    m_saturation_check_period = p->saturation_check_period;
 
     lock = -1;
 
@@ -160,6 +178,14 @@ GarnetNetwork::GarnetNetwork(const Params *p)
     m_trace_enable = p->trace_enable;
     m_trace_filename = p->trace_file;
     m_trace_max_packets = p->trace_max_packets;
+    m_trace_reader = nullptr;
+    m_routing_table_dump = p->routing_table_dump;
+    m_idle_router_skipping = p->idle_router_skipping;
+    m_garnet_threads = p->garnet_threads;
+    m_thread_pool = nullptr;
+    m_in_parallel_phase = false;
+
+    m_occupied_vcs.assign(m_virtual_networks * m_vcs_per_vnet, 0);
 
     m_vnet_type.resize(m_virtual_networks);
 
@@ -264,6 +290,43 @@ GarnetNetwork::init_spinRing()
     return;
 }
 
+// Resolves the routers and ports of every spin-ring slot, which
+// doSpin() would otherwise look up by direction name for every flit.
+void
+GarnetNetwork::init_spinRing_ports()
+{
+    for (int idx = 0; idx < spinRing.size(); idx++) {
+        spinStruct &slot = spinRing[idx];
+        Router* router = m_routers[slot.router_id_];
+
+        slot.router_ = router;
+        slot.inport_ = router->m_routing_unit\
+                                ->m_inports_dirn2idx[slot.inport_dir_];
+        slot.upstream_router_ = get_upstreamrouter(slot.inport_dir_,
+                                                   router->get_id());
+        if (slot.upstream_router_ != nullptr) {
+            PortDirection outportDirn =
+                get_upstreamOutportDirn(slot.inport_dir_);
+            slot.upstream_outport_ = slot.upstream_router_->m_routing_unit\
+                                        ->m_outports_dirn2idx[outportDirn];
+        }
+
+        slot.outport_neighbor_.clear();
+        for (int outport = 0; outport < router->get_num_outports();
+             outport++) {
+            PortDirection dirn =
+                router->get_outputUnit_ref()[outport]->get_direction();
+            if (dirn == "East" || dirn == "West" || dirn == "North" ||
+                dirn == "South" || dirn == "Local") {
+                slot.outport_neighbor_.push_back(
+                    get_upstreamId(dirn, router->get_id()));
+            } else {
+                slot.outport_neighbor_.push_back(-1);
+            }
+        }
+    }
+}
+
 void
 GarnetNetwork::doSpin(int vc_) {
     // go the corresponding router and its input-port vc-0
@@ -271,34 +334,27 @@ GarnetNetwork::doSpin(int vc_) {
     // of the deque..
     // update -- stats:
     // put asserts: number of pkts present in VC-base ('vc_')
-    int spun_pkt_num = 0;
-    for (vector<Router*>::const_iterator itr= m_routers.begin();
-         itr != m_routers.end(); ++itr) {
-        Router* router = safe_cast<Router*>(*itr);
-        for (int inport = 0; inport < router->get_num_inports(); inport++) {
-            assert(inport == router->get_inputUnit_ref()[inport]->get_id());
-            if (router->get_inputUnit_ref()[inport]->get_direction() != "Local") {
-                if(router->get_inputUnit_ref()[inport]->vc_isEmpty(vc_)) {
-                } else {
-                    spun_pkt_num++;
-                }
-            }
-        }
-    }
-
-    // cout << "Packets needed to be spun: " << spun_pkt_num << endl;
+    // All of them must be on the ring.
+    int spun_pkt_num = m_occupied_vcs[vc_];
 
     m_total_spins++;
     int num_pkts = 0; // number of packets taken out and inserted must be same.
+    int num_slots = spinRing.size() - 1;
+
+    // Nothing to move, every slot is a bubble
+    if (spun_pkt_num == 0) {
+        m_bubble += num_slots;
+        return;
+    }
 
     // 2-stage credit management
-    for (int idx = 0; idx < spinRing.size() - 1; idx++) { // stage to remove flits
+    int idx = 0;
+    for (; idx < num_slots && num_pkts < spun_pkt_num; idx++) { // stage to remove flits
         // 1. get the id of the inputUnit in that direction for
         // the given router
-        Router* router = m_routers[spinRing[idx].router_id_];
-
-        int inport = router->m_routing_unit\
-                                ->m_inports_dirn2idx[spinRing[idx].inport_dir_];
+        spinStruct &slot = spinRing[idx];
+        Router* router = slot.router_;
+        int inport = slot.inport_;
         if(router->get_inputUnit_ref()[inport]->vc_isEmpty(vc_)) {
             // 'idx+1' node alredy populated with 'NULL' for member flit_
             // populate every flit...
@@ -311,21 +367,18 @@ GarnetNetwork::doSpin(int vc_) {
             // take this flit out... and put it in the next node
             //////////////////////////////////////////////////
             //
-            flit* t_flit = router->get_inputUnit_ref()[inport]->peekTopFlit(vc_);
-            std::vector<int> pref_outport = router->m_routing_unit\
-                               ->lookupRoutingTable_pref_outport(t_flit->get_vnet(),
-                               t_flit->get_route().net_dest);
-            spinRing[idx+1].flit_ =
-                    router->get_inputUnit_ref()[inport]->getTopFlit(vc_); // ptr-cpy
+            flit* t_flit = router->get_inputUnit_ref()[inport]->getTopFlit(vc_); // ptr-cpy
+            spinRing[idx+1].flit_ = t_flit;
             num_pkts++;
+
+            // forward progress if any of the minimal outports of the
+            // flit leads to the next router on the ring
+            const std::vector<int>& pref_outport = router->m_routing_unit\
+                               ->lookupRoutingTable_pref_outport(
+                               t_flit->get_route().dest_ni);
             int idx_;
             for (idx_ = 0; idx_ < pref_outport.size(); idx_++) {
-                // check if the outport leads to router_id
-                // present at spinRing[idx+1].router_id_
-                // cout << pref_outport[idx_] << " ";
-                PortDirection next_hop_dir_ = \
-                router->get_outputUnit_ref().at(pref_outport[idx_])->get_direction();
-                int pref_router_id = get_upstreamId(next_hop_dir_, router->get_id());
+                int pref_router_id = slot.outport_neighbor_[pref_outport[idx_]];
                 assert(pref_router_id != -1);
                 if (pref_router_id == spinRing[idx+1].router_id_) {
                     // update the 'm_fwd_progress++'
@@ -341,10 +394,10 @@ GarnetNetwork::doSpin(int vc_) {
 
 
             // update the hops_needed_efore_spin, in the flit here
-            assert(spinRing[idx+1].flit_->hops_needed_before_spin == -1);\
+            assert(t_flit->hops_needed_before_spin == -1);
 
-            spinRing[idx+1].flit_->hops_needed_before_spin = router\
-                                             ->compute_hops_remaining(spinRing[idx+1].flit_);
+            t_flit->hops_needed_before_spin = router\
+                                             ->compute_hops_remaining(t_flit);
 
             // set vc idle:
             router->get_inputUnit_ref()[inport]->set_vc_idle(vc_/*vc-id*/, curCycle());
@@ -352,45 +405,41 @@ GarnetNetwork::doSpin(int vc_) {
             // from whichever router's input port you are taking out flit..
             // increment the credits in the outVC state of corresponding
             // upstream router.. and update the vc_state for outvc.
-            Router* upstream_router = get_upstreamrouter(spinRing[idx].inport_dir_,
-                                                            router->get_id());
+            Router* upstream_router = slot.upstream_router_;
             assert(upstream_router != nullptr);
             // now you have got the upstream router...mark the outvc0 as IDLE and
             // increment credit.
-            PortDirection outportDirn = get_upstreamOutportDirn(spinRing[idx].inport_dir_);
-            assert(outportDirn != "Local");
-            int outport = upstream_router->m_routing_unit\
-                                                    ->m_outports_dirn2idx[outportDirn];
+            int outport = slot.upstream_outport_;
 
             upstream_router->get_outputUnit_ref()[outport]->increment_credit(vc_);
             upstream_router->get_outputUnit_ref()[outport]->set_vc_state(IDLE_, vc_, curCycle());
         }
     }
-    // cout << "Packets actually spun: " << num_pkts << endl;
+    // the rest of the ring is empty
+    m_bubble += num_slots - idx;
+    int last_slot = idx;
     assert( spun_pkt_num == num_pkts );
-    // cout << "num_pkts spun: " << num_pkts << endl;
-    // print_spinRing();
-    // print out the spin-ring structure here...
 
     // Stage-2 of credit management...
     // decrement the credits in corresponding upstream router whenever
     // you insert the flit in the input port of the router, as guided
     // by deque--spinRing. update the vc state as well for both input vc
     // and outvc.
-    for (int idx = 1; idx < spinRing.size(); idx++) { // stage to insert flit.
+    for (idx = 1; idx <= last_slot; idx++) { // stage to insert flit.
 
         if(spinRing[idx].flit_ != nullptr) {
 
-            Router* router = m_routers[spinRing[idx].router_id_];
-
-            int inport = router->m_routing_unit\
-                                    ->m_inports_dirn2idx[spinRing[idx].inport_dir_];
+            spinStruct &slot = spinRing[idx];
+            Router* router = slot.router_;
+            int inport = slot.inport_;
             assert(inport < router->get_inputUnit_ref().size());
             flit *t_flit;
-            t_flit = spinRing[idx].flit_;
+            t_flit = slot.flit_;
+            // clean ring.
+            slot.flit_ = nullptr;
             num_pkts--;
             int outport = router->route_compute(t_flit->get_route(),
-                    inport, spinRing[idx].inport_dir_);
+                    inport, slot.inport_dir_);
 
             t_flit->set_outport(outport);
             assert(outport < router->get_outputUnit_ref().size());
@@ -401,7 +450,7 @@ GarnetNetwork::doSpin(int vc_) {
             t_flit->set_outport_dir(outdir);
             // increment the number of hops here for the flit
             t_flit->increment_hops();
-            router->get_inputUnit_ref()[inport]->m_vcs[vc_]->insertFlit(t_flit);
+            router->get_inputUnit_ref()[inport]->insertFlit(vc_, t_flit);
 
             // stats update:
             assert(t_flit->hops_needed_after_spin == -1);
@@ -420,31 +469,20 @@ GarnetNetwork::doSpin(int vc_) {
 
             //////////////////////////////////////////
             // decrement-credit from upstream router... and mark out-vc as active
-            Router* upstream_router = get_upstreamrouter(spinRing[idx].inport_dir_,
-                                                                router->get_id());
+            Router* upstream_router = slot.upstream_router_;
             assert(upstream_router != nullptr);
             // Mark outVC-0 of this router as ACTIVE_ and decrement credit.
-            PortDirection outportDirn = get_upstreamOutportDirn(spinRing[idx].inport_dir_);
-            assert(outportDirn != "Local");
-            int upstream_outport = upstream_router->m_routing_unit\
-                                        ->m_outports_dirn2idx[outportDirn];
+            int upstream_outport = slot.upstream_outport_;
             upstream_router->get_outputUnit_ref()[upstream_outport]->decrement_credit(vc_);
             upstream_router->get_outputUnit_ref()[upstream_outport]->set_vc_state(ACTIVE_,
                                                         vc_, curCycle());
 
 
         }
-        else {
-            // cout << "Not inserting at this iteration number.." << endl;
-        }
     }
 
     assert(num_pkts == 0);
     // scanNetwork();
-    // clean ring.
-    for(auto itr : spinRing ) {
-        itr.flit_ = nullptr; // ptr-cpy
-    }
 
     return;
 }
@@ -518,105 +556,113 @@ GarnetNetwork::wakeup_all_output_unit() {
     }
 }
 
-std::string drainoStateName(DrainoStates state) {
-    switch (state) {
-        case DrainoStates::IDLE:
-            return "IDLE";
-        case DrainoStates::IDLE_LAST:
-            return "IDLE_LAST";
-        case DrainoStates::INCREASE_SET:
-            return "INCREASING_SET";
-        case DrainoStates::INCREASE_TEST:
-            return "INCREASING_TEST";
-        case DrainoStates::DECREASE_SET:
-            return "DECREASING_SET";
-        case DrainoStates::DECREASE_TEST:
-            return "DECREASING_TEST";
-    }
-    return "UNKNOWN";
-}
-
 void
 GarnetNetwork::wakeup() {
     if (true) {
-        DPRINTF(Draino, "Start. State = %s, Frequency = %d\n", drainoStateName(draino_state), m_spin_thrshld);
-
-        // Compute aggregate flit latency across all VCs.
         // For the time being, this uses network-level stats.
         // TODO: use more realistic router-level information (note, given drain relies on no need for coordination, not super realistic.)
-        int aggregate_latency = 0;
-        int aggregate_flits = 0;
+        double average_flit_latency =
+            m_draino_estimator->update(m_window_flit_network_latency,
+                                       m_window_flits_received);
+        m_window_flit_network_latency = 0;
+        m_window_flits_received = 0;
+        DPRINTF(Draino, "average flit latency %f\n", average_flit_latency);
 
-        for (int i_vnet=0; i_vnet < m_virtual_networks; i_vnet++) {
-            aggregate_latency += m_flit_network_latency[i_vnet].value();
-            aggregate_flits += m_flits_received[i_vnet].value();
-        }
+        // No flits received yet, so keep the current frequency
+        if (std::isnan(average_flit_latency))
+            return;
 
-        double average_flit_latency = (double) aggregate_latency / (double) aggregate_flits;
-        DPRINTF(Draino, "average flit latency %f\n", average_flit_latency);
-        
-        switch (draino_state) {
-            case DrainoStates::IDLE:
-                draino_elapsed_idle_cycles += 1;
-                if (draino_elapsed_idle_cycles == draino_idle_cycles) {
-                    draino_state = DrainoStates::IDLE_LAST;
-                }
-                break;
-            case DrainoStates::IDLE_LAST:
-                draino_elapsed_idle_cycles = 0;
-                draino_previous_frequency = average_flit_latency;
-
-                if (draino_last_increased) {
-                    draino_state = DrainoStates::DECREASE_SET;
-                    draino_last_increased = false;
-                } else {
-                    draino_state = DrainoStates::INCREASE_SET;
-                    draino_last_increased = true;
-                }
-                break;
-            case DrainoStates::INCREASE_SET:
-                DPRINTF(Draino, "increasing frequency.\n");
-                draino_previous_frequency = m_spin_thrshld;
-                m_spin_thrshld = draino_previous_frequency * 2;
-                draino_last_latency = average_flit_latency;
-                draino_state = DrainoStates::INCREASE_TEST;
-                break;
-            case DrainoStates::INCREASE_TEST:
-                if (average_flit_latency - draino_last_latency > draino_latency_threshold) {
-                    DPRINTF(Draino, "average latency increased.\n");
-                    m_spin_thrshld = draino_previous_frequency;
-                    draino_state = DrainoStates::IDLE;
-                } else {
-                    DPRINTF(Draino, "average latency decreased or level.\n");
-                    draino_state = INCREASE_SET;
-                }
-                break;
+        int frequency =
+            m_draino_policy->update(m_spin_thrshld, average_flit_latency);
+        recordDrainoDecision(frequency, average_flit_latency);
+        m_spin_thrshld = frequency;
+    }
+}
 
-            case DrainoStates::DECREASE_SET:
-                DPRINTF(Draino, "decreasing frequency.\n");
-                if (m_spin_thrshld <= 4) {
-                    draino_state = DrainoStates::IDLE;
-                    break;
-                }
-                draino_previous_frequency = m_spin_thrshld;
-                m_spin_thrshld = draino_previous_frequency / 2;
-                draino_last_latency = average_flit_latency;
-                draino_state = DrainoStates::DECREASE_TEST;
-                break;
-            case DrainoStates::DECREASE_TEST:
-                if (average_flit_latency - draino_last_latency > draino_latency_threshold) {
-                    DPRINTF(Draino, "average latency increased.\n");
-                    m_spin_thrshld = draino_previous_frequency;
-                    draino_state = DrainoStates::IDLE;
-                } else {
-                    DPRINTF(Draino, "average latency decreased or level.\n");
-                    draino_state = DECREASE_SET;
-                }
-                break;
+void
+GarnetNetwork::recordDrainoDecision(int frequency, double latency)
+{
+    unsigned decision = m_draino_decisions.value();
+    if (decision < m_draino_series_length) {
+        m_draino_frequency_series[decision] = frequency;
+        m_draino_latency_series[decision] = latency;
+        m_draino_cycle_series[decision] = curCycle();
+    }
+
+    m_draino_decisions++;
+    if (frequency != (int) m_spin_thrshld) {
+        DPRINTF(Draino, "frequency %d -> %d\n", m_spin_thrshld, frequency);
+        m_draino_frequency_changes++;
+    }
+}
+
+void
+GarnetNetwork::wakeupRouters(Router *router)
+{
+    if (!canRunInParallel(router)) {
+        router->evaluate();
+        return;
+    }
+
+    // The event of this router has just been taken off the event queue.
+    // Take along the router wakeups that the queue would run next, at the
+    // same tick. Stop at any other event, since links and NIs move flits
+    // and credits between routers.
+    m_router_batch.clear();
+    m_router_batch.push_back(router);
+    while (true) {
+        Event *head = eventQueue()->getHead();
+        if (head == nullptr || head->when() != curTick() ||
+            head->squashed()) {
+            break;
         }
+        RouterWakeupEvent *event = dynamic_cast<RouterWakeupEvent *>(head);
+        if (event == nullptr || !canRunInParallel(event->getRouter())) {
+            break;
+        }
+        m_router_batch.push_back(event->getRouter());
+        deschedule(event);
+    }
+
+    if (m_router_batch.size() == 1) {
+        router->evaluate();
+        return;
+    }
+
+    m_router_batches++;
+    m_batched_routers += m_router_batch.size();
+    m_in_parallel_phase = true;
+    m_thread_pool->run(m_router_batch);
+    m_in_parallel_phase = false;
+
+    // In the order the routers would have run in
+    for (int i = 0; i < m_router_batch.size(); i++) {
+        m_router_batch[i]->commitDeferred();
+    }
+}
+
+bool
+GarnetNetwork::canRunInParallel(Router *router)
+{
+    // Only table and XY routing look at nothing but the router itself
+    if (m_routing_algorithm != TABLE_ && m_routing_algorithm != XY_) {
+        return false;
+    }
+
+    if (DTRACE(RubyNetwork) || DTRACE(Draino)) {
+        return false;
+    }
 
-        DPRINTF(Draino, "-----> %s\n", drainoStateName(draino_state));
+    // Cycles in which a router may start, check or perform a drain,
+    // which reaches into every router and link
+    if (m_spin) {
+        uint64_t epoch_cycle = router->curCycle() % m_spin_thrshld;
+        if (epoch_cycle < 3 || lock != -1) {
+            return false;
+        }
     }
+
+    return true;
 }
 
 void
@@ -640,6 +686,22 @@ GarnetNetwork::init()
     assert(m_topology_ptr != NULL);
     m_topology_ptr->createLinks(this);
 
+    // Routes are fixed from here on, so precompute the routing table
+    // lookups of every router
+    for (int i = 0; i < m_routers.size(); i++) {
+        m_routers[i]->m_routing_unit->buildCandidateTable(m_nodes);
+    }
+
+    if (m_routing_table_dump != "") {
+        OutputStream *os = simout.create(m_routing_table_dump);
+        std::ostream &out = *os->stream();
+        out << "# router dest_ni outport:direction..." << std::endl;
+        for (int i = 0; i < m_routers.size(); i++) {
+            m_routers[i]->m_routing_unit->printCandidateTable(out);
+        }
+        simout.close(os);
+    }
+
     // Initialize topology specific parameters
     if (getNumRows() > 0) {
         // Only for Mesh topology
@@ -653,6 +715,14 @@ GarnetNetwork::init()
         m_num_cols = -1;
     }
 
+    if (m_spin) {
+        init_spinRing_ports();
+    }
+
+    if (m_garnet_threads > 1) {
+        m_thread_pool = new RouterThreadPool(m_garnet_threads);
+    }
+
     // FaultModel: declare each router to the fault model
     if (isFaultModelEnabled()) {
         for (vector<Router*>::const_iterator i= m_routers.begin();
@@ -670,111 +740,141 @@ GarnetNetwork::init()
         }
     }
 
-    const char *trace_filename; //[100];
-    trace_filename = m_trace_filename.c_str();
-    //strcpy(trace_filename, m_trace_filename);
-    char  command_string[512];
+    if (m_trace_enable) {
+        m_trace_reader = new NetworkTraceReader(m_trace_filename,
+                                                m_trace_max_packets);
+    }
 
-    sprintf(command_string,"gunzip -c %s", trace_filename);
-    if (( tracefile= popen(command_string, "r")) == NULL){
-        printf("Command string is %s\n", command_string);
+    trace_num_packets_injected = 0;
+    trace_num_flits_injected = 0;
+    trace_num_flits_received = 0;
+
+    trace_start_time = 0;
+    if (m_trace_reader != nullptr && !m_trace_reader->done()) {
+        trace_start_time = m_trace_reader->peek()->time;
     }
 
-    // Read first thirteen lines of the trace
-    int count = 13;
-    char trstring [1000];
+    // Initialize next packet
+    updateTraceNextPacket();
 
-    while (count > 0) {
-        if ( fgets (trstring , 1000, tracefile) != NULL ) {
-            count--;
-            //puts (trstring);
-        } else {
-            break;
-        }
+//    scheduleWakeupAbsolute(curCycle() + Cycles(1));
+	Sequencer::gnet = this;
+
+    if (m_saturation_latency > 0 || m_saturation_backlog > 0) {
+        assert(m_saturation_check_period > 0);
+        schedule(saturationCheckEvent,
+                 clockEdge(m_saturation_check_period));
     }
+}
 
-/*
-    char trstring [1000];
-    bool done = false;
+static NetworkTraceRecord
+toTraceRecord(const NetworkTraceFileRecord &record, int start_time)
+{
+    NetworkTraceRecord packet;
+    packet.valid = true;
+    packet.time = Cycles(record.time - start_time);
+    packet.src_id = record.src_ni;
+    packet.src_router_id = record.src_router;
+    packet.dest_id = record.dest_ni;
+    packet.dest_router_id = record.dest_router;
+    packet.vnet = record.vnet;
+    packet.num_flits = record.num_flits;
+    return packet;
+}
+
+void
+GarnetNetwork::getTracePackets(Cycles now,
+                               std::vector<NetworkTraceRecord> &packets)
+{
+    packets.clear();
+    if (m_trace_reader == nullptr) {
+        return;
+    }
+
+    const NetworkTraceFileRecord *begin, *end;
+    m_trace_reader->advance(Cycles(now + trace_start_time), &begin, &end);
+    for (const NetworkTraceFileRecord *it = begin; it != end; ++it) {
+        packets.push_back(toTraceRecord(*it, trace_start_time));
+    }
 
-    // Read trace up to point when packets start
-    while (!done) {
-        if ( fgets (trstring , 1000, tracefile) != NULL ) {
-            puts (trstring);
+    updateTraceNextPacket();
+}
+
+// trace_next_packet is the first packet not handed out yet
+void
+GarnetNetwork::updateTraceNextPacket()
+{
+    const NetworkTraceFileRecord *next = nullptr;
+    if (m_trace_reader != nullptr) {
+        next = m_trace_reader->peek();
+    }
 
-            // Step 2: Get tokens
+    if (next != nullptr) {
+        trace_next_packet = toTraceRecord(*next, trace_start_time);
+    } else {
+        trace_next_packet.valid = false;
+        trace_next_packet.time = Cycles(0);
+        trace_next_packet.src_id = -1;
+        trace_next_packet.dest_id = -1;
+    }
+}
 
-            // array to store memory addresses of the tokens in buf
-            const char* first_token;
+void
+GarnetNetwork::checkSaturation()
+{
+    double total_latency = 0;
+    double total_flits = 0;
+    for (int i_vnet = 0; i_vnet < m_virtual_networks; i_vnet++) {
+        total_latency += m_flit_network_latency[i_vnet].value() +
+                         m_flit_queueing_latency[i_vnet].value();
+        total_flits += m_flits_received[i_vnet].value();
+    }
 
-            first_token = strtok(trstring, " "); // first token
-            std::string trace_start = "info";
+    bool saturated = false;
 
-            if (strcmp(first_token, trace_start.c_str())) {
-                done = true;
-            }
-        } else {
-            done = true;
+    if (m_saturation_latency > 0 && total_flits > 0) {
+        double average_flit_latency = total_latency / total_flits;
+        if (average_flit_latency > m_saturation_latency) {
+            inform("Average flit latency %f exceeded %f at cycle %d\n",
+                   average_flit_latency, m_saturation_latency, curCycle());
+            saturated = true;
         }
     }
-*/
-    trace_num_packets_injected = 0;
-    trace_num_flits_injected = 0;
-    trace_num_flits_received = 0;
 
-    trace_start_time = 0;
+    if (m_saturation_backlog > 0) {
+        double total_backlog = 0;
+        for (int i = 0; i < m_nis.size(); i++) {
+            total_backlog += m_nis[i]->get_backlog();
+        }
 
-    // Initialize next packet
-    trace_next_packet.valid = false;
-    trace_next_packet.time = Cycles(0);
-    trace_next_packet.src_id = -1;
-    trace_next_packet.dest_id = -1;
-
-    /*
-    // Trace Read
-    ifstream fin;
-    fin.open("data.txt");
-    if (!fin.good())
-        exit(0);
-
-    // read each line of the file
-    while (!fin.eof())
-    {
-        // read an entire line into memory
-        char buf[MAX_CHARS_PER_LINE];
-        fin.getline(buf, MAX_CHARS_PER_LINE);
-
-        // parse the line into blank-delimited tokens
-        int n = 0; // loop idex
-
-        // array to store memory addresses of the tokens in buf
-        const char* token[MAX_TOKENS_PER_LINE] = {}; // initialize to 0
-
-        // parse the line
-        token[0] = strtok(buf, DELIMITER); // first token
-        if (token[0]) // zero if line is blank
-        {
-            for (n = 1; n < MAX_TOKENS_PER_LINE; n++)
-            {
-                token[n] = strtok(0, DELIMITER); // subsequent tokens
-                if (!token[n]) break; // no more tokens
-            }
+        double average_backlog = total_backlog / m_nis.size();
+        if (average_backlog > m_saturation_backlog) {
+            inform("Average NI backlog %f exceeded %f at cycle %d\n",
+                   average_backlog, m_saturation_backlog, curCycle());
+            saturated = true;
         }
+    }
 
-        // process (print) the tokens
-        for (int i = 0; i < n; i++) // n = #of tokens
-            DPRINTF(NetworkTrace, "Token[%d] = %s\n", i, token[i]);
+    if (saturated) {
+        m_saturated_at_cycle = curCycle();
+        exitSimLoop("Network saturated");
+    } else {
+        schedule(saturationCheckEvent,
+                 clockEdge(m_saturation_check_period));
     }
-    */
+}
 
-//    scheduleWakeupAbsolute(curCycle() + Cycles(1));
-	Sequencer::gnet = this;
+void
+GarnetNetwork::resetSaturation()
+{
+    m_saturated_at_cycle = 0;
 
-    // Draino State Init
-    draino_last_latency = 0;
-    draino_state = DrainoStates::IDLE;
-    draino_last_increased = true;
-    draino_previous_frequency = 0;
+    if (m_saturation_latency > 0 || m_saturation_backlog > 0) {
+        if (saturationCheckEvent.scheduled())
+            deschedule(saturationCheckEvent);
+        schedule(saturationCheckEvent,
+                 clockEdge(m_saturation_check_period));
+    }
 }
 
 void
@@ -997,6 +1097,10 @@ GarnetNetwork::~GarnetNetwork()
     deletePointers(m_nis);
     deletePointers(m_networklinks);
     deletePointers(m_creditlinks);
+    delete m_draino_estimator;
+    delete m_draino_policy;
+    delete m_trace_reader;
+    delete m_thread_pool;
 }
 
 /*
@@ -1180,6 +1284,48 @@ GarnetNetwork::regStats()
     m_pre_mature_exit
         .name(name() + ".pre_mature_exit");
 
+    m_saturated_at_cycle
+        .name(name() + ".saturated_at_cycle");
+
+    m_flit_pool_allocations
+        .name(name() + ".flit_pool.allocations");
+    m_flit_pool_slabs
+        .name(name() + ".flit_pool.slabs");
+    m_flit_pool_peak_live
+        .name(name() + ".flit_pool.peak_live");
+    m_credit_pool_allocations
+        .name(name() + ".credit_pool.allocations");
+    m_credit_pool_slabs
+        .name(name() + ".credit_pool.slabs");
+    m_credit_pool_peak_live
+        .name(name() + ".credit_pool.peak_live");
+
+    m_router_batches
+        .name(name() + ".router_batches");
+    m_batched_routers
+        .name(name() + ".batched_routers");
+
+    // DrainO decisions
+    m_draino_decisions
+        .name(name() + ".draino_decisions");
+    m_draino_frequency_changes
+        .name(name() + ".draino_frequency_changes");
+    m_draino_frequency_series
+        .init(m_draino_series_length)
+        .name(name() + ".draino_frequency_series")
+        .flags(Stats::nozero)
+        ;
+    m_draino_latency_series
+        .init(m_draino_series_length)
+        .name(name() + ".draino_latency_series")
+        .flags(Stats::nozero)
+        ;
+    m_draino_cycle_series
+        .init(m_draino_series_length)
+        .name(name() + ".draino_cycle_series")
+        .flags(Stats::nozero)
+        ;
+
     total_pre_drain_deadlock
         .name(name() + ".total_pre_drain_deadlock");
 
@@ -1555,6 +1701,18 @@ GarnetNetwork::regStats()
 
 }
 
+void
+GarnetNetwork::resetStats()
+{
+    Network::resetStats();
+
+    m_window_flit_network_latency = 0;
+    m_window_flits_received = 0;
+    m_draino_estimator->reset();
+    FlitPool<flit>::resetStats();
+    FlitPool<Credit>::resetStats();
+}
+
 void
 GarnetNetwork::collateStats()
 {
@@ -1585,6 +1743,13 @@ GarnetNetwork::collateStats()
     for (int i = 0; i < m_routers.size(); i++) {
         m_routers[i]->collateStats();
     }
+
+    m_flit_pool_allocations = FlitPool<flit>::allocations();
+    m_flit_pool_slabs = FlitPool<flit>::slabs();
+    m_flit_pool_peak_live = FlitPool<flit>::peakLive();
+    m_credit_pool_allocations = FlitPool<Credit>::allocations();
+    m_credit_pool_slabs = FlitPool<Credit>::slabs();
+    m_credit_pool_peak_live = FlitPool<Credit>::peakLive();
 }
 
 void
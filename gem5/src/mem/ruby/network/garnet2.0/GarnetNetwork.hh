@@ -38,13 +38,17 @@
 #include <vector>
 #include <deque>
 
+#include "base/trace.hh"
+#include "debug/Draino.hh"
 #include "mem/ruby/common/Consumer.hh"
 //#include "debug/NetworkTrace.hh"
 #include "mem/ruby/network/Network.hh"
 #include "mem/ruby/network/fault_model/FaultModel.hh"
 #include "mem/ruby/network/garnet2.0/CommonTypes.hh"
+#include "mem/ruby/network/garnet2.0/DrainoPolicy.hh"
 #include "mem/ruby/network/garnet2.0/flit.hh"
 #include "params/GarnetNetwork.hh"
+#include "sim/eventq.hh"
 #include "sim/sim_exit.hh"
 
 
@@ -53,6 +57,8 @@ using namespace std;
 class FaultModel;
 class NetworkInterface;
 class Router;
+class RouterThreadPool;
+class NetworkTraceReader;
 class NetDest;
 class NetworkLink;
 class CreditLink;
@@ -70,19 +76,6 @@ struct NetworkTraceRecord {
 };
 
 
-enum DrainoStates {
-  IDLE,
-  IDLE_LAST,
-  
-  INCREASE_SET,
-  INCREASE_MEASURE,
-  INCREASE_TEST,
-
-  DECREASE_SET,
-  DECREASE_MEASURE,
-  DECREASE_TEST,
-};
-
 class GarnetNetwork : public Network, public Consumer
 {
   public:
@@ -111,7 +104,14 @@ class GarnetNetwork : public Network, public Consumer
     FaultModel* fault_model;
 
     bool isTraceEnabled() const { return m_trace_enable; }
+    bool isIdleRouterSkipping() const { return m_idle_router_skipping; }
+    bool isPartitioned() const { return m_thread_pool != nullptr; }
     std::string getTraceFilename() const { return m_trace_filename; }
+    // The packets of the network trace due up to and including cycle
+    // now, as a single batch. Trace times are relative to the first
+    // packet of the trace.
+    void getTracePackets(Cycles now,
+                         std::vector<NetworkTraceRecord> &packets);
 
 
     // Internal configuration
@@ -147,6 +147,7 @@ class GarnetNetwork : public Network, public Consumer
     // Stats
     void collateStats();
     void regStats();
+    void resetStats();
     void print(std::ostream& out) const;
 
     bool check_mrkd_flt(void);
@@ -261,6 +262,7 @@ class GarnetNetwork : public Network, public Consumer
 
     void increment_received_flits(int vnet, bool marked) {
      m_flits_received[vnet]++;
+     m_window_flits_received++;
      // transfer all numbers to stat variable:
      m_max_flit_latency = max_flit_latency;
      m_max_flit_network_latency = max_flit_network_latency;
@@ -303,10 +305,19 @@ class GarnetNetwork : public Network, public Consumer
     }
 
 
+    // Network latency of the flits received in the current DrainO
+    // window, i.e. since the last DrainO decision
+    double
+    window_flit_network_latency() const
+    {
+        return m_window_flit_network_latency / m_window_flits_received;
+    }
+
     void
     increment_flit_network_latency(Cycles latency, int vnet, bool marked)
     {
         m_flit_network_latency[vnet] += latency;
+        m_window_flit_network_latency += (uint64_t)latency;
         if(marked == true) {
             m_marked_flt_network_latency[vnet] += latency;
             total_marked_flit_latency += (uint64_t)latency;
@@ -355,6 +366,27 @@ class GarnetNetwork : public Network, public Consumer
         }
     }
 
+    // Exit the simulation loop once the network is saturated,
+    // as configured by the saturation_* params.
+    void checkSaturation();
+    EventFunctionWrapper saturationCheckEvent;
+    // Start checking for saturation afresh, e.g. in a process forked
+    // from a warm-up that may already have saturated
+    void resetSaturation();
+
+    // Partitioned router engine (garnet_threads > 1). A router that wakes
+    // up takes the router wakeups queued right behind it, for the same
+    // tick, out of the event queue, and the batch is evaluated across the
+    // worker threads. Routers only share state through links, which do
+    // not run within the batch, and what a router does outside of itself
+    // is held back and applied in event order once the batch is done. So
+    // the event queue and the stats end up as with serial wakeups.
+    void wakeupRouters(Router *router);
+    bool canRunInParallel(Router *router);
+    // Set while a batch of routers is evaluated. Routers then hold back
+    // their side effects, see Router::commitDeferred().
+    bool inParallelPhase() const { return m_in_parallel_phase; }
+
     void scheduleAll_wakeup(void);
     void scheduleAll_wakeup(uint32_t k);
     void scheduleAll_wakeup_next_k_cycles(uint32_t k);
@@ -365,6 +397,13 @@ class GarnetNetwork : public Network, public Consumer
     bool chck_link_state();
     void doSpin( int vc_ );
     void init_spinRing();
+    void init_spinRing_ports();
+
+    // Number of non-Local input VCs, across all routers, with the given
+    // VC id that have at least one flit.
+    void increment_occupied_vcs(int vc) { m_occupied_vcs[vc]++; }
+    void decrement_occupied_vcs(int vc) { m_occupied_vcs[vc]--; }
+    std::vector<int> m_occupied_vcs;
     void set_flit_time(int vc_);
     void wakeup_all_input_unit();
     void wakeup_all_output_unit();
@@ -399,9 +438,20 @@ class GarnetNetwork : public Network, public Consumer
                     inport_dir_( dirn_)
         {
             flit_ = nullptr;
+            router_ = nullptr;
+            inport_ = -1;
+            upstream_router_ = nullptr;
+            upstream_outport_ = -1;
         }
         int router_id_;
         PortDirection inport_dir_;
+        // resolved by init_spinRing_ports(), once the links exist
+        Router* router_;
+        int inport_;
+        Router* upstream_router_;
+        int upstream_outport_;
+        // id of the router behind each outport of router_
+        std::vector<int> outport_neighbor_;
         // flit that needs to be put in the router
         // at above populated router-id and inputport
         // unit.. we are always using vc-0
@@ -421,6 +471,25 @@ class GarnetNetwork : public Network, public Consumer
     uint64_t post_drain_deadlock_cycle_idx;
     Stats::Scalar m_pre_mature_exit;
 
+    double m_saturation_latency;
+    double m_saturation_backlog;
+    Cycles m_saturation_check_period;
+    // Cycle at which the network was found saturated, 0 if it never was
+    Stats::Scalar m_saturated_at_cycle;
+
+    // FlitPool usage
+    Stats::Scalar m_flit_pool_allocations;
+    Stats::Scalar m_flit_pool_slabs;
+    Stats::Scalar m_flit_pool_peak_live;
+    Stats::Scalar m_credit_pool_allocations;
+    Stats::Scalar m_credit_pool_slabs;
+    Stats::Scalar m_credit_pool_peak_live;
+
+    // Partitioned router engine: batches of routers evaluated in
+    // parallel, and the routers in them
+    Stats::Scalar m_router_batches;
+    Stats::Scalar m_batched_routers;
+
     uint64_t marked_flt_injected;
     uint64_t marked_flt_received;
     uint64_t marked_pkt_injected;
@@ -460,6 +529,12 @@ class GarnetNetwork : public Network, public Consumer
     bool m_trace_enable;
     std::string m_trace_filename;
     int m_trace_max_packets;
+    std::string m_routing_table_dump;
+    bool m_idle_router_skipping;
+    int m_garnet_threads;
+    RouterThreadPool *m_thread_pool;
+    std::vector<Router *> m_router_batch;
+    bool m_in_parallel_phase;
 
     // Statistical variables
     Stats::Vector m_network_latency_histogram;
@@ -558,7 +633,8 @@ class GarnetNetwork : public Network, public Consumer
     std::vector<NetworkInterface *> m_nis;   // All NI's in Network
 
     // Trace File
-    FILE * tracefile;
+    NetworkTraceReader *m_trace_reader;
+    void updateTraceNextPacket();
     NetworkTraceRecord trace_next_packet;
     int trace_num_packets_injected; // number of packets injected so far
     int trace_num_flits_injected;
@@ -581,16 +657,24 @@ class GarnetNetwork : public Network, public Consumer
     int draino_idle_cycles;
 
     // Runtime State
-    // Latency value at the state of the measurement period.
-    double draino_last_latency;
-    // Frequency before the current experiment.
-    int draino_previous_frequency = 0;
-    // Total cycles spent in idle, so far.
-    int draino_elapsed_idle_cycles = 0;
-    // Current state of the draino FSM.
-    DrainoStates draino_state;
-    // Type of the last experiment, used to alternate between them.
-    bool draino_last_increased = false;
+    // Turns latency stats into the signal that the policy reacts to.
+    DrainoLatencyEstimator *m_draino_estimator;
+    // Picks the frequency of the next epoch.
+    DrainoPolicy *m_draino_policy;
+
+    // Every frequency decision, in order, for the first
+    // draino_series_length decisions since the last stats reset.
+    void recordDrainoDecision(int frequency, double latency);
+    unsigned m_draino_series_length;
+    Stats::Scalar m_draino_decisions;
+    Stats::Scalar m_draino_frequency_changes;
+    Stats::Vector m_draino_frequency_series;
+    Stats::Vector m_draino_latency_series;
+    Stats::Vector m_draino_cycle_series;
+
+    // Accumulators of the current DrainO window.
+    double m_window_flit_network_latency;
+    double m_window_flits_received;
 };
 
 inline std::ostream&
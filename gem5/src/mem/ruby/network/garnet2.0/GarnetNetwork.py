@@ -28,6 +28,7 @@
 # Author: Tushar Krishna
 #
 
+from m5.SimObject import *
 from m5.params import *
 from m5.proxy import *
 from Network import RubyNetwork
@@ -57,8 +58,19 @@ class GarnetNetwork(RubyNetwork):
     enable_fault_model = Param.Bool(False, "enable network fault model");
     fault_model = Param.FaultModel(NULL, "network fault model");
     trace_enable = Param.Bool(False, "enable trace simulation");
-    trace_file  = Param.String(" ", "network trace input file");
+    trace_file  = Param.String(" ", "binary network trace input file, \
+                        see util/encode_network_trace.py");
     trace_max_packets = Param.Int(-1, "maximum trace packets to inject");
+    idle_router_skipping = Param.Bool(True, "only run the DRAIN checks \
+                        of routers that wake up with no flits or credits \
+                        to process")
+    garnet_threads = Param.UInt32(0, "0 or 1: run routers one event at a \
+                        time. N > 1: evaluate back-to-back router wakeups \
+                        together across N threads. Results do not depend \
+                        on N")
+    routing_table_dump = Param.String("", "file in the output directory \
+                        to dump the routing candidates of every router to. \
+                        Empty disables");
     garnet_deadlock_threshold = Param.UInt32(50000,
                               "network-level deadlock threshold")
     sim_type = Param.Int(Parent.sim_type, "simulation_type")
@@ -77,6 +89,29 @@ class GarnetNetwork(RubyNetwork):
     draino_freq = Param.UInt32(5, "run draino every N drain cycles")
     draino_idle_cycles = Param.UInt32(10, "once in idle, draino will wait this many cycles before continuing.")
     draino_latency_threshold = Param.Float(1, "draino will not react to a change in latency less than this magnitude.")
+    draino_policy = Param.String("hill_climb", "how draino picks the next frequency: 'hill_climb'|'golden_section'|'miad'")
+    draino_estimator = Param.String("cumulative", "latency signal draino reacts to: 'cumulative' since the last stats reset, or over recent epochs, as a sliding 'window' or an 'ewma'")
+    draino_window = Param.UInt32(8, "number of epochs in the 'window' latency estimator")
+    draino_ewma_alpha = Param.Float(0.25, "weight of the latest epoch in the 'ewma' latency estimator")
+    draino_min_freq = Param.UInt32(4, "lowest frequency draino will pick")
+    draino_max_freq = Param.UInt32(65536, "highest frequency the 'golden_section' and 'miad' policies will pick")
+    draino_search_tolerance = Param.Float(0.5, "'golden_section' stops once its interval is narrower than this, in log2 of the frequency")
+    draino_miad_factor = Param.Float(2, "'miad' multiplies the frequency by this while latency does not increase")
+    draino_miad_step = Param.UInt32(64, "'miad' decreases the frequency by this once latency increases")
+    draino_series_length = Param.UInt32(256, "number of draino decisions recorded in the draino_*_series stats")
+
+    # Early termination of saturated runs
+    saturation_latency = Param.Float(0, "exit once the running average \
+                        flit latency exceeds this many cycles. 0 disables")
+    saturation_backlog = Param.Float(0, "exit once the average number of \
+                        messages queued per network interface exceeds this. \
+                        0 disables")
+    saturation_check_period = Param.Cycles(1000,
+                        "cycles between checks for saturation")
+
+    cxx_exports = [
+        PyBindMethod("resetSaturation"),
+    ]
 
 class GarnetNetworkInterface(ClockedObject):
     type = 'GarnetNetworkInterface'
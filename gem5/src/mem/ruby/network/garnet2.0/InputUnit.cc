@@ -58,6 +58,8 @@ InputUnit::InputUnit(int id, PortDirection direction, Router *router)
     }
 
     creditQueue = new flitBuffer();
+    m_num_buffered_flits = 0;
+    m_is_local = (direction == "Local");
     // Instantiating the virtual channels
     m_vcs.resize(m_num_vcs);
     for (int i=0; i < m_num_vcs; i++) {
@@ -125,7 +127,7 @@ InputUnit::wakeup()
 
 
         // Buffer the flit
-        m_vcs[vc]->insertFlit(t_flit);
+        insertFlit(vc, t_flit);
 
         int vnet = vc/m_vc_per_vnet;
         // number of writes same as reads
@@ -152,11 +154,45 @@ InputUnit::wakeup()
     }
 }
 
+// All flits enter and leave the input VCs through these two, which keep
+// the network's count of occupied VCs up to date.
+void
+InputUnit::insertFlit(int vc, flit *t_flit)
+{
+    if (!m_is_local && m_vcs[vc]->isEmpty()) {
+        m_router->increment_occupied_vcs(vc);
+    }
+    m_vcs[vc]->insertFlit(t_flit);
+    m_num_buffered_flits++;
+}
+
+flit*
+InputUnit::getTopFlit(int vc)
+{
+    flit *t_flit = m_vcs[vc]->getTopFlit();
+    m_num_buffered_flits--;
+    if (!m_is_local && m_vcs[vc]->isEmpty()) {
+        m_router->decrement_occupied_vcs(vc);
+    }
+    return t_flit;
+}
+
+bool
+InputUnit::has_incoming_flit()
+{
+    return m_in_link->isReady(m_router->curCycle());
+}
+
 // Send a credit back to upstream router for this VC.
 // Called by SwitchAllocator when the flit in this VC wins the Switch.
 void
 InputUnit::increment_credit(int in_vc, bool free_signal, Cycles curTime)
 {
+    if (m_router->get_net_ptr()->inParallelPhase()) {
+        m_router->deferCredit(this, in_vc, free_signal, curTime);
+        return;
+    }
+
     Credit *t_credit = new Credit(in_vc, free_signal, curTime);
     creditQueue->insert(t_credit);
     m_credit_link->scheduleEventAbsolute(m_router->clockEdge(Cycles(1)));
@@ -111,11 +111,12 @@ class InputUnit : public Consumer
         return m_vcs[vc]->peekTopFlit();
     }
 
-    inline flit*
-    getTopFlit(int vc)
-    {
-        return m_vcs[vc]->getTopFlit();
-    }
+    flit* getTopFlit(int vc);
+    void insertFlit(int vc, flit *t_flit);
+
+    // Number of flits buffered across all input VCs
+    inline int get_num_buffered_flits() { return m_num_buffered_flits; }
+    bool has_incoming_flit();
 
     inline bool
     need_stage(int vc, flit_stage stage, Cycles time)
@@ -185,6 +186,9 @@ class InputUnit : public Consumer
     NetworkLink *m_in_link;
     CreditLink *m_credit_link;
     flitBuffer *creditQueue;
+    int m_num_buffered_flits;
+    // Local inports are not part of any spin-ring
+    bool m_is_local;
 
 
     // Statistical variables
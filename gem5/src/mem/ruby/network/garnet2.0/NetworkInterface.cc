@@ -616,6 +616,23 @@ NetworkInterface::checkReschedule()
     }
 }
 
+int
+NetworkInterface::get_backlog()
+{
+    int backlog = 0;
+    for (const auto& it : inNode_ptr) {
+        if (it != nullptr) {
+            backlog += it->getSize(clockEdge());
+        }
+    }
+
+    for (int vc = 0; vc < m_num_vcs; vc++) {
+        backlog += m_ni_out_vcs[vc]->getSize();
+    }
+
+    return backlog;
+}
+
 void
 NetworkInterface::print(std::ostream& out) const
 {
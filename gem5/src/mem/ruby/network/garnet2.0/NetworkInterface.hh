@@ -72,6 +72,8 @@ class NetworkInterface : public ClockedObject, public Consumer
     void print(std::ostream& out) const;
     int get_vnet(int vc);
     int get_router_id() { return m_router_id; }
+    // Messages and flits waiting to be injected into the network
+    int get_backlog();
     void init_net_ptr(GarnetNetwork *net_ptr) { m_net_ptr = net_ptr; }
 
     uint32_t functionalWrite(Packet *);
@@ -0,0 +1,135 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#include "mem/ruby/network/garnet2.0/NetworkTrace.hh"
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cstring>
+
+#include "base/logging.hh"
+
+static_assert(sizeof(NetworkTraceFileHeader) == 32,
+              "network trace header layout");
+static_assert(sizeof(NetworkTraceFileRecord) == 32,
+              "network trace record layout");
+
+const char NetworkTraceReader::Magic[8] = {
+    'G', 'N', 'E', 'T', 'T', 'R', 'C', '\0'
+};
+const uint32_t NetworkTraceReader::Version;
+
+NetworkTraceReader::NetworkTraceReader(const std::string &filename,
+                                       int64_t max_records)
+    : m_filename(filename), m_map(nullptr), m_map_size(0),
+      m_records(nullptr), m_num_records(0), m_cursor(0)
+{
+    int fd = open(filename.c_str(), O_RDONLY);
+    if (fd < 0)
+        fatal("Couldn't open the network trace %s\n", filename);
+
+    struct stat st;
+    if (fstat(fd, &st) < 0)
+        fatal("Couldn't stat the network trace %s\n", filename);
+    m_map_size = st.st_size;
+
+    NetworkTraceFileHeader file_header;
+    if (m_map_size < sizeof(file_header) ||
+        pread(fd, &file_header, sizeof(file_header), 0) !=
+            sizeof(file_header) ||
+        memcmp(file_header.magic, Magic, sizeof(Magic)) != 0) {
+        fatal("%s is not a binary network trace. Convert gzipped text "
+              "traces with util/encode_network_trace.py\n", filename);
+    }
+    fatal_if(file_header.version != Version,
+             "Network trace %s has version %d, expected %d\n", filename,
+             file_header.version, Version);
+    fatal_if(file_header.record_size != sizeof(NetworkTraceFileRecord),
+             "Network trace %s has %d byte records, expected %d\n",
+             filename, file_header.record_size,
+             sizeof(NetworkTraceFileRecord));
+
+    uint64_t text_offset = sizeof(file_header);
+    uint64_t records_offset =
+        text_offset + ((file_header.text_size + 7) & ~uint64_t(7));
+    fatal_if(records_offset + file_header.num_records *
+                 sizeof(NetworkTraceFileRecord) > m_map_size,
+             "Network trace %s is truncated\n", filename);
+
+    m_map = mmap(nullptr, m_map_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (m_map == MAP_FAILED)
+        fatal("Couldn't map the network trace %s\n", filename);
+    // The trace is mostly read front to back
+    madvise(m_map, m_map_size, MADV_SEQUENTIAL);
+
+    const char *base = static_cast<const char *>(m_map);
+    m_header.assign(base + text_offset, file_header.text_size);
+    m_records = reinterpret_cast<const NetworkTraceFileRecord *>(
+        base + records_offset);
+    m_num_records = file_header.num_records;
+    if (max_records >= 0 && uint64_t(max_records) < m_num_records)
+        m_num_records = max_records;
+}
+
+NetworkTraceReader::~NetworkTraceReader()
+{
+    if (m_map != nullptr)
+        munmap(m_map, m_map_size);
+}
+
+const NetworkTraceFileRecord *
+NetworkTraceReader::peek() const
+{
+    return done() ? nullptr : &m_records[m_cursor];
+}
+
+void
+NetworkTraceReader::seek(Cycles time)
+{
+    const NetworkTraceFileRecord *it = std::lower_bound(
+        m_records, m_records + m_num_records, uint64_t(time),
+        [](const NetworkTraceFileRecord &record, uint64_t t)
+        { return record.time < t; });
+    m_cursor = it - m_records;
+}
+
+void
+NetworkTraceReader::advance(Cycles now,
+                            const NetworkTraceFileRecord **begin,
+                            const NetworkTraceFileRecord **end)
+{
+    uint64_t first = m_cursor;
+    while (m_cursor < m_num_records && m_records[m_cursor].time <= now)
+        m_cursor++;
+
+    *begin = m_records + first;
+    *end = m_records + m_cursor;
+}
@@ -0,0 +1,104 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#ifndef __MEM_RUBY_NETWORK_GARNET2_0_NETWORKTRACE_HH__
+#define __MEM_RUBY_NETWORK_GARNET2_0_NETWORKTRACE_HH__
+
+#include <cstddef>
+#include <cstdint>
+#include <string>
+
+#include "base/types.hh"
+
+// Binary network trace, as written by util/encode_network_trace.py from
+// the gzipped text traces. All fields are little-endian:
+//
+//   NetworkTraceFileHeader
+//   text_size bytes of the text trace's header block, kept verbatim,
+//   padded with zeroes to a multiple of 8 bytes
+//   num_records NetworkTraceFileRecords, in non-decreasing time order
+//
+// Records are fixed-width, so the file is memory-mapped and read in
+// place, and any cycle can be found with a binary search.
+
+struct NetworkTraceFileHeader
+{
+    char magic[8];
+    uint32_t version;
+    uint32_t record_size;
+    uint64_t num_records;
+    uint64_t text_size;
+};
+
+struct NetworkTraceFileRecord
+{
+    uint64_t time;
+    int32_t src_ni;
+    int32_t src_router;
+    int32_t dest_ni;
+    int32_t dest_router;
+    int32_t vnet;
+    int32_t num_flits;
+};
+
+class NetworkTraceReader
+{
+  public:
+    // max_records < 0 reads the whole trace
+    NetworkTraceReader(const std::string &filename, int64_t max_records);
+    ~NetworkTraceReader();
+
+    // The header block of the text trace
+    const std::string &header() const { return m_header; }
+    uint64_t size() const { return m_num_records; }
+    bool done() const { return m_cursor == m_num_records; }
+
+    // Next record to be returned, nullptr once done
+    const NetworkTraceFileRecord *peek() const;
+
+    // Moves the cursor to the first record at or after time
+    void seek(Cycles time);
+
+    // Returns the records at or before now that have not been returned
+    // yet, all at once: [*begin, *end). Called once per cycle, the
+    // records of that cycle come out as a single batch.
+    void advance(Cycles now, const NetworkTraceFileRecord **begin,
+                 const NetworkTraceFileRecord **end);
+
+    static const char Magic[8];
+    static const uint32_t Version = 1;
+
+  private:
+    std::string m_filename;
+    void *m_map;
+    size_t m_map_size;
+    std::string m_header;
+    const NetworkTraceFileRecord *m_records;
+    uint64_t m_num_records;
+    uint64_t m_cursor;
+};
+
+#endif // __MEM_RUBY_NETWORK_GARNET2_0_NETWORKTRACE_HH__
@@ -152,10 +152,16 @@ OutputUnit::wakeup()
         if (t_credit->is_free_signal())
             set_vc_state(IDLE_, t_credit->get_vc(), m_router->curCycle());
 
-        delete t_credit;
+        m_router->deleteCredit(t_credit);
     }
 }
 
+bool
+OutputUnit::has_incoming_credit()
+{
+    return m_credit_link->isReady(m_router->curCycle());
+}
+
 flitBuffer*
 OutputUnit::getOutQueue()
 {
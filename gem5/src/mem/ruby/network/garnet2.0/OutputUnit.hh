@@ -59,6 +59,7 @@ class OutputUnit : public Consumer
     void increment_credit(int out_vc);
     bool has_credit(int out_vc);
     int getNumFreeVCs(int vnet);
+    bool has_incoming_credit();
     bool has_free_vc(int vnet);
     int select_free_vc(int vnet);
 
@@ -93,7 +94,8 @@ class OutputUnit : public Consumer
     insert_flit(flit *t_flit)
     {
         m_out_buffer->insert(t_flit);
-        m_out_link->scheduleEventAbsolute(m_router->clockEdge(Cycles(1)));
+        m_router->scheduleConsumer(m_out_link,
+                                   m_router->clockEdge(Cycles(1)));
     }
 
     uint32_t functionalWrite(Packet *pkt);
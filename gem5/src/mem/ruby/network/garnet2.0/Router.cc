@@ -34,7 +34,9 @@
 #include "mem/ruby/network/garnet2.0/Router.hh"
 
 #include "base/stl_helpers.hh"
+#include "debug/Draino.hh"
 #include "debug/RubyNetwork.hh"
+#include "mem/ruby/network/garnet2.0/Credit.hh"
 #include "mem/ruby/network/garnet2.0/CreditLink.hh"
 #include "mem/ruby/network/garnet2.0/CrossbarSwitch.hh"
 #include "mem/ruby/network/garnet2.0/GarnetNetwork.hh"
@@ -65,6 +67,10 @@ Router::Router(const Params *p)
 
     halt_ = false;
 
+    m_deferred_occupied_vcs.assign(m_num_vcs, 0);
+    m_deferred_uturn_requests = 0;
+    m_deferred_successful_uturns = 0;
+    m_deferred_misroutes = 0;
 }
 
 Router::~Router()
@@ -111,6 +117,17 @@ Router::vcStateDump()
 
 void
 Router::wakeup()
+{
+    if (get_net_ptr()->isPartitioned()) {
+        get_net_ptr()->wakeupRouters(this);
+        return;
+    }
+
+    evaluate();
+}
+
+void
+Router::evaluate()
 {
     DPRINTF(RubyNetwork, "Router %d woke up. Halt = %s\n", m_id, halt_?"True":"False");
 
@@ -119,33 +136,31 @@ Router::wakeup()
     #endif
 
     // DRAINO: Tune the drain period based on feedback.
-    // Compute aggregate flit latency across all VCs.
     // For the time being, this uses network-level stats.
     // TODO: use more realistic router-level information (note, given drain relies on no need for coordination, not super realistic.)
-    int aggregate_latency = 0;
-    int aggregate_flits = 0;
-
-    for (int i_vnet=0; i_vnet < m_virtual_networks; i_vnet++) {
-        aggregate_latency += get_net_ptr()->m_flit_network_latency[i_vnet].value();
-        aggregate_flits += get_net_ptr()->m_flits_received[i_vnet].value();
-    }
-
-    double average_flit_latency = (double) aggregate_latency / (double) aggregate_flits;
-    DPRINTF(RubyNetwork, "drano: average flit latency %f\n", average_flit_latency);
-
-    // check for incoming flits
-    for (int inport = 0; inport < m_input_unit.size(); inport++) {
-        m_input_unit[inport]->wakeup();
-    }
+    DPRINTF(Draino, "Router %d: average flit latency in window %f\n",
+            m_id, get_net_ptr()->window_flit_network_latency());
+
+    // Routers are woken for every DRAIN epoch, whether or not they have
+    // anything to do. An idle router only takes part in the DRAIN
+    // protocol below, the rest of its pipeline would be a no-op.
+    bool idle = get_net_ptr()->isIdleRouterSkipping() && is_idle(true);
+
+    if (!idle) {
+        // check for incoming flits
+        for (int inport = 0; inport < m_input_unit.size(); inport++) {
+            m_input_unit[inport]->wakeup();
+        }
 
-    // check for incoming credits
-    // Note: the credit update is happening before SA
-    // buffer turnaround time =
-    //     credit traversal (1-cycle) + SA (1-cycle) + Link Traversal (1-cycle)
-    // if we want the credit update to take place after SA, this loop should
-    // be moved after the SA request
-    for (int outport = 0; outport < m_output_unit.size(); outport++) {
-        m_output_unit[outport]->wakeup();
+        // check for incoming credits
+        // Note: the credit update is happening before SA
+        // buffer turnaround time =
+        //     credit traversal (1-cycle) + SA (1-cycle) + Link Traversal (1-cycle)
+        // if we want the credit update to take place after SA, this loop should
+        // be moved after the SA request
+        for (int outport = 0; outport < m_output_unit.size(); outport++) {
+            m_output_unit[outport]->wakeup();
+        }
     }
 
 
@@ -154,9 +169,11 @@ Router::wakeup()
     if(get_net_ptr()->m_spin == true) {
         bool spin_safe_ = false;
         int pre_drain_delay=2;
+        // Cycles into the current DRAIN epoch
+        uint64_t epoch_cycle = curCycle() % get_net_ptr()->m_spin_thrshld;
         // cout << "m_net_ptr->lock: " << m_network_ptr->lock << endl;
         if ((curCycle() > 0) &&
-            (curCycle() % get_net_ptr()->m_spin_thrshld == 0)) {
+            (epoch_cycle == 0)) {
             #if(DEBUG_PRINT)
                 cout << "thershold has reached.. put halt mode on.." << endl;
                 cout << "curcycle(): " << curCycle() << endl;
@@ -178,7 +195,7 @@ Router::wakeup()
         }
         // This is the condition which makes the network-halt false.
         else if ((curCycle() > get_net_ptr()->m_spin_thrshld) &&
-            (curCycle() % get_net_ptr()->m_spin_thrshld > pre_drain_delay/*delay*/) &&
+            (epoch_cycle > pre_drain_delay/*delay*/) &&
             (get_net_ptr()->lock != -1)) {
 
             #if(DEBUG_PRINT)
@@ -249,12 +266,12 @@ Router::wakeup()
             // spinning is done.. now wakeup all routers for next cycle
             get_net_ptr()->scheduleAll_wakeup(2*get_net_ptr()->m_spin_mult);
         }
-        else if (curCycle() % get_net_ptr()->m_spin_thrshld < 3/*delay*/) {
+        else if (epoch_cycle < 3/*delay*/) {
             if (m_id == get_net_ptr()->lock) {
                 spin_safe_ = get_net_ptr()->chck_link_state();
             }
 
-            if(curCycle() % get_net_ptr()->m_spin_thrshld == 2 &&
+            if(epoch_cycle == 2 &&
                 (m_id == get_net_ptr()->lock)) {
                 // put an additional assert that there is nothing on the link...
                 // cout << "########### SPIN-SAFE NOW #############" << endl;
@@ -263,6 +280,11 @@ Router::wakeup()
         }
     }
 
+    // A drain may have moved flits into this router
+    if (idle && is_idle(false)) {
+        return;
+    }
+
     // Switch Allocation
     m_sw_alloc->wakeup();
 
@@ -270,6 +292,31 @@ Router::wakeup()
     m_switch->wakeup();
 }
 
+// A router is idle if it has no flits buffered in its input VCs or
+// switch, and, if check_links is set, no flit or credit arriving this
+// cycle.
+bool
+Router::is_idle(bool check_links)
+{
+    if (!m_switch->isEmpty()) {
+        return false;
+    }
+    for (int inport = 0; inport < m_input_unit.size(); inport++) {
+        if (m_input_unit[inport]->get_num_buffered_flits() > 0 ||
+            (check_links && m_input_unit[inport]->has_incoming_flit())) {
+            return false;
+        }
+    }
+    if (check_links) {
+        for (int outport = 0; outport < m_output_unit.size(); outport++) {
+            if (m_output_unit[outport]->has_incoming_credit()) {
+                return false;
+            }
+        }
+    }
+    return true;
+}
+
 int
 Router::compute_hops_remaining(flit * flit_t)
 {
@@ -354,7 +401,144 @@ void
 Router::schedule_wakeup(Cycles time)
 {
     // wake up after time cycles
-    scheduleEvent(time);
+    scheduleConsumer(this, clockEdge(time));
+}
+
+Event *
+Router::createWakeupEvent()
+{
+    return new RouterWakeupEvent(this);
+}
+
+void
+Router::scheduleConsumer(Consumer *consumer, Tick when)
+{
+    if (m_network_ptr->inParallelPhase()) {
+        DeferredAction action;
+        action.type = DeferredAction::WAKEUP;
+        action.consumer = consumer;
+        action.when = when;
+        m_deferred_actions.push_back(action);
+    } else {
+        consumer->scheduleEventAbsolute(when);
+    }
+}
+
+// Credits are allocated from, and deleted to, the credit pool, which only
+// the main thread may touch
+void
+Router::deferCredit(InputUnit *input_unit, int vc, bool free_signal,
+                    Cycles time)
+{
+    DeferredAction action;
+    action.type = DeferredAction::SEND_CREDIT;
+    action.input_unit = input_unit;
+    action.vc = vc;
+    action.free_signal = free_signal;
+    action.time = time;
+    m_deferred_actions.push_back(action);
+}
+
+void
+Router::deleteCredit(Credit *credit)
+{
+    if (m_network_ptr->inParallelPhase()) {
+        DeferredAction action;
+        action.type = DeferredAction::DELETE_CREDIT;
+        action.credit = credit;
+        m_deferred_actions.push_back(action);
+    } else {
+        delete credit;
+    }
+}
+
+void
+Router::increment_occupied_vcs(int vc)
+{
+    if (m_network_ptr->inParallelPhase()) {
+        m_deferred_occupied_vcs[vc]++;
+    } else {
+        m_network_ptr->increment_occupied_vcs(vc);
+    }
+}
+
+void
+Router::decrement_occupied_vcs(int vc)
+{
+    if (m_network_ptr->inParallelPhase()) {
+        m_deferred_occupied_vcs[vc]--;
+    } else {
+        m_network_ptr->decrement_occupied_vcs(vc);
+    }
+}
+
+void
+Router::increment_uturn_requests()
+{
+    if (m_network_ptr->inParallelPhase()) {
+        m_deferred_uturn_requests++;
+    } else {
+        m_network_ptr->m_total_uturn_request++;
+    }
+}
+
+void
+Router::increment_successful_uturns()
+{
+    if (m_network_ptr->inParallelPhase()) {
+        m_deferred_successful_uturns++;
+    } else {
+        m_network_ptr->m_success_uturn++;
+    }
+}
+
+void
+Router::increment_misroutes()
+{
+    if (m_network_ptr->inParallelPhase()) {
+        m_deferred_misroutes++;
+    } else {
+        m_network_ptr->m_total_misroute++;
+    }
+}
+
+void
+Router::commitDeferred()
+{
+    for (int i = 0; i < m_deferred_actions.size(); i++) {
+        const DeferredAction &action = m_deferred_actions[i];
+        switch (action.type) {
+          case DeferredAction::WAKEUP:
+            action.consumer->scheduleEventAbsolute(action.when);
+            break;
+          case DeferredAction::SEND_CREDIT:
+            action.input_unit->increment_credit(action.vc, action.free_signal,
+                                                action.time);
+            break;
+          case DeferredAction::DELETE_CREDIT:
+            delete action.credit;
+            break;
+        }
+    }
+    m_deferred_actions.clear();
+
+    for (int vc = 0; vc < m_deferred_occupied_vcs.size(); vc++) {
+        m_network_ptr->m_occupied_vcs[vc] += m_deferred_occupied_vcs[vc];
+        m_deferred_occupied_vcs[vc] = 0;
+    }
+
+    if (m_deferred_uturn_requests > 0) {
+        m_network_ptr->m_total_uturn_request += m_deferred_uturn_requests;
+        m_deferred_uturn_requests = 0;
+    }
+    if (m_deferred_successful_uturns > 0) {
+        m_network_ptr->m_success_uturn += m_deferred_successful_uturns;
+        m_deferred_successful_uturns = 0;
+    }
+    if (m_deferred_misroutes > 0) {
+        m_network_ptr->m_total_misroute += m_deferred_misroutes;
+        m_deferred_misroutes = 0;
+    }
 }
 
 std::string
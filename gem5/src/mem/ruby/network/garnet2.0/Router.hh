@@ -53,6 +53,7 @@ class RoutingUnit;
 class SwitchAllocator;
 class CrossbarSwitch;
 class FaultModel;
+class Credit;
 
 class Router : public BasicRouter, public Consumer
 {
@@ -63,6 +64,8 @@ class Router : public BasicRouter, public Consumer
     ~Router();
 
     void wakeup();
+    // Runs the router pipeline for the current cycle
+    void evaluate();
     void print(std::ostream& out) const {};
 
     void init();
@@ -95,6 +98,21 @@ class Router : public BasicRouter, public Consumer
     void grant_switch(int inport, flit *t_flit);
     void schedule_wakeup(Cycles time);
 
+    // Side effects of the router outside of itself. While a batch of
+    // routers is evaluated in parallel, see GarnetNetwork::wakeupRouters(),
+    // these are held back, in the order they happen, and applied by
+    // commitDeferred().
+    void scheduleConsumer(Consumer *consumer, Tick when);
+    void deferCredit(InputUnit *input_unit, int vc, bool free_signal,
+                     Cycles time);
+    void deleteCredit(Credit *credit);
+    void increment_occupied_vcs(int vc);
+    void decrement_occupied_vcs(int vc);
+    void increment_uturn_requests();
+    void increment_successful_uturns();
+    void increment_misroutes();
+    void commitDeferred();
+
     std::string getPortDirectionName(PortDirection direction);
     void printFaultVector(std::ostream& out);
     void printAggregateFaultProbability(std::ostream& out);
@@ -121,12 +139,16 @@ class Router : public BasicRouter, public Consumer
     bool halt_;
 
     int compute_hops_remaining(flit* flit_t);
+    bool is_idle(bool check_links);
 
     int mrkd_flt_; // marked packet that nic can inject to this router.
 
     //Moving it to public
     RoutingUnit *m_routing_unit;
 
+  protected:
+    Event *createWakeupEvent();
+
   private:
     Cycles m_latency;
     int m_virtual_networks, m_num_vcs, m_vc_per_vnet;
@@ -145,6 +167,46 @@ class Router : public BasicRouter, public Consumer
     Stats::Scalar m_sw_output_arbiter_activity;
 
     Stats::Scalar m_crossbar_activity;
+
+    // Held back by a parallel evaluation. Wakeups and credits go to the
+    // event queue and the credit pool, so they are kept in one list to
+    // be replayed in order.
+    struct DeferredAction
+    {
+        enum Type { WAKEUP, SEND_CREDIT, DELETE_CREDIT };
+        Type type;
+        Consumer *consumer;
+        Tick when;
+        InputUnit *input_unit;
+        int vc;
+        bool free_signal;
+        Cycles time;
+        Credit *credit;
+    };
+    std::vector<DeferredAction> m_deferred_actions;
+    std::vector<int> m_deferred_occupied_vcs;
+    int m_deferred_uturn_requests;
+    int m_deferred_successful_uturns;
+    int m_deferred_misroutes;
+};
+
+// Wakes up a router. Routers schedule this instead of the generic
+// consumer event, so that the partitioned engine can tell router wakeups
+// apart in the event queue.
+class RouterWakeupEvent : public Event
+{
+  public:
+    RouterWakeupEvent(Router *router)
+        : Event(Default_Pri, AutoDelete), m_router(router)
+    {
+    }
+
+    void process() { m_router->wakeup(); }
+    const char *description() const { return "Router wakeup"; }
+    Router *getRouter() const { return m_router; }
+
+  private:
+    Router *m_router;
 };
 
 #endif // __MEM_RUBY_NETWORK_GARNET2_0_ROUTER_HH__
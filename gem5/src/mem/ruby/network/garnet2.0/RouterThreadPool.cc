@@ -0,0 +1,152 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#include "mem/ruby/network/garnet2.0/RouterThreadPool.hh"
+
+#include <pthread.h>
+
+#include <algorithm>
+
+#include "mem/ruby/network/garnet2.0/Router.hh"
+#include "sim/eventq.hh"
+
+// Threads do not survive fork(), which m5.fork() uses to branch off
+// simulations from a warmed-up network. So the workers of every pool are
+// stopped before a fork, and started again in both processes.
+static std::vector<RouterThreadPool *> threadPools;
+
+static void
+stopThreadPools()
+{
+    for (auto pool : threadPools) {
+        pool->stop();
+    }
+}
+
+static void
+startThreadPools()
+{
+    for (auto pool : threadPools) {
+        pool->start();
+    }
+}
+
+RouterThreadPool::RouterThreadPool(int num_threads)
+    : m_num_threads(num_threads), m_phase(0), m_running(0), m_exit(false),
+      m_routers(nullptr), m_eventq(nullptr)
+{
+    static bool registered = false;
+    if (!registered) {
+        pthread_atfork(stopThreadPools, startThreadPools, startThreadPools);
+        registered = true;
+    }
+    threadPools.push_back(this);
+
+    start();
+}
+
+RouterThreadPool::~RouterThreadPool()
+{
+    stop();
+    threadPools.erase(std::find(threadPools.begin(), threadPools.end(),
+                                this));
+}
+
+void
+RouterThreadPool::start()
+{
+    for (int partition = 1; partition < m_num_threads; partition++) {
+        m_workers.emplace_back(&RouterThreadPool::workerLoop, this,
+                               partition, m_phase);
+    }
+}
+
+void
+RouterThreadPool::stop()
+{
+    {
+        std::lock_guard<std::mutex> lock(m_mutex);
+        m_exit = true;
+    }
+    m_start.notify_all();
+    for (auto &worker : m_workers) {
+        worker.join();
+    }
+    m_workers.clear();
+    m_exit = false;
+}
+
+void
+RouterThreadPool::run(const std::vector<Router *> &routers)
+{
+    m_routers = &routers;
+    m_eventq = curEventQueue();
+    {
+        std::lock_guard<std::mutex> lock(m_mutex);
+        m_running = m_workers.size();
+        m_phase++;
+    }
+    m_start.notify_all();
+
+    runPartition(0);
+
+    std::unique_lock<std::mutex> lock(m_mutex);
+    m_done.wait(lock, [this]{ return m_running == 0; });
+}
+
+void
+RouterThreadPool::workerLoop(int partition, uint64_t phase)
+{
+    while (true) {
+        {
+            std::unique_lock<std::mutex> lock(m_mutex);
+            m_start.wait(lock, [&]{ return m_exit || m_phase != phase; });
+            if (m_exit)
+                return;
+            phase = m_phase;
+        }
+
+        runPartition(partition);
+
+        std::lock_guard<std::mutex> lock(m_mutex);
+        if (--m_running == 0)
+            m_done.notify_one();
+    }
+}
+
+void
+RouterThreadPool::runPartition(int partition)
+{
+    // Routers read the current tick through their clocks
+    curEventQueue(m_eventq);
+
+    int num_routers = m_routers->size();
+    int begin = num_routers * partition / m_num_threads;
+    int end = num_routers * (partition + 1) / m_num_threads;
+    for (int i = begin; i < end; i++) {
+        (*m_routers)[i]->evaluate();
+    }
+}
@@ -0,0 +1,77 @@
+/*
+ * Redistribution and use in source and binary forms, with or without
+ * modification, are permitted provided that the following conditions are
+ * met: redistributions of source code must retain the above copyright
+ * notice, this list of conditions and the following disclaimer;
+ * redistributions in binary form must reproduce the above copyright
+ * notice, this list of conditions and the following disclaimer in the
+ * documentation and/or other materials provided with the distribution;
+ * neither the name of the copyright holders nor the names of its
+ * contributors may be used to endorse or promote products derived from
+ * this software without specific prior written permission.
+ *
+ * THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+ * "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+ * LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+ * A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+ * OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+ * SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+ * LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+ * DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+ * THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+ * (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+ * OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+ */
+
+
+#ifndef __MEM_RUBY_NETWORK_GARNET2_0_ROUTERTHREADPOOL_HH__
+#define __MEM_RUBY_NETWORK_GARNET2_0_ROUTERTHREADPOOL_HH__
+
+#include <condition_variable>
+#include <cstdint>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+class EventQueue;
+class Router;
+
+// Worker threads for the partitioned router engine (--garnet-threads).
+// run() splits a batch of routers into contiguous partitions, one per
+// thread, evaluates them, and returns once every partition is done. The
+// calling thread evaluates the first partition.
+class RouterThreadPool
+{
+  public:
+    RouterThreadPool(int num_threads);
+    ~RouterThreadPool();
+
+    int getNumThreads() const { return m_num_threads; }
+
+    void run(const std::vector<Router *> &routers);
+
+    // Start and join the worker threads, around a fork()
+    void start();
+    void stop();
+
+  private:
+    void workerLoop(int partition, uint64_t phase);
+    void runPartition(int partition);
+
+    int m_num_threads;
+    std::vector<std::thread> m_workers;
+
+    std::mutex m_mutex;
+    std::condition_variable m_start;
+    std::condition_variable m_done;
+    // Bumped by run() to release the workers into the next phase
+    uint64_t m_phase;
+    // Workers that have not finished the current phase
+    int m_running;
+    bool m_exit;
+
+    const std::vector<Router *> *m_routers;
+    EventQueue *m_eventq;
+};
+
+#endif // __MEM_RUBY_NETWORK_GARNET2_0_ROUTERTHREADPOOL_HH__
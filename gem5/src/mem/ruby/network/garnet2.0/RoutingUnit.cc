@@ -58,128 +58,91 @@ RoutingUnit::addWeight(int link_weight)
     m_weight_table.push_back(link_weight);
 }
 
-/*
- * This is the default routing algorithm in garnet.
- * The routing table is populated during topology creation.
- * Routes can be biased via weight assignments in the topology file.
- * Correct weight assignments are critical to provide deadlock avoidance.
- */
-
+// Of the candidate output links, pick the one with the most free VCs
+// in this vnet. Ties go to the first candidate.
 int
-RoutingUnit::lookupRoutingTable(int vnet, NetDest msg_destination)
+RoutingUnit::selectOutport(int vnet, const std::vector<int>& candidates)
 {
-    // First find all possible output link candidates
-    // For ordered vnet, just choose the first
-    // (to make sure different packets don't choose different routes)
-    // For unordered vnet, randomly choose any of the links
-    // To have a strict ordering between links, they should be given
-    // different weights in the topology file
-    int output_link = -1;
-    int min_weight = INFINITE_;
-    std::vector<int> output_link_candidates;
-    int num_candidates = 0;
-
-    // Identify the minimum weight among the candidate output links
-    for (int link = 0; link < m_routing_table.size(); link++) {
-        if (msg_destination.intersectionIsNotEmpty(m_routing_table[link])) {
-
-        if (m_weight_table[link] <= min_weight)
-            min_weight = m_weight_table[link];
-        }
-    }
-
-    // Collect all candidate output links with this minimum weight
-    for (int link = 0; link < m_routing_table.size(); link++) {
-        if (msg_destination.intersectionIsNotEmpty(m_routing_table[link])) {
-
-            if (m_weight_table[link] == min_weight) {
-
-                num_candidates++;
-                output_link_candidates.push_back(link);
-            }
-        }
-    }
-
-    if (output_link_candidates.size() == 0) {
-        fatal("Fatal Error:: No Route exists from this Router.");
-        exit(0);
-    }
-
-    // go to output unit pointed by each outport of the router and
-    // print out the OutVC state of each of those outport VC
-    int outport_id;
-    std::vector<int>outport_credit_index; // keep the total credit count
-                                        // at the outport-id index
-
-    int accum_;
-    for(int i = 0; i < output_link_candidates.size(); i++) {
-
-        outport_id = output_link_candidates[i];
-
-        accum_ = 0;
-
-        // get credit count for each outvc
-        accum_ += m_router->get_outputUnit_ref()[outport_id]\
-                    ->getNumFreeVCs(vnet);
-        outport_credit_index.push_back(accum_);
-    }
-
-    // now you have populated the vector, find the max entry
     int max = -1;
     int candidate = -1;
-    for(int i = 0; i < outport_credit_index.size(); i++ ) {
-        if(outport_credit_index[i] > max) {
-            max = outport_credit_index[i];
-            candidate = i;
+    for (int i = 0; i < candidates.size(); i++) {
+        int free_vcs = m_router->get_outputUnit_ref()[candidates[i]]
+                           ->getNumFreeVCs(vnet);
+        if (free_vcs > max) {
+            max = free_vcs;
+            candidate = candidates[i];
         }
     }
 
-
-    output_link = output_link_candidates.at(candidate);
-    return output_link;
+    return candidate;
 }
 
-std::vector<int>
-RoutingUnit::lookupRoutingTable_pref_outport(int vnet, NetDest msg_destination)
-{
-    // First find all possible output link candidates
-    // For ordered vnet, just choose the first
-    // (to make sure different packets don't choose different routes)
-    // For unordered vnet, randomly choose any of the links
-    // To have a strict ordering between links, they should be given
-    // different weights in the topology file
-    int min_weight = INFINITE_;
-    std::vector<int> output_link_candidates;
-    int num_candidates = 0;
-
-    // Identify the minimum weight among the candidate output links
-    for (int link = 0; link < m_routing_table.size(); link++) {
-        if (msg_destination.intersectionIsNotEmpty(m_routing_table[link])) {
+/*
+ * The routing table does not change after topology creation, and every
+ * packet in the network has a single destination NI (NetworkInterface
+ * splits multicasts into one message per destination). So the minimum
+ * weight candidates for each destination are computed once, at init,
+ * and routing a flit is an index into this table.
+ */
 
-        if (m_weight_table[link] <= min_weight)
-            min_weight = m_weight_table[link];
-        }
-    }
+void
+RoutingUnit::buildCandidateTable(int num_nodes)
+{
+    m_candidate_table.assign(num_nodes, std::vector<int>());
+    std::vector<int> min_weight(num_nodes, INFINITE_);
 
-    // Collect all candidate output links with this minimum weight
     for (int link = 0; link < m_routing_table.size(); link++) {
-        if (msg_destination.intersectionIsNotEmpty(m_routing_table[link])) {
-
-            if (m_weight_table[link] == min_weight) {
-
-                num_candidates++;
-                output_link_candidates.push_back(link);
+        std::vector<NodeID> dests = m_routing_table[link].getAllDest();
+        for (int i = 0; i < dests.size(); i++) {
+            NodeID node = dests[i];
+            assert(node < num_nodes);
+            if (m_weight_table[link] < min_weight[node]) {
+                min_weight[node] = m_weight_table[link];
+                m_candidate_table[node].clear();
+            }
+            if (m_weight_table[link] == min_weight[node]) {
+                m_candidate_table[node].push_back(link);
             }
         }
     }
+}
 
-    if (output_link_candidates.size() == 0) {
+/*
+ * This is the default routing algorithm in garnet.
+ * The routing table is populated during topology creation.
+ * Routes can be biased via weight assignments in the topology file.
+ * Correct weight assignments are critical to provide deadlock avoidance.
+ */
+
+int
+RoutingUnit::lookupRoutingTable(int vnet, int dest_ni)
+{
+    return selectOutport(vnet, lookupRoutingTable_pref_outport(dest_ni));
+}
+
+const std::vector<int>&
+RoutingUnit::lookupRoutingTable_pref_outport(int dest_ni)
+{
+    assert(dest_ni >= 0 && dest_ni < m_candidate_table.size());
+    const std::vector<int>& candidates = m_candidate_table[dest_ni];
+    if (candidates.size() == 0) {
         fatal("Fatal Error:: No Route exists from this Router.");
-        exit(0);
     }
+    return candidates;
+}
 
-    return output_link_candidates;
-
+void
+RoutingUnit::printCandidateTable(std::ostream& out)
+{
+    for (int node = 0; node < m_candidate_table.size(); node++) {
+        out << m_router->get_id() << " " << node;
+        for (int i = 0; i < m_candidate_table[node].size(); i++) {
+            int outport = m_candidate_table[node][i];
+            out << " " << outport << ":"
+                << m_router->get_outputUnit_ref()[outport]->get_direction();
+        }
+        out << std::endl;
+    }
 }
 
 void
@@ -213,7 +176,7 @@ RoutingUnit::outportCompute(RouteInfo route, int inport,
         // Multiple NIs may be connected to this router,
         // all with output port direction = "Local"
         // Get exact outport id from table
-        outport = lookupRoutingTable(route.vnet, route.net_dest);
+        outport = lookupRoutingTable(route.vnet, route.dest_ni);
         return outport;
     }
 
@@ -224,7 +187,7 @@ RoutingUnit::outportCompute(RouteInfo route, int inport,
 
     switch (routing_algorithm) {
         case TABLE_: outport =
-            lookupRoutingTable(route.vnet, route.net_dest); break;
+            lookupRoutingTable(route.vnet, route.dest_ni); break;
         case XY_: outport =
             outportComputeXY(route, inport, inport_dirn); break;
         case RANDOM_: outport =
@@ -239,7 +202,7 @@ RoutingUnit::outportCompute(RouteInfo route, int inport,
         case CUSTOM_: outport =
             outportComputeCustom(route, inport, inport_dirn); break;
         default: outport =
-            lookupRoutingTable(route.vnet, route.net_dest); break;
+            lookupRoutingTable(route.vnet, route.dest_ni); break;
     }
 
     assert(outport != -1);
@@ -55,10 +55,13 @@ class RoutingUnit
     void addRoute(const NetDest& routing_table_entry);
     void addWeight(int link_weight);
 
-    // get output port from routing table
-    int  lookupRoutingTable(int vnet, NetDest net_dest);
-    std::vector<int> lookupRoutingTable_pref_outport(
-                                int vnet, NetDest msg_destination);
+    // Precomputed routing table lookups, for a single destination NI.
+    // buildCandidateTable() must have been called, once all the
+    // routes are added.
+    void buildCandidateTable(int num_nodes);
+    int  lookupRoutingTable(int vnet, int dest_ni);
+    const std::vector<int>& lookupRoutingTable_pref_outport(int dest_ni);
+    void printCandidateTable(std::ostream& out);
 
     // Topology-specific direction based routing
     void addInDirection(PortDirection inport_dirn, int inport);
@@ -113,6 +116,11 @@ class RoutingUnit
     // Routing Table
     std::vector<NetDest> m_routing_table;
     std::vector<int> m_weight_table;
+
+    // Minimum-weight output links towards each destination NI
+    std::vector<std::vector<int> > m_candidate_table;
+
+    int selectOutport(int vnet, const std::vector<int>& candidates);
 };
 
 #endif // __MEM_RUBY_NETWORK_GARNET_ROUTING_UNIT_HH__
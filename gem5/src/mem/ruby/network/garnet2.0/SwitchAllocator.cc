@@ -137,7 +137,7 @@ SwitchAllocator::arbitrate_inports()
 
                         // update the stats:
                         m_input_unit[inport]->peekTopFlit(invc)->m_request_uturn = true;
-                        m_router->get_net_ptr()->m_total_uturn_request++;
+                        m_router->increment_uturn_requests();
 
                         // deflect this flit here:
                         if (m_router->get_net_ptr()->m_uTurn_crossbar == 0) {
@@ -230,7 +230,7 @@ SwitchAllocator::arbitrate_outports()
                         == m_input_unit[inport]->get_direction()) &&
                     (m_input_unit[inport]->get_direction() != "Local")) {
                         assert(m_input_unit[inport]->peekTopFlit(invc)->m_request_uturn == true);
-                        m_router->get_net_ptr()->m_success_uturn++;
+                        m_router->increment_successful_uturns();
                         m_input_unit[inport]->peekTopFlit(invc)->m_request_uturn = false; // uset it for next time.
                 }
                 // remove flit from Input VC
@@ -318,7 +318,7 @@ void
 SwitchAllocator::disallow_uturn(int inputUnit_id, int invc, PortDirection inputUnit_dirn)
 {
     // update the stats:
-    m_router->get_net_ptr()->m_total_misroute++;
+    m_router->increment_misroutes();
 
     int new_outport = -1;
     flit * t_flit; // get the pointer to the flit.
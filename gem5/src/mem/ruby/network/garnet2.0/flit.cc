@@ -33,6 +33,8 @@
 
 #include "mem/ruby/network/garnet2.0/flit.hh"
 
+#include "mem/ruby/network/garnet2.0/FlitPool.hh"
+
 // default constuctor of the flit
 flit::flit()
 {
@@ -56,6 +58,25 @@ flit::flit()
 
 }
 
+void *
+flit::operator new(size_t size)
+{
+    // Classes derived from flit without a pool of their own
+    if (size != sizeof(flit))
+        return ::operator new(size);
+    return FlitPool<flit>::allocate();
+}
+
+void
+flit::operator delete(void *p, size_t size)
+{
+    if (size != sizeof(flit)) {
+        ::operator delete(p);
+        return;
+    }
+    FlitPool<flit>::release(p);
+}
+
 // Constructor for the flit
 flit::flit(int id, int  vc, int vnet, RouteInfo route, int size,
     MsgPtr msg_ptr, Cycles curTime, bool marked)
@@ -50,6 +50,10 @@ class flit
     flit(int id, int vc, int vnet, RouteInfo route, int size,
          MsgPtr msg_ptr, Cycles curTime, bool marked = false);
 
+    // flits are allocated from a FlitPool
+    static void *operator new(size_t size);
+    static void operator delete(void *p, size_t size);
+
     int get_outport() {return m_outport; }
     int get_size() { return m_size; }
     void set_enqueue_time(Cycles time) { m_enqueue_time = time; }
@@ -27,3 +27,4 @@
 # Authors: Nathan Binkert
 
 from _m5.core import setOutputDir
+from _m5.core import seedRandom
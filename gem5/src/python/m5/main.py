@@ -117,6 +117,8 @@ def parse_options():
     option("--dot-dvfs-config", metavar="FILE", default=None,
         help="Create DOT & pdf outputs of the DVFS configuration" + \
              " [Default: %default]")
+    option("--time-instantiate", action="store_true", default=False,
+        help="Print the time taken by each phase of m5.instantiate()")
 
     # Debugging options
     group("Debugging Options")
@@ -45,6 +45,7 @@ from __future__ import print_function
 import atexit
 import os
 import sys
+import time
 
 # import the wrapped C++ functions
 import _m5.drain
@@ -71,6 +72,28 @@ _memory_modes = {
 
 _drain_manager = _m5.drain.DrainManager.instance()
 
+class _PhaseTimer(object):
+    """Wall-clock time of each phase of instantiate(), printed at the end
+    when --time-instantiate is given."""
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+        self.start = self.last = time.time()
+
+    def lap(self, phase):
+        if self.enabled:
+            now = time.time()
+            self.phases.append((phase, now - self.last))
+            self.last = now
+
+    def report(self, num_objects):
+        if not self.enabled:
+            return
+        print("Instantiated %d SimObjects in %.3f s:" %
+              (num_objects, self.last - self.start))
+        for phase, seconds in self.phases:
+            print("  %-20s %8.3f s" % (phase, seconds))
+
 # The final hook to generate .ini files.  Called from the user script
 # once the config is built.
 def instantiate(ckpt_dir=None):
@@ -81,20 +104,28 @@ def instantiate(ckpt_dir=None):
     if not root:
         fatal("Need to instantiate Root() before calling instantiate()")
 
+    timer = _PhaseTimer(options.time_instantiate)
+
     # we need to fix the global frequency
     ticks.fixGlobalFrequency()
 
     # Make sure SimObject-valued params are in the configuration
     # hierarchy so we catch them with future descendants() walks
     for obj in root.descendants(): obj.adoptOrphanParams()
+    timer.lap("adoptOrphanParams")
+
+    # The hierarchy is complete now, so walk it once and reuse the list
+    # in every pass below, in the same order as descendants()
+    descendants = list(root.descendants())
 
     # Unproxy in sorted order for determinism
-    for obj in root.descendants(): obj.unproxyParams()
+    for obj in descendants: obj.unproxyParams()
+    timer.lap("unproxyParams")
 
     if options.dump_config:
         ini_file = file(os.path.join(options.outdir, options.dump_config), 'w')
         # Print ini sections in sorted order for easier diffing
-        for obj in sorted(root.descendants(), key=lambda o: o.path()):
+        for obj in sorted(descendants, key=lambda o: o.path()):
             obj.print_ini(ini_file)
         ini_file.close()
 
@@ -109,25 +140,32 @@ def instantiate(ckpt_dir=None):
             pass
 
     do_dot(root, options.outdir, options.dot_config)
+    timer.lap("dump config")
 
     # Initialize the global statistics
     stats.initSimStats()
 
     # Create the C++ sim objects and connect ports
-    for obj in root.descendants(): obj.createCCObject()
-    for obj in root.descendants(): obj.connectPorts()
+    for obj in descendants: obj.createCCObject()
+    timer.lap("createCCObject")
+    for obj in descendants: obj.connectPorts()
+    timer.lap("connectPorts")
 
     # Do a second pass to finish initializing the sim objects
-    for obj in root.descendants(): obj.init()
+    for obj in descendants: obj.init()
+    timer.lap("init")
 
     # Do a third pass to initialize statistics
-    for obj in root.descendants(): obj.regStats()
+    for obj in descendants: obj.regStats()
+    timer.lap("regStats")
 
     # Do a fourth pass to initialize probe points
-    for obj in root.descendants(): obj.regProbePoints()
+    for obj in descendants: obj.regProbePoints()
+    timer.lap("regProbePoints")
 
     # Do a fifth pass to connect probe listeners
-    for obj in root.descendants(): obj.regProbeListeners()
+    for obj in descendants: obj.regProbeListeners()
+    timer.lap("regProbeListeners")
 
     # We want to generate the DVFS diagram for the system. This can only be
     # done once all of the CPP objects have been created and initialised so
@@ -143,14 +181,18 @@ def instantiate(ckpt_dir=None):
         _drain_manager.preCheckpointRestore()
         ckpt = _m5.core.getCheckpoint(ckpt_dir)
         _m5.core.unserializeGlobals(ckpt);
-        for obj in root.descendants(): obj.loadState(ckpt)
+        for obj in descendants: obj.loadState(ckpt)
+        timer.lap("loadState")
     else:
-        for obj in root.descendants(): obj.initState()
+        for obj in descendants: obj.initState()
+        timer.lap("initState")
 
     # Check to see if any of the stat events are in the past after resuming from
     # a checkpoint, If so, this call will shift them to be at a valid time.
     updateStatEvents()
 
+    timer.report(len(descendants))
+
 need_startup = True
 def simulate(*args, **kwargs):
     global need_startup
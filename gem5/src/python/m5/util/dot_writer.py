@@ -324,7 +324,7 @@ def dot_create_dvfs_nodes(simNode, callgraph, domain=None):
     callgraph.add_subgraph(cluster)
 
 def do_dot(root, outdir, dotFilename):
-    if not pydot:
+    if not pydot or not dotFilename:
         return
     # * use ranksep > 1.0 for for vertical separation between nodes
     # especially useful if you need to annotate edges using e.g. visio
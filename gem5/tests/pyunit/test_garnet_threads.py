@@ -0,0 +1,118 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks that garnet gives the same stats with --garnet-threads as with
+routers woken up one at a time, for synthetic traffic on 64 routers.
+
+Needs build/Garnet_standalone/gem5.opt, and is skipped without it. Run
+with python2 -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+GEM5 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                    os.pardir, os.pardir)
+BINARY = os.path.join(GEM5, 'build', 'Garnet_standalone', 'gem5.opt')
+CONFIG = os.path.join(GEM5, 'configs', 'example', 'garnet_synth_traffic.py')
+
+# Stats that measure the run rather than the simulation
+RUN_STATS = ('host_', 'system.ruby.network.router_batches',
+             'system.ruby.network.batched_routers')
+
+def read_stats(outdir):
+    """
+    The stats.txt of an output directory, and of the directories of any
+    forked children, less the RUN_STATS.
+    """
+    stats = []
+    for root, dirs, files in sorted(os.walk(outdir)):
+        if 'stats.txt' not in files:
+            continue
+        stats.append(os.path.relpath(root, outdir))
+        with open(os.path.join(root, 'stats.txt')) as f:
+            for line in f:
+                fields = line.split()
+                if fields and not fields[0].startswith(RUN_STATS):
+                    stats.append(line)
+    return stats
+
+@unittest.skipUnless(os.path.exists(BINARY),
+                     'build/Garnet_standalone/gem5.opt is not built')
+class GarnetThreadsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def simulate(self, threads, *args):
+        outdir = os.path.join(self.dir, 'm5out-%d' % len(os.listdir(self.dir)))
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(
+                [BINARY, '-d', outdir, CONFIG, '--network=garnet2.0',
+                 '--num-cpus=64', '--num-dirs=64', '--sim-cycles=5000',
+                 '--garnet-threads=%d' % threads] + list(args),
+                cwd=GEM5, stdout=devnull, stderr=devnull)
+        return read_stats(outdir)
+
+    def assertSameStats(self, *args):
+        serial = self.simulate(0, *args)
+        self.assertTrue(len(serial) > 1)
+        for threads in (2, 4):
+            self.assertEqual(self.simulate(threads, *args), serial)
+
+    def test_uniform_random(self):
+        self.assertSameStats('--topology=Mesh_XY', '--mesh-rows=8',
+                             '--synthetic=uniform_random',
+                             '--injectionrate=0.2')
+
+    def test_xy_saturated(self):
+        self.assertSameStats('--topology=Mesh_XY', '--mesh-rows=8',
+                             '--routing-algorithm=1', '--router-latency=2',
+                             '--synthetic=transpose', '--injectionrate=0.5')
+
+    def test_drain(self):
+        conf = '64_nodes-connectivity_matrix_0-links_removed_8.txt'
+        self.assertSameStats('--topology=irregularMesh_XY', '--mesh-rows=8',
+                             '--conf-file=' + conf,
+                             '--spin-file=spin_configs/SR_' + conf,
+                             '--spin=1', '--spin-freq=128', '--spin-mult=1',
+                             '--vcs-per-vnet=1', '--synthetic=uniform_random',
+                             '--injectionrate=0.25')
+
+    def test_fork(self):
+        # The worker threads are restarted in the parent and the children
+        self.assertSameStats('--topology=Mesh_XY', '--mesh-rows=8',
+                             '--synthetic=uniform_random',
+                             '--injectionrate=0.1',
+                             '--fork-injectionrates=0.05,0.2',
+                             '--fork-warmup-cycles=2000', '--fork-jobs=2')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Checks gem5_stats.py, and its stats.txt.idx index, against the ways the
+sweep scripts used to read stats.txt: grep and sed for a single stat, and
+a line by line scan of every scalar, in which the last dump wins. Like
+the simulator, the fixture prints no description for formulas such as
+average_flit_latency, which grep and sed relied on.
+
+Run with python -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__),
+                                os.pardir, os.pardir))
+import gem5_stats
+
+BLOCK = '''
+---------- Begin Simulation Statistics ----------
+sim_seconds                                  %(seconds)f                       # Number of seconds simulated
+sim_ticks                                    %(ticks)d                       # Number of ticks simulated
+system.ruby.network.packets_received::0      %(received0)d                       # packets received
+system.ruby.network.packets_received::1      %(received1)d                       # packets received
+system.ruby.network.packets_received::total  %(received)d                       # packets received
+system.ruby.network.average_flit_latency     %(latency)f                      
+system.ruby.network.saturated_at_cycle            0                       # cycle at which the network saturated
+system.ruby.network.flit_latency_hist::samples        %(received)d                       # flit latency
+system.ruby.network.flit_latency_hist::mean      %(latency)f                       # flit latency
+system.ruby.network.flit_latency_hist::0-3           %(received0)d     %(pct0).2f%%     %(pct0).2f%% # flit latency
+system.ruby.network.flit_latency_hist::4-7           %(received1)d     %(pct1).2f%%    100.00%% # flit latency
+system.ruby.network.flit_latency_hist::total        %(received)d                       # flit latency
+system.ruby.network.ipc                           nan                       # instructions per cycle
+system.ruby.network.routers0.buffer_reads    %(reads)d                       # buffer reads
+system.ruby.l1_cntrl0.sequencer.latency_hist |           %(received0)d     %(pct0).2f%%     %(pct0).2f%% |           %(received1)d     %(pct1).2f%%    100.00%% # one line vector
+
+---------- End Simulation Statistics   ----------
+'''
+
+def block(i):
+    received0 = 100 * (i + 1)
+    received1 = 37 * (i + 2)
+    received = received0 + received1
+    return BLOCK % { 'seconds' : 0.0001 * (i + 1), 'ticks' : 10 ** 8 * (i + 1),
+                     'received0' : received0, 'received1' : received1,
+                     'received' : received,
+                     'pct0' : 100.0 * received0 / received,
+                     'pct1' : 100.0 * received1 / received,
+                     'latency' : 12.5 + i * 3.25, 'reads' : 4096 * (i + 1) }
+
+def read_stats(path):
+    """
+    How result_cache.py used to read every scalar in a stats.txt file
+    into a dictionary. If stats were dumped more than once, the last dump
+    wins.
+    """
+    stats = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2 or line.startswith("-"):
+                continue
+            try:
+                stats[fields[0]] = float(fields[1])
+            except ValueError:
+                pass
+    return stats
+
+def same(a, b):
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+class StatsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = self.write('stats.txt', 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, num_blocks):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            for i in range(num_blocks):
+                f.write(block(i))
+        return path
+
+    def testMatchesGrep(self):
+        output_dir = os.path.join(self.dir, 'point')
+        os.makedirs(output_dir)
+        path = os.path.join(output_dir, 'stats.txt')
+        with open(path, 'w') as f:
+            f.write(block(0))
+        try:
+            latency = subprocess.check_output("grep -nri average_flit_latency  {0:s}  | sed 's/.*system.ruby.network.average_flit_latency\s*//'".format(output_dir), shell=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest('grep and sed are needed')
+        self.assertEqual(gem5_stats.value(path, 'system.ruby.network.average_flit_latency'), float(latency))
+        self.assertEqual(gem5_stats.value(path, 'system.ruby.network.average_flit_latency', use_index=True), float(latency))
+
+    def testMatchesScan(self):
+        old = read_stats(self.path)
+        for use_index in (False, True):
+            new = gem5_stats.flatten(gem5_stats.load(self.path, use_index=use_index))
+            # The one line vector was skipped by the old scan
+            oneline = 'system.ruby.l1_cntrl0.sequencer.latency_hist::'
+            self.assertEqual(sorted(key for key in new if not key.startswith(oneline)), sorted(old))
+            for key in old:
+                self.assertTrue(same(new[key], old[key]), key)
+            self.assertEqual(new[oneline + '0'], 300)
+            self.assertEqual(new[oneline + '1'], 148)
+
+    def testTyped(self):
+        stats = gem5_stats.load(self.path, block=1)
+        received = stats['system.ruby.network.packets_received']
+        self.assertEqual((received['0'], received['1'], received.total), (200, 111, 311))
+        hist = stats['system.ruby.network.flit_latency_hist']
+        self.assertEqual(hist.samples, 311)
+        self.assertEqual(hist.buckets, [(0, 3, 200), (4, 7, 111)])
+        self.assertTrue(math.isnan(stats['system.ruby.network.ipc'].value))
+        self.assertEqual(gem5_stats.value(self.path, 'sim_ticks', block=0), 10 ** 8)
+
+    def testIndexMatchesScan(self):
+        selects = [None, r'^system\.ruby\.network\.', r'^sim_seconds$', r'routers0', r'^nothing$']
+        for block in (0, 1, 2, -1):
+            for select in selects:
+                for limit in (None, 1, 3):
+                    expected = gem5_stats.flatten(gem5_stats.load(self.path, select, block, limit))
+                    indexed = gem5_stats.flatten(gem5_stats.load(self.path, select, block, limit, use_index=True))
+                    self.assertEqual(sorted(indexed), sorted(expected))
+                    for key in expected:
+                        self.assertTrue(same(indexed[key], expected[key]), key)
+        self.assertTrue(os.path.exists(self.path + gem5_stats.INDEX_SUFFIX))
+        self.assertEqual(gem5_stats.StatsFile(self.path, use_index=True).num_blocks(), 3)
+
+    def testIndexIsReused(self):
+        latency = gem5_stats.value(self.path, 'system.ruby.network.average_flit_latency', use_index=True)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('the stats file was scanned')
+        scan = gem5_stats.scan
+        gem5_stats.scan = fail
+        try:
+            self.assertEqual(gem5_stats.value(self.path, 'system.ruby.network.average_flit_latency', use_index=True), latency)
+            # Once built, the index is used even when it was not asked for
+            self.assertEqual(gem5_stats.value(self.path, 'system.ruby.network.average_flit_latency'), latency)
+        finally:
+            gem5_stats.scan = scan
+
+    def testIndexIsRebuilt(self):
+        self.assertEqual(gem5_stats.value(self.path, 'sim_ticks', use_index=True), 3 * 10 ** 8)
+        # One more dump changes the size of the file
+        with open(self.path, 'a') as f:
+            f.write(block(3))
+        self.assertEqual(gem5_stats.value(self.path, 'sim_ticks', use_index=True), 4 * 10 ** 8)
+        self.assertEqual(gem5_stats.StatsFile(self.path, use_index=True).num_blocks(), 4)
+
+    def testLastBlockOffset(self):
+        with open(self.path, 'rb') as f:
+            expected = f.read().rfind(gem5_stats.BEGIN_BLOCK.encode('ascii'))
+        # Small chunks, so that the marker straddles some of them
+        for chunk_size in (7, 50, 333, 1 << 16):
+            self.assertEqual(gem5_stats.last_block_offset(self.path, chunk_size), expected)
+        self.assertEqual(gem5_stats.last_block_offset(self.write('empty.txt', 0)), None)
+
+    def testMissingBlock(self):
+        self.assertRaises(IndexError, gem5_stats.load, self.path, block=5)
+        self.assertRaises(KeyError, gem5_stats.get, self.path, 'system.nothing')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks that util/o3-pipeview.py prints the same window of a trace when it
+seeks to it with the trace index as when it reads the trace up to it.
+
+Run with python2 -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+PIPEVIEW = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, os.pardir, 'util', 'o3-pipeview.py')
+
+def write_trace(path, num_insts, seed=0):
+    """
+    Write an O3PipeView trace, as the O3 CPU prints it, with instructions
+    retired a little out of fetch order, some squashed instructions and
+    unrelated debug output in between.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for sn in range(1, num_insts + 1):
+        fetch = 500 * sn + rng.randrange(0, 3000)
+        stages = [fetch + 1000 * i for i in range(1, 6)]
+        squashed = rng.random() < 0.05
+        retire = 0 if squashed else fetch + 7000
+        store = fetch + 8000 if sn % 5 == 0 and not squashed else 0
+        inst = ['O3PipeView:fetch:%d:0x%08x:0:%d:  add r%d, r1, r2\n' %
+                (fetch, 0x400000 + 4 * sn, sn, sn % 8)]
+        for name, tick in zip(('decode', 'rename', 'dispatch', 'issue',
+                               'complete'), stages):
+            inst.append('O3PipeView:%s:%d\n' % (name, tick))
+        inst.append('O3PipeView:retire:%d:store:%d\n' % (retire, store))
+        lines.append(inst)
+        if rng.random() < 0.1:
+            lines.append(['%d: system.cpu: unrelated output\n' % fetch])
+    # Interleave neighbouring instructions now and then
+    for i in range(0, len(lines) - 1, 7):
+        lines[i], lines[i + 1] = lines[i + 1], lines[i]
+    with open(path, 'w') as trace:
+        for inst in lines:
+            trace.writelines(inst)
+
+class PipeviewIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.trace = os.path.join(self.dir, 'trace.out')
+        write_trace(self.trace, 6000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def pipeview(self, *args):
+        out = os.path.join(self.dir, 'pipeview.out')
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call([sys.executable, PIPEVIEW, '-o', out] +
+                                  list(args) + [self.trace], stdout=devnull)
+        with open(out) as f:
+            return f.read()
+
+    def check(self, *args):
+        linear = self.pipeview('--no-index', *args)
+        # The first run builds the index, the second one reads it
+        self.assertEqual(self.pipeview(*args), linear)
+        self.assertTrue(os.path.exists(self.trace + '.idx'))
+        self.assertEqual(self.pipeview(*args), linear)
+        return linear
+
+    def testTickRange(self):
+        for window in ('1000000:1200000', '2500000:-1', '100:50000'):
+            out = self.check('-t', window)
+            self.assertTrue(out.count('\n') > 10, window)
+
+    def testInstRange(self):
+        for window in ('2049:2100', '4000:-1', '1:30'):
+            out = self.check('-i', window, '--store_completions',
+                             '--timestamps')
+            self.assertTrue(out.count('\n') > 10, window)
+
+    def testOnlyCommitted(self):
+        self.check('-i', '3000:3500', '--only_committed')
+
+    def testIndexFile(self):
+        index = os.path.join(self.dir, 'other.idx')
+        linear = self.pipeview('--no-index', '-t', '1500000:1600000')
+        self.assertEqual(self.pipeview('--index', index,
+                                       '-t', '1500000:1600000'), linear)
+        self.assertTrue(os.path.exists(index))
+        self.assertFalse(os.path.exists(self.trace + '.idx'))
+
+    def testChangedTrace(self):
+        self.check('-i', '2000:2100')
+        # A different trace, of a different size, gets a new index
+        write_trace(self.trace, 5000, seed=1)
+        self.check('-i', '2000:2100')
+
+if __name__ == '__main__':
+    unittest.main()
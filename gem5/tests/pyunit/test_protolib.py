@@ -0,0 +1,267 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks the block reader and writer and the column decoding of
+util/protolib.py against the one-message-at-a-time encodeMessage and
+decodeMessage.
+
+Run with python2 -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+import gzip
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__),
+                                os.pardir, os.pardir, 'util'))
+import protolib
+
+class Record(object):
+    """
+    Stands in for a generated protobuf message, with three integer
+    fields. Like protobuf, trailing fields that are 0 are not encoded, so
+    an all-zero record encodes to an empty message.
+    """
+    FIELDS = ('tick', 'addr', 'size')
+
+    def __init__(self, tick=0, addr=0, size=0):
+        self.tick = tick
+        self.addr = addr
+        self.size = size
+
+    def values(self):
+        return tuple(getattr(self, name) for name in self.FIELDS)
+
+    def SerializeToString(self):
+        values = list(self.values())
+        while values and values[-1] == 0:
+            values.pop()
+        return struct.pack('<%dQ' % len(values), *values)
+
+    def ParseFromString(self, data):
+        values = struct.unpack('<%dQ' % (len(data) // 8), data)
+        values += (0,) * (len(self.FIELDS) - len(values))
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, value)
+
+def records(num_records):
+    # Every 7th record is empty, and sizes vary, so that some length
+    # varints take more than one byte
+    result = []
+    for i in range(num_records):
+        if i % 7 == 0:
+            result.append(Record())
+        else:
+            result.append(Record(tick=1000 * i, addr=0x1000 + 64 * i,
+                                 size=(i % 3) * 1000))
+    return result
+
+class TraceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def writeTrace(self, name, header, messages, compressed=False):
+        """
+        Write a trace the way the encode_* scripts did, one
+        encodeMessage() at a time.
+        """
+        path = os.path.join(self.dir, name)
+        out = gzip.open(path, 'wb') if compressed else open(path, 'wb')
+        out.write("gem5")
+        protolib.encodeMessage(out, header)
+        for message in messages:
+            protolib.encodeMessage(out, message)
+        out.close()
+        return path
+
+    def baselineDecode(self, path):
+        """
+        Decode a trace the way the decode_* scripts did, one
+        decodeMessage() at a time.
+        """
+        proto_in = protolib.openFileRd(path)
+        self.assertEqual(proto_in.read(4), "gem5")
+        header = Record()
+        protolib.decodeMessage(proto_in, header)
+        messages = []
+        while 1:
+            message = Record()
+            if not protolib.decodeMessage(proto_in, message):
+                break
+            messages.append(message.values())
+        proto_in.close()
+        return header.values(), messages
+
+class MessageReaderTest(TraceTestCase):
+    def check(self, compressed, chunk_size):
+        expected = records(500)
+        path = self.writeTrace('trace', Record(tick=1), expected, compressed)
+
+        reader = protolib.MessageReader(path, chunk_size=chunk_size)
+        self.assertEqual(reader.read(4), "gem5")
+        header = Record()
+        self.assertTrue(reader.decodeMessage(header))
+        decoded = [m.values() for m in reader.messages(Record)]
+        reader.close()
+
+        self.assertEqual(len(decoded), len(expected))
+        self.assertEqual(decoded, [m.values() for m in expected])
+        self.assertEqual((header.values(), decoded),
+                         self.baselineDecode(path))
+
+    def testUncompressed(self):
+        self.check(False, 1 << 24)
+
+    def testGzipped(self):
+        self.check(True, 1 << 24)
+
+    def testGzippedSmallChunks(self):
+        # Messages and varints straddle the chunk boundaries
+        self.check(True, 5)
+
+    def testSkipMessage(self):
+        expected = records(50)
+        path = self.writeTrace('trace', Record(), expected)
+        reader = protolib.MessageReader(path)
+        reader.read(4)
+        reader.skipMessage()
+        skipped = 0
+        while reader.skipMessage():
+            skipped += 1
+        self.assertEqual(skipped, len(expected))
+        self.assertEqual(reader.tell(), os.path.getsize(path))
+
+    def testEmptyMessageAtEnd(self):
+        path = self.writeTrace('trace', Record(), [Record(tick=5), Record()])
+        reader = protolib.MessageReader(path)
+        reader.read(4)
+        reader.decodeMessage(Record())
+        self.assertEqual([m.values() for m in reader.messages(Record)],
+                         [(5, 0, 0), (0, 0, 0)])
+
+class MessageWriterTest(TraceTestCase):
+    def testMatchesEncodeMessage(self):
+        expected = records(500)
+        baseline = self.writeTrace('baseline', Record(tick=1), expected)
+
+        path = os.path.join(self.dir, 'trace')
+        # A small buffer, so that it is flushed many times
+        writer = protolib.MessageWriter(open(path, 'wb'), buffer_size=100)
+        writer.write("gem5")
+        writer.encodeMessage(Record(tick=1))
+        for message in expected:
+            writer.encodeMessage(message)
+        writer.close()
+
+        with open(baseline, 'rb') as f, open(path, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+COLUMNS = [('tick', 'u8'), ('addr', 'u8'), ('size', 'u4')]
+
+class DecodeColumnsTest(TraceTestCase):
+    def setUp(self):
+        TraceTestCase.setUp(self)
+        self.expected = records(1000)
+        self.trace = self.writeTrace('trace.gz', Record(tick=1),
+                                     self.expected, compressed=True)
+
+    def decode(self, out_format='npz', **kwargs):
+        out_file = os.path.join(self.dir, 'columns.' + out_format)
+        kwargs.setdefault('jobs', 3)
+        kwargs.setdefault('chunk_messages', 64)
+        header, count = protolib.decodeColumns(
+            self.trace, Record, Record, COLUMNS, out_file, out_format,
+            **kwargs)
+        return header, count, out_file
+
+    def loadColumns(self, out_file):
+        import numpy
+        arrays = numpy.load(out_file)
+        return list(zip(*[arrays[name].tolist() for name, _ in COLUMNS]))
+
+    def testMatchesDecodeMessage(self):
+        header, count, out_file = self.decode()
+        baseline_header, baseline = self.baselineDecode(self.trace)
+        self.assertEqual(header.values(), baseline_header)
+        self.assertEqual(count, len(baseline))
+        self.assertEqual(self.loadColumns(out_file), baseline)
+
+    def testCsv(self):
+        header, count, out_file = self.decode('csv')
+        rows = []
+        for i in range(3):
+            with open(out_file[:-4] + '.%d.csv' % i) as f:
+                self.assertEqual(f.readline().strip(), 'tick,addr,size')
+                rows += [tuple(int(v) for v in line.split(','))
+                         for line in f]
+        self.assertEqual(rows, self.baselineDecode(self.trace)[1])
+
+    def testKeyRange(self):
+        index_file = os.path.join(self.dir, 'trace.idx')
+        _, _, out_file = self.decode(key='tick', key_range=(200000, 300000),
+                                     index_file=index_file)
+        baseline = [m for m in self.baselineDecode(self.trace)[1]
+                    if 200000 <= m[0] <= 300000]
+        self.assertEqual(self.loadColumns(out_file), baseline)
+
+    def testIndexReuseSkipsDecompression(self):
+        index_file = os.path.join(self.dir, 'trace.idx')
+        _, _, out_file = self.decode(index_file=index_file)
+        first = self.loadColumns(out_file)
+        self.assertTrue(os.path.exists(index_file + '.trace'))
+
+        def fail(*args):
+            raise AssertionError("the trace was decompressed again")
+        copyfileobj = protolib.shutil.copyfileobj
+        protolib.shutil.copyfileobj = fail
+        try:
+            _, _, out_file = self.decode(index_file=index_file)
+        finally:
+            protolib.shutil.copyfileobj = copyfileobj
+        self.assertEqual(self.loadColumns(out_file), first)
+
+    def testChangedTraceIsDecompressedAgain(self):
+        index_file = os.path.join(self.dir, 'trace.idx')
+        self.decode(index_file=index_file)
+        self.expected = records(300)
+        self.writeTrace('trace.gz', Record(tick=2), self.expected,
+                        compressed=True)
+        # Make sure the signature changes even within one mtime tick
+        st = os.stat(self.trace)
+        os.utime(self.trace, (st.st_atime, st.st_mtime + 10))
+        header, count, out_file = self.decode(index_file=index_file)
+        self.assertEqual(header.values(), (2, 0, 0))
+        self.assertEqual(self.loadColumns(out_file),
+                         [m.values() for m in self.expected])
+
+if __name__ == '__main__':
+    unittest.main()
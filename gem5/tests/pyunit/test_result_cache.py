@@ -0,0 +1,179 @@
+"""
+Checks that run_script.py answers sweep points from a warm result cache
+with the same stats and measurements as a fresh run, without launching
+the simulator.
+
+Run with python -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__),
+                                os.pardir, os.pardir))
+import result_cache
+import run_script
+
+STATS = '''
+---------- Begin Simulation Statistics ----------
+sim_seconds                                  0.000100                       # Number of seconds simulated
+system.ruby.network.average_flit_latency     %(latency)f                       # average flit latency
+system.ruby.network.saturated_at_cycle       %(saturated)d                       # cycle at which the network saturated
+system.ruby.network.flits_received::0        %(flits)d                       # flits received
+system.ruby.network.flits_received::1        0                       # flits received
+system.ruby.network.flits_received::total    %(flits)d                       # flits received
+
+---------- End Simulation Statistics   ----------
+'''
+
+class FakeSimulator(object):
+    """
+    Stands in for subprocess.Popen(gem5.opt ...). It writes a stats.txt
+    whose latency grows with the injection rate, and exits at once.
+    """
+    launched = []
+
+    def __init__(self, command):
+        FakeSimulator.launched.append(command)
+        output_dir = command[command.index('-d') + 1]
+        rate = [float(flag.split('=', 1)[1]) for flag in command
+                if flag.startswith('--injectionrate=')][0]
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        with open(os.path.join(output_dir, 'stats.txt'), 'w') as f:
+            f.write(STATS % { 'latency' : 10 + 1000 * rate ** 2 + rate / 3,
+                              'saturated' : 5000 if rate > 0.35 else 0,
+                              'flits' : int(rate * 1e6) })
+        self.returncode = 0
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+    def wait(self):
+        return self.returncode
+
+def no_simulator(command):
+    raise AssertionError('the simulator was launched for %s' % command)
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = dict((name, getattr(run_script, name)) for name in
+                          ('BINARY', 'SIMULATOR', 'LOGS'))
+        self.popen = run_script.subprocess.Popen
+
+        # The inputs that the cache key hashes
+        for name in ('gem5.opt', 'synth.py', 'mesh.txt', 'spin.txt'):
+            with open(os.path.join(self.dir, name), 'w') as f:
+                f.write('contents of %s\n' % name)
+        run_script.BINARY = os.path.join(self.dir, 'gem5.opt')
+        run_script.SIMULATOR = os.path.join(self.dir, 'synth.py')
+        run_script.LOGS = os.path.join(self.dir, 'log.log')
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        FakeSimulator.launched = []
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(run_script, name, value)
+        run_script.subprocess.Popen = self.popen
+        shutil.rmtree(self.dir)
+
+    def experiments(self, output_dir, search):
+        network = run_script.NetworkConfiguration(
+            num_cores=16, num_rows=4,
+            mesh_config=os.path.join(self.dir, 'mesh.txt'),
+            spin_config=os.path.join(self.dir, 'spin.txt'),
+            virtual_channels=4,
+            routing_algorithm=run_script.routing_algorithms['UP_DN_'],
+            spin_freq=1024)
+        simulation = run_script.SimulationConfiguration(
+            output_dir=os.path.join(self.dir, output_dir),
+            max_packet_latency=100.0, injection_rate_delta=0.01,
+            max_speculation=3, search=search, knee_budget=2)
+        return [run_script.Experiment(network,
+                                      run_script.SoftwareConfiguration(
+                                          benchmark, 1000), simulation)
+                for benchmark in ('uniform_random', 'transpose')]
+
+    def sweep(self, output_dir, simulator, search='linear'):
+        run_script.subprocess.Popen = simulator
+        experiments = self.experiments(output_dir, search)
+        scheduler = run_script.Scheduler(
+            experiments, num_workers=2,
+            cache=result_cache.ResultCache(self.cache_dir))
+        results = scheduler.run()
+        return experiments, [[(m.injection_rate, m.packet_latency,
+                               m.saturated) for m in measurements]
+                             for measurements in results]
+
+    def check(self, search):
+        experiments, fresh = self.sweep('fresh', FakeSimulator, search)
+        self.assertTrue(FakeSimulator.launched)
+        self.assertTrue(all(len(points) > 3 for points in fresh))
+
+        # A warm run only reads the cache, and measures the same points
+        _, warm = self.sweep('warm', no_simulator, search)
+        self.assertEqual(warm, fresh)
+
+        # Every cached entry holds exactly the stats of its fresh run
+        cache = result_cache.ResultCache(self.cache_dir)
+        for experiment in experiments:
+            for rate, _, _ in fresh[experiments.index(experiment)]:
+                stats = experiment.read_stats(rate)
+                self.assertEqual(
+                    cache.get(experiment.get_cache_key(rate)), stats)
+                self.assertEqual(
+                    stats['system.ruby.network.flits_received::total'],
+                    int(rate * 1e6))
+        return experiments, fresh
+
+    def testLinear(self):
+        self.check('linear')
+
+    def testBisection(self):
+        self.check('bisection')
+
+    def testChangedInputMisses(self):
+        experiments, fresh = self.check('linear')
+        rate = fresh[0][0][0]
+        key = experiments[0].get_cache_key(rate)
+        with open(os.path.join(self.dir, 'mesh.txt'), 'a') as f:
+            f.write('one more link\n')
+        # The file hashes are remembered by size and mtime, which both
+        # change here
+        self.assertNotEqual(experiments[0].get_cache_key(rate), key)
+        cache = result_cache.ResultCache(self.cache_dir)
+        self.assertEqual(cache.get(experiments[0].get_cache_key(rate)), None)
+
+        FakeSimulator.launched = []
+        _, rerun = self.sweep('rerun', FakeSimulator)
+        self.assertEqual(rerun, fresh)
+        self.assertTrue(FakeSimulator.launched)
+
+    def testPrune(self):
+        self.check('linear')
+        cache = result_cache.ResultCache(self.cache_dir)
+        # Use the entries one second apart, so that their order is known
+        for i, (key, _, _) in enumerate(cache.entries()):
+            os.utime(cache.path(key), (1000 + i, 1000 + i))
+        entries = cache.entries()
+        size = sum(entry[1] for entry in entries)
+        # A hit makes the least recently used entry the most recent one
+        cache.get(entries[0][0])
+        entries = entries[1:] + [cache.entries()[-1]]
+        self.assertEqual(cache.entries(), entries)
+        # Only the least recently used entry is evicted
+        self.assertEqual(cache.prune(size - 1), 1)
+        self.assertEqual(cache.entries(), entries[1:])
+        self.assertEqual(cache.clear(), len(entries) - 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks the SQLite backend of util/stats: stats.txt ingest, and get(),
+data() and query() on a database that loads its stats lazily, against the
+stats.txt values and against a database that loads every stat on
+connect, as Database.connect() used to.
+
+Run with python2 -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__),
+                                os.pardir, os.pardir, 'util', 'stats'))
+import db
+import dbinit
+
+DUMP = '''
+---------- Begin Simulation Statistics ----------
+sim_seconds                                  %(seconds)s                       # Number of seconds simulated
+final_tick                                   %(tick)d                       # Number of ticks from beginning of simulation
+system.cpu.numCycles                         %(cycles)d                       # number of cpu cycles simulated
+system.cpu.committedInsts::0                 %(insts0)d                       # Number of instructions committed
+system.cpu.committedInsts::1                 %(insts1)d                       # Number of instructions committed
+system.cpu.ipc                               nan                       # IPC: Instructions Per Cycle
+system.mem.latency::samples                  %(samples)d                       # Memory latency
+system.mem.latency::mean                     %(mean)s                       # Memory latency
+
+---------- End Simulation Statistics   ----------
+'''
+
+RUNS = {
+    'a' : [ dict(seconds='0.000100', tick=100000000, cycles=200000,
+                 insts0=1000, insts1=3000, samples=10, mean='12.500000') ],
+    'b' : [ dict(seconds='0.000050', tick=50000000, cycles=100000,
+                 insts0=700, insts1=0, samples=4, mean='3.250000'),
+            dict(seconds='0.000150', tick=150000000, cycles=300000,
+                 insts0=2100, insts1=5, samples=9, mean='7.000000') ],
+}
+
+class Options(object):
+    pass
+
+class SQLiteTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.rundirs = {}
+        for name,dumps in RUNS.items():
+            rundir = os.path.join(self.dir, 'runs', name)
+            os.makedirs(rundir)
+            with open(os.path.join(rundir, 'stats.txt'), 'w') as f:
+                for dump in dumps:
+                    f.write(DUMP % dump)
+            self.rundirs[name] = os.path.normpath(rundir)
+
+        options = Options()
+        options.db = os.path.join(self.dir, 'stats.db')
+        options.user = 'test'
+        mydb = dbinit.SQLiteDB(options)
+        mydb.connect()
+        mydb.populate()
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            self.assertEqual(mydb.ingest([ os.path.join(self.dir, 'runs') ],
+                                         jobs=2), 2)
+        finally:
+            sys.stdout = stdout
+
+        # A formula over two top level names, as the simulator stores them
+        mydb.query('''insert into stats (st_name,st_descr,st_type,st_print,
+                   st_prereq,st_prec,st_nozero,st_nonan,st_total,st_pdf,
+                   st_cdf,st_min,st_max,st_bktsize,st_size)
+                   values ('cycles_per_second','','FORMULA',1,0,6,0,0,0,0,
+                   0,0,0,0,0)''')
+        mydb.query('insert into formulas (fm_stat,fm_formula) values (?,?)',
+                   (mydb.cursor.lastrowid,
+                    'system.cpu.numCycles / sim_seconds'))
+        mydb.close()
+        self.path = options.db
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def database(self, eager=False):
+        source = db.Database()
+        source.backend = 'sqlite'
+        source.db = self.path
+        source.connect()
+        if eager:
+            source.loadAllStats()
+        return source
+
+    def expected(self, run, sample=-1):
+        """
+        The values of the stats of a run, straight from its stats.txt.
+        """
+        dump = RUNS[run][sample]
+        return {
+            'sim_seconds' : float(dump['seconds']),
+            'final_tick' : float(dump['tick']),
+            'system.cpu.numCycles' : float(dump['cycles']),
+            'system.cpu.committedInsts' :
+                [ float(dump['insts0']), float(dump['insts1']) ],
+            'system.mem.latency' :
+                [ float(dump['samples']), float(dump['mean']) ],
+        }
+
+    def testRuns(self):
+        source = self.database()
+        self.assertEqual(sorted(source.allRunNames),
+                         sorted(self.rundirs.values()))
+        # Nothing but the runs is read on connect
+        self.assertEqual(source.allStats, [])
+
+    def testGet(self):
+        source = self.database()
+        source.ticks = [ 100000000 ]
+        for name,value in self.expected('a').items():
+            stat = source.getStat('^%s$' % name)[0]
+            self.assertEqual(source.get(self.rundirs['a'], stat), value)
+        # The NaN was dropped
+        self.assertEqual(source.getStat(r'^system\.cpu\.ipc$'), [])
+
+    def testLazyMatchesEager(self):
+        lazy = self.database()
+        eager = self.database(eager=True)
+        for source in (lazy, eager):
+            source.ticks = [ 150000000 ]
+        for name in self.expected('b'):
+            top = name.split('.')[0]
+            path = name.split('.')[1:]
+            stat = lazy[top]
+            for attr in path:
+                stat = getattr(stat, attr)
+            self.assertEqual(lazy.get(self.rundirs['b'], stat),
+                             eager.get(self.rundirs['b'],
+                                       eager.allStatNames[name]))
+        # Only what was looked up was loaded
+        self.assertTrue(len(lazy.allStats) < len(eager.allStats))
+
+    def testFormula(self):
+        source = self.database()
+        source.ticks = [ 100000000 ]
+        formula = source['cycles_per_second']
+        # Looking up the formula loaded the stats it refers to
+        self.assertTrue('system' in source.stattop)
+        self.assertTrue('sim_seconds' in source.stattop)
+        expected = self.expected('a')
+        self.assertEqual(source.get(self.rundirs['a'], formula),
+                         expected['system.cpu.numCycles'] /
+                         expected['sim_seconds'])
+
+    def testData(self):
+        source = self.database()
+        run = source.allRunNames[self.rundirs['b']].run
+        cycles = source.getStat(r'^system\.cpu\.numCycles$')[0]
+        insts = source.getStat(r'^system\.cpu\.committedInsts$')[0]
+        first = self.expected('b', 0)
+        last = self.expected('b', 1)
+
+        # Every sample, summed
+        result = source.data(cycles)
+        self.assertEqual(result[run], [ [ first['system.cpu.numCycles'] +
+                                          last['system.cpu.numCycles'] ] ])
+
+        source.method = 'avg'
+        result = source.data(insts)
+        self.assertEqual([ row[0] for row in result[run] ],
+                         [ (f + l) / 2 for f,l in
+                           zip(first['system.cpu.committedInsts'],
+                               last['system.cpu.committedInsts']) ])
+
+        source.method = 'stdev'
+        result = source.data(cycles)
+        self.assertEqual(result[run][0][0],
+                         abs(last['system.cpu.numCycles'] -
+                             first['system.cpu.numCycles']) / 2)
+
+        source.method = 'sum'
+        result = source.data(cycles, ticks=[ 50000000 ])
+        self.assertEqual(result[run], [ [ first['system.cpu.numCycles'] ] ])
+
+    def testQuery(self):
+        source = self.database()
+        run = source.allRunNames[self.rundirs['b']].run
+        source.query('select distinct dt_tick from data where dt_run=%d '
+                     'order by dt_tick' % run)
+        self.assertEqual([ row[0] for row in source.cursor.fetchall() ],
+                         [ 50000000, 150000000 ])
+
+    def testIngestAgain(self):
+        # Ingesting a run again replaces it
+        options = Options()
+        options.db = self.path
+        options.user = 'test'
+        mydb = dbinit.SQLiteDB(options)
+        mydb.connect()
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            mydb.ingest([ self.rundirs['a'] ], jobs=1)
+        finally:
+            sys.stdout = stdout
+        mydb.close()
+
+        source = self.database()
+        self.assertEqual(len(source.allRuns), 2)
+        stat = source.getStat(r'^system\.cpu\.numCycles$')[0]
+        self.assertEqual(source.get(self.rundirs['a'], stat),
+                         self.expected('a')['system.cpu.numCycles'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Checks that the NumPy evaluation of util/stats/info.py gives exactly what
+the element at a time evaluation does.
+
+Run with python2 -m unittest discover -s tests/pyunit from the gem5
+directory.
+"""
+
+from __future__ import division
+import operator
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__),
+                                os.pardir, os.pardir, 'util', 'stats'))
+import info
+
+def scalarStat(name, data):
+    stat = info.ScalarStat()
+    stat.name = name
+    stat.data = dict((run, [ (val,) ]) for run,val in data.items())
+    return stat
+
+def vectorStat(name, data, x):
+    stat = info.VectorStat()
+    stat.name = name
+    stat.data = dict((run, [ (val,) for val in vals ])
+                     for run,vals in data.items())
+    stat.x = x
+    return stat
+
+RUNS = [ 0, 1, 2, 3 ]
+
+class ArrayValueTest(unittest.TestCase):
+    def setUp(self):
+        self.numpy = info.numpy
+        self.assertIsNotNone(self.numpy, "NumPy is needed for these tests")
+
+        # Run 3 is missing from every stat
+        self.ints = vectorStat('ints', { 0 : [ 3, 4, 2**60 + 1 ],
+                                 1 : [ 0, 7, 2**62 ],
+                                 2 : [ 5, 0, -9 ] }, 3)
+        self.floats = vectorStat('floats', { 0 : [ 0.5, 1.25, 3.0 ],
+                                   1 : [ 2.0, 0.0, 1e20 ],
+                                   2 : [ 1.5, 4.0, 0.1 ] }, 3)
+        self.count = scalarStat('count', { 0 : 2**55 + 3, 1 : 0, 2 : 7 })
+        self.time = scalarStat('time', { 0 : 0.25, 1 : 3.0, 2 : 0.0 })
+
+    def tearDown(self):
+        info.numpy = self.numpy
+
+    def both(self, func, stat):
+        """
+        Evaluate func(stat) with NumPy and without it.
+        """
+        info.numpy = self.numpy
+        array = func(stat)
+        info.numpy = None
+        scalar = func(stat)
+        info.numpy = self.numpy
+        return array, scalar
+
+    def check(self, stat, exact=True):
+        if info.vector(stat):
+            funcs = [ lambda stat: [ info.values(stat, run) for run in RUNS ],
+                      lambda stat: info.runvalues(stat, RUNS),
+                      lambda stat: info.runtotals(stat, RUNS) ]
+        else:
+            funcs = [ lambda stat: info.runvalues(stat, RUNS) ]
+        for func in funcs:
+            array, scalar = self.both(func, stat)
+            self.assertEqual(array, scalar, '%s: %s != %s' %
+                             (stat, array, scalar))
+            # Equal values of different types, e.g. 1 and 1.0, are not
+            # good enough, unless a vector mixes integers and floats
+            if exact:
+                self.assertEqual(repr(array), repr(scalar))
+
+    def testLargeIntegers(self):
+        info.numpy = self.numpy
+        self.assertEqual(info.values(self.ints, 0), [ 3, 4, 2**60 + 1 ])
+        self.assertEqual(info.runtotals(self.ints, [ 1 ]), [ 2**62 + 7 ])
+        self.assertEqual(info.runvalues(self.count, [ 0 ]), [ 2**55 + 3 ])
+        self.check(self.ints)
+        self.check(self.count)
+
+    def testFloats(self):
+        self.check(self.floats)
+        self.check(self.time)
+
+    def testUnary(self):
+        for stat in (self.ints, self.floats, self.count, self.time):
+            self.check(-stat)
+            self.check(abs(stat))
+
+    def testBinary(self):
+        ints, floats, count, time = \
+            self.ints, self.floats, self.count, self.time
+        for stat in (ints + 1, ints * ints, ints - count, count * 3,
+                     ints + floats, floats * time, count + time,
+                     1 - ints, 2**61 + ints, ints[2] + count):
+            self.check(stat)
+
+    def testDivision(self):
+        # Dividing by zero is missing, like a missing value
+        ints, floats, count, time = \
+            self.ints, self.floats, self.count, self.time
+        for stat in (ints / 2, ints // 2, ints / count, ints // count,
+                     count / ints[0], ints / floats, floats / time,
+                     count / time, 1 / ints, 2**60 / ints[1]):
+            self.check(stat)
+        self.check(info.BinaryProxy(operator.__div__, ints, count))
+        self.check(info.BinaryProxy(operator.__div__, ints, 3))
+
+    def testConstants(self):
+        self.check(info.WrapValue(2**60 + 1))
+        self.check(info.WrapValue([ 1, 2**60 + 1, 3 ]))
+        # The integers of a vector with floats become floats
+        self.check(info.WrapValue([ 1, 2.5 ]) * 2, exact=False)
+
+if __name__ == '__main__':
+    unittest.main()
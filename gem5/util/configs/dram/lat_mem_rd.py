@@ -171,7 +171,7 @@ itt = 150 * 1000
 # the actual measurement
 def create_trace(filename, max_addr, burst_size, itt):
     try:
-        proto_out = gzip.open(filename, 'wb')
+        proto_out = protolib.MessageWriter(gzip.open(filename, 'wb'))
     except IOError:
         print("Failed to open ", filename, " for writing")
         exit(-1)
@@ -185,7 +185,7 @@ def create_trace(filename, max_addr, burst_size, itt):
     header.obj_id = "lat_mem_rd for range 0:" + str(max_addr)
     # assume the default tick rate (1 ps)
     header.tick_freq = 1000000000000
-    protolib.encodeMessage(proto_out, header)
+    proto_out.encodeMessage(header)
 
     # create a list of every single address to touch
     addrs = range(0, max_addr, burst_size)
@@ -204,7 +204,7 @@ def create_trace(filename, max_addr, burst_size, itt):
     for addr in addrs:
         packet.tick = long(tick)
         packet.addr = long(addr)
-        protolib.encodeMessage(proto_out, packet)
+        proto_out.encodeMessage(packet)
         tick = tick + itt
 
     proto_out.close()
@@ -89,6 +89,7 @@
 # 8,35670,1,STORE,1748748,4,74,0:,6,3:,7
 # 9,35670,1,COMP,500::,7
 
+import optparse
 import protolib
 import sys
 
@@ -109,18 +110,56 @@ except:
         print "Failed to import proto definitions"
         exit(-1)
 
+# Columns of the columnar formats, with their NumPy types
+columns = [('seq_num', 'u8'), ('type', 'u4'), ('pc', 'u8'), ('weight', 'u4'),
+           ('p_addr', 'u8'), ('size', 'u4'), ('flags', 'u4'),
+           ('comp_delay', 'u8')]
+
+def decodeColumns(options, args):
+    print "Decoding columns with", options.jobs or "all", "processes"
+    header, num_messages = protolib.decodeColumns(
+            args[0], inst_dep_record_pb2.InstDepRecordHeader,
+            inst_dep_record_pb2.InstDepRecord, columns, args[1],
+            options.format, jobs=options.jobs, index_file=options.index)
+    print "Object id:", header.obj_id
+    print "Tick frequency:", header.tick_freq
+    print "Decoded packets:", num_messages
+
 def main():
-    if len(sys.argv) != 3:
-        print "Usage: ", sys.argv[0], " <protobuf input> <ASCII output>"
-        exit(-1)
+    parser = optparse.OptionParser(
+        usage="%prog [options] <protobuf input> <output>")
+    parser.add_option("--format", type="choice",
+                      choices=["text", "npz", "npy", "csv"], default="text",
+                      help="text: an ASCII dump, as a single process. "
+                      "npz, npy, csv: only the scalar fields, decoded by "
+                      "several processes, into a NumPy archive with an "
+                      "array per column, a NumPy structured array, or CSV "
+                      "files sharded per process, named "
+                      "<output>.<shard>.csv [default: %default]")
+    parser.add_option("-j", "--jobs", type="int", default=None,
+                      help="number of processes decoding columns "
+                      "[default: one per CPU]")
+    parser.add_option("--index", type="string", default=None,
+                      help="keep the message index of the trace in this "
+                      "file, so that later runs on the same trace skip "
+                      "scanning it. A gzipped trace is also kept "
+                      "decompressed in <index>.trace, so that later runs "
+                      "skip decompressing it")
+    (options, args) = parser.parse_args()
+    if len(args) != 2:
+        parser.error("expected a protobuf input and an output")
+
+    if options.format != "text":
+        decodeColumns(options, args)
+        return
 
     # Open the file on read mode
-    proto_in = protolib.openFileRd(sys.argv[1])
+    proto_in = protolib.MessageReader(args[0])
 
     try:
-        ascii_out = open(sys.argv[2], 'w')
+        ascii_out = open(args[1], 'w')
     except IOError:
-        print "Failed to open ", sys.argv[2], " for writing"
+        print "Failed to open ", args[1], " for writing"
         exit(-1)
 
     # Read the magic number in 4-byte Little Endian
@@ -134,7 +173,7 @@ def main():
 
     # Add the packet header
     header = inst_dep_record_pb2.InstDepRecordHeader()
-    protolib.decodeMessage(proto_in, header)
+    proto_in.decodeMessage(header)
 
     print "Object id:", header.obj_id
     print "Tick frequency:", header.tick_freq
@@ -151,10 +190,9 @@ def main():
     num_packets = 0
     num_regdeps = 0
     num_robdeps = 0
-    packet = inst_dep_record_pb2.InstDepRecord()
 
     # Decode the packet messages until we hit the end of the file
-    while protolib.decodeMessage(proto_in, packet):
+    for packet in proto_in.messages(inst_dep_record_pb2.InstDepRecord):
         num_packets += 1
 
         # Write to file the seq num
@@ -76,7 +76,7 @@ def main():
         exit(-1)
 
     # Open the file in read mode
-    proto_in = protolib.openFileRd(sys.argv[1])
+    proto_in = protolib.MessageReader(sys.argv[1])
 
     try:
         ascii_out = open(sys.argv[2], 'w')
@@ -95,7 +95,7 @@ def main():
 
     # Add the packet header
     header = inst_pb2.InstHeader()
-    protolib.decodeMessage(proto_in, header)
+    proto_in.decodeMessage(header)
 
     print "Object id:", header.obj_id
     print "Tick frequency:", header.tick_freq
@@ -109,11 +109,10 @@ def main():
     print "Parsing instructions"
 
     num_insts = 0
-    inst = inst_pb2.Inst()
 
     # Decode the inst messages until we hit the end of the file
     optional_fields = ('tick', 'type', 'inst_flags', 'addr', 'size', 'mem_flags')
-    while protolib.decodeMessage(proto_in,  inst):
+    for inst in proto_in.messages(inst_pb2.Inst):
         # If we have a tick use it, otherwise count instructions
         if inst.HasField('tick'):
             tick = inst.tick
@@ -38,9 +38,11 @@
 # Authors: Andreas Hansson
 
 # This script is used to dump protobuf packet traces to ASCII
-# format.
+# format, or to decode their cmd, addr, size, tick and pc columns in
+# parallel, to NumPy arrays or sharded CSV files.
 
 import os
+import optparse
 import protolib
 import subprocess
 import sys
@@ -50,32 +52,84 @@ util_dir = os.path.dirname(os.path.realpath(__file__))
 subprocess.check_call(['make', '--quiet', '-C', util_dir, 'packet_pb2.py'])
 import packet_pb2
 
+# Columns of the columnar formats, with their NumPy types
+columns = [('cmd', 'u4'), ('addr', 'u8'), ('size', 'u4'), ('tick', 'u8'),
+           ('pc', 'u8')]
+
+def decodeColumns(options, args, tick_range):
+    print "Decoding columns with", options.jobs or "all", "processes"
+    header, num_messages = protolib.decodeColumns(
+            args[0], packet_pb2.PacketHeader, packet_pb2.Packet, columns,
+            args[1], options.format, jobs=options.jobs,
+            key='tick', key_range=tick_range, index_file=options.index)
+    print "Object id:", header.obj_id
+    print "Tick frequency:", header.tick_freq
+    print "Decoded packets:", num_messages
+
 def main():
-    if len(sys.argv) != 3:
-        print "Usage: ", sys.argv[0], " <protobuf input> <ASCII output>"
-        exit(-1)
+    parser = optparse.OptionParser(
+        usage="%prog [options] <protobuf input> <output>")
+    parser.add_option("--format", type="choice",
+                      choices=["text", "npz", "npy", "csv"], default="text",
+                      help="text: an ASCII dump, as a single process. "
+                      "npz, npy, csv: only the columns cmd, addr, size, "
+                      "tick and pc, decoded by several processes, into a "
+                      "NumPy archive with an array per column, a NumPy "
+                      "structured array, or CSV files sharded per process, "
+                      "named <output>.<shard>.csv [default: %default]")
+    parser.add_option("-j", "--jobs", type="int", default=None,
+                      help="number of processes decoding columns "
+                      "[default: one per CPU]")
+    parser.add_option("--index", type="string", default=None,
+                      help="keep the message index of the trace in this "
+                      "file, so that later runs on the same trace skip "
+                      "scanning it. A gzipped trace is also kept "
+                      "decompressed in <index>.trace, so that later runs "
+                      "skip decompressing it")
+    parser.add_option("--tick-range", type="string", default="",
+                      help="START:END, only decode the packets with a tick "
+                      "in this range, inclusive. Packet traces are in tick "
+                      "order, so the message index skips the rest of the "
+                      "trace.")
+    (options, args) = parser.parse_args()
+    if len(args) != 2:
+        parser.error("expected a protobuf input and an output")
+
+    tick_range = None
+    if options.tick_range:
+        try:
+            start, end = options.tick_range.split(":")
+            tick_range = (long(start), long(end))
+        except ValueError:
+            parser.error("--tick-range should be START:END")
+        if options.format == "text":
+            parser.error("--tick-range needs a columnar --format")
+
+    if options.format != "text":
+        decodeColumns(options, args, tick_range)
+        return
 
     # Open the file in read mode
-    proto_in = protolib.openFileRd(sys.argv[1])
+    proto_in = protolib.MessageReader(args[0])
 
     try:
-        ascii_out = open(sys.argv[2], 'w')
+        ascii_out = open(args[1], 'w')
     except IOError:
-        print "Failed to open ", sys.argv[2], " for writing"
+        print "Failed to open ", args[1], " for writing"
         exit(-1)
 
     # Read the magic number in 4-byte Little Endian
     magic_number = proto_in.read(4)
 
     if magic_number != "gem5":
-        print "Unrecognized file", sys.argv[1]
+        print "Unrecognized file", args[0]
         exit(-1)
 
     print "Parsing packet header"
 
     # Add the packet header
     header = packet_pb2.PacketHeader()
-    protolib.decodeMessage(proto_in, header)
+    proto_in.decodeMessage(header)
 
     print "Object id:", header.obj_id
     print "Tick frequency:", header.tick_freq
@@ -86,10 +140,9 @@ def main():
     print "Parsing packets"
 
     num_packets = 0
-    packet = packet_pb2.Packet()
 
     # Decode the packet messages until we hit the end of the file
-    while protolib.decodeMessage(proto_in, packet):
+    for packet in proto_in.messages(packet_pb2.Packet):
         num_packets += 1
         # ReadReq is 1 and WriteReq is 4 in src/mem/packet.hh Command enum
         cmd = 'r' if packet.cmd == 1 else ('w' if packet.cmd == 4 else 'u')
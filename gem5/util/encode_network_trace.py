@@ -0,0 +1,128 @@
+#!/usr/bin/env python2
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are
+# met: redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer;
+# redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution;
+# neither the name of the copyright holders nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# This script converts gzipped text network traces, as injected by
+# garnet with --network-trace-enable, to the binary format that
+# GarnetNetwork memory-maps (see
+# src/mem/ruby/network/garnet2.0/NetworkTrace.hh).
+#
+# A text trace starts with a header block of --header-lines lines,
+# which is kept verbatim in the binary trace. Every other line is one
+# packet, with whitespace separated fields:
+#   time src_ni src_router dest_ni dest_router vnet num_flits
+# Packets must be in time order.
+#
+# The trace is streamed, and records are written out in chunks, so
+# traces of any size are converted in constant memory.
+#
+# Usage:
+#   encode_network_trace.py [--header-lines N] <trace.gz> <trace.bin>
+
+import gzip
+import optparse
+import struct
+import sys
+
+MAGIC = b"GNETTRC\0"
+VERSION = 1
+
+# magic, version, record_size, num_records, text_size
+HEADER = struct.Struct("<8sIIQQ")
+# time, src_ni, src_router, dest_ni, dest_router, vnet, num_flits
+RECORD = struct.Struct("<Qiiiiii")
+
+# Records buffered before each write
+CHUNK_RECORDS = 1 << 16
+
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def encode(text_in, bin_out, header_lines):
+    header = b"".join(text_in.readline() for _ in range(header_lines))
+
+    # num_records is only known at the end, the header is rewritten then
+    bin_out.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0, len(header)))
+    bin_out.write(header)
+    bin_out.write(b"\0" * (-len(header) % 8))
+
+    chunk = bytearray(CHUNK_RECORDS * RECORD.size)
+    in_chunk = 0
+    num_records = 0
+    last_time = 0
+    line_num = header_lines
+
+    for line in text_in:
+        line_num += 1
+        fields = line.split()
+        if not fields:
+            continue
+        if len(fields) != 7:
+            raise ValueError("line %d: expected 7 fields, got %d" %
+                             (line_num, len(fields)))
+
+        record = [int(field) for field in fields]
+        if record[0] < last_time:
+            raise ValueError("line %d: time %d is before %d" %
+                             (line_num, record[0], last_time))
+        last_time = record[0]
+
+        RECORD.pack_into(chunk, in_chunk * RECORD.size, *record)
+        in_chunk += 1
+        num_records += 1
+        if in_chunk == CHUNK_RECORDS:
+            bin_out.write(chunk)
+            in_chunk = 0
+
+    bin_out.write(chunk[:in_chunk * RECORD.size])
+
+    bin_out.seek(0)
+    bin_out.write(HEADER.pack(MAGIC, VERSION, RECORD.size, num_records,
+                              len(header)))
+    return num_records
+
+def main():
+    parser = optparse.OptionParser(
+        usage="%prog [options] <text trace> <binary trace>")
+    parser.add_option("--header-lines", type="int", default=13,
+                      help="number of header lines at the start of the "
+                      "text trace [default: %default]")
+    options, args = parser.parse_args()
+    if len(args) != 2:
+        parser.error("expected an input and an output trace")
+
+    text_in = open_text(args[0])
+    with open(args[1], "wb") as bin_out:
+        try:
+            num_records = encode(text_in, bin_out, options.header_lines)
+        except ValueError as e:
+            sys.exit("%s: %s" % (args[0], e))
+    text_in.close()
+
+    print("Wrote %d packets to %s" % (num_records, args[1]))
+
+if __name__ == "__main__":
+    main()
@@ -92,7 +92,7 @@ def main():
         exit(-1)
 
     try:
-        proto_out = open(sys.argv[2], 'wb')
+        proto_out = protolib.MessageWriter(open(sys.argv[2], 'wb'))
     except IOError:
         print "Failed to open ", sys.argv[2], " for writing"
         exit(-1)
@@ -106,7 +106,7 @@ def main():
     header.obj_id = "Converted ASCII trace " + sys.argv[1]
     # Assume the default tick rate
     header.tick_freq = 1000000000000
-    protolib.encodeMessage(proto_out, header)
+    proto_out.encodeMessage(header)
 
     # For each line in the ASCII trace, create a packet message and
     # write it to the encoded output
@@ -118,7 +118,7 @@ def main():
         packet.cmd = 1 if cmd == 'r' else 4
         packet.addr = long(addr)
         packet.size = int(size)
-        protolib.encodeMessage(proto_out, packet)
+        proto_out.encodeMessage(packet)
 
     # We're done
     ascii_in.close()
@@ -39,22 +39,22 @@
 
 # Pipeline activity viewer for the O3 CPU model.
 
+import bisect
+import heapq
 import optparse
 import os
 import sys
-import copy
 
-# Temporary storage for instructions. The queue is filled in out-of-order
-# until it reaches 'max_threshold' number of instructions. It is then
-# sorted out and instructions are printed out until their number drops to
-# 'min_threshold'.
+# Temporary storage for instructions. The queue is a reorder buffer of
+# 'max_threshold' instructions, kept as a heap ordered by sequence number:
+# once it is full, each new instruction pushes out the oldest one, which is
+# printed. Memory use is therefore bounded whatever the size of the window.
 # It is assumed that the instructions are not out of order for more then
-# 'min_threshold' places - otherwise they will appear out of order.
+# 'max_threshold' places - otherwise they will appear out of order.
 insts = {
-    'queue': [] ,         # Instructions to print.
-    'max_threshold':2000, # Instructions are sorted out and printed when
-                          # their number reaches this threshold.
-    'min_threshold':1000, # Printing stops when this number is reached.
+    'queue': [] ,         # Heap of (seq. number, arrival, instruction).
+    'queued':0,           # Instructions queued so far, to order ties.
+    'max_threshold':2000, # Size of the reorder buffer.
     'sn_start':0,         # The first instruction seq. number to be printed.
     'sn_stop':0,          # The last instruction seq. number to be printed.
     'tick_start':0,       # The first tick to be printed
@@ -67,8 +67,79 @@ insts = {
     'only_committed':0,   # Set if only committed instructions are printed.
 }
 
+# Sidecar index of a trace, kept next to it as TRACE_FILE.idx, which lets
+# a window that starts late in the trace be found without reading what
+# precedes it. Every INDEX_INTERVAL instructions it records the offset of
+# the instruction's fetch line, along with the largest fetch tick and
+# sequence number of all the instructions before it. Those maxima only
+# grow through the trace, so the last entry whose maxima are below the
+# start of the window is found by bisection, and nothing before it is in
+# the window, however out of order the trace is.
+INDEX_VERSION = 1
+INDEX_INTERVAL = 1024
+
+def index_signature(trace_name):
+    st = os.stat(trace_name)
+    return 'O3PipeViewIndex %d %d %d' % (INDEX_VERSION, st.st_size,
+                                         int(st.st_mtime))
+
+# Scans the whole trace once, and returns the index entries as
+# (offset, max. fetch tick before, max. seq. number before)
+def build_index(trace_name):
+    entries = []
+    max_tick = -1
+    max_sn = -1
+    offset = 0
+    num_insts = 0
+    with open(trace_name, 'rb') as trace:
+        for line in trace:
+            if line.startswith('O3PipeView:fetch:'):
+                if num_insts % INDEX_INTERVAL == 0:
+                    entries.append((offset, max_tick, max_sn))
+                num_insts += 1
+                fields = line.split(':')
+                max_tick = max(max_tick, int(fields[2]))
+                max_sn = max(max_sn, int(fields[5]))
+            offset += len(line)
+    return entries
+
+# Reads the index of a trace, or builds and saves it if it is missing or
+# older than the trace
+def load_index(trace_name, index_name):
+    signature = index_signature(trace_name)
+    try:
+        with open(index_name, 'r') as index:
+            if index.readline().rstrip('\n') == signature:
+                return [tuple(int(i) for i in line.split())
+                        for line in index]
+    except IOError:
+        pass
+
+    entries = build_index(trace_name)
+    try:
+        with open(index_name, 'w') as index:
+            index.write(signature + '\n')
+            for entry in entries:
+                index.write('%d %d %d\n' % entry)
+    except IOError as e:
+        print >>sys.stderr, 'Could not save the trace index: %s' % e
+    return entries
+
+# Returns the offset in the trace at which no instruction fetched at or
+# after start_tick, nor numbered start_sn or later, has been seen yet
+def index_offset(entries, start_tick, start_sn):
+    offset = 0
+    for start, column in ((start_tick, 1), (start_sn, 2)):
+        if start > 0:
+            maxima = [entry[column] for entry in entries]
+            i = bisect.bisect_left(maxima, start) - 1
+            if i >= 0:
+                offset = max(offset, entries[i][0])
+    return offset
+
 def process_trace(trace, outfile, cycle_time, width, color, timestamps,
-                  committed_only, store_completions, start_tick, stop_tick, start_sn, stop_sn):
+                  committed_only, store_completions, start_tick, stop_tick, start_sn, stop_sn,
+                  offset=None):
     global insts
 
     insts['sn_start'] = start_sn
@@ -80,8 +151,14 @@ def process_trace(trace, outfile, cycle_time, width, color, timestamps,
     line = None
     fields = None
 
-    # Skip lines up to the starting tick
-    if start_tick != 0:
+    # Seek to the offset found in the trace index, or skip lines up to the
+    # starting tick or instruction
+    if offset is not None:
+        trace.seek(offset)
+        line = trace.readline()
+        if not line: return
+        fields = line.split(':')
+    elif start_tick != 0:
         while True:
             line = trace.readline()
             if not line: return
@@ -131,7 +208,7 @@ def process_trace(trace, outfile, cycle_time, width, color, timestamps,
             if fields[1] == 'fetch':
                 if ((stop_tick > 0 and int(fields[2]) > stop_tick+insts['tick_drift']) or
                     (stop_sn > 0 and int(fields[5]) > (stop_sn+insts['max_threshold']))):
-                    print_insts(outfile, cycle_time, width, color, timestamps, 0)
+                    print_insts(outfile, cycle_time, width, color, timestamps, store_completions, 0)
                     return
                 (curr_inst['pc'], curr_inst['upc']) = fields[3:5]
                 curr_inst['sn'] = int(fields[5])
@@ -150,25 +227,22 @@ def process_trace(trace, outfile, cycle_time, width, color, timestamps,
         fields = line.split(':')
 
 
-#Sorts out instructions according to sequence number
-def compare_by_sn(a, b):
-    return cmp(a['sn'], b['sn'])
-
 # Puts new instruction into the print queue.
-# Sorts out and prints instructions when their number reaches threshold value
+# Prints the oldest instruction once the queue is over its size
 def queue_inst(outfile, inst, cycle_time, width, color, timestamps, store_completions):
     global insts
-    l_copy = copy.deepcopy(inst)
-    insts['queue'].append(l_copy)
+    # The fields are all numbers and strings, so a shallow copy will do
+    heapq.heappush(insts['queue'], (inst['sn'], insts['queued'], dict(inst)))
+    insts['queued'] += 1
     if len(insts['queue']) > insts['max_threshold']:
-        print_insts(outfile, cycle_time, width, color, timestamps, store_completions, insts['min_threshold'])
+        print_insts(outfile, cycle_time, width, color, timestamps, store_completions, insts['max_threshold'])
 
-# Sorts out and prints instructions in print queue
+# Prints instructions in print queue, in sequence number order, until
+# lower_threshold of them are left
 def print_insts(outfile, cycle_time, width, color, timestamps, store_completions, lower_threshold):
     global insts
-    insts['queue'].sort(compare_by_sn)
     while len(insts['queue']) > lower_threshold:
-        print_item=insts['queue'].pop(0)
+        print_item = heapq.heappop(insts['queue'])[2]
         # As the instructions are processed out of order the main loop starts
         # earlier then specified by start_sn/tick and finishes later then what
         # is defined in stop_sn/tick.
@@ -347,6 +421,21 @@ def main():
         '--store_completions',
         action='store_true', default=False,
         help="additionally display store completion ticks (default: '%default')")
+    parser.add_option(
+        '--reorder-size',
+        type='int', default=insts['max_threshold'],
+        help="number of instructions buffered to print them in order "
+        "(default: '%default')")
+    parser.add_option(
+        '--index',
+        dest='index_file', default=None,
+        help="trace index used to seek to the start of the tick or "
+        "instruction range, built by the first run that needs it "
+        "(default: TRACE_FILE.idx)")
+    parser.add_option(
+        '--no-index',
+        action='store_true', default=False,
+        help="find the start of the range by reading the trace up to it")
     (options, args) = parser.parse_args()
     if len(args) != 1:
         parser.error('incorrect number of arguments')
@@ -359,6 +448,18 @@ def main():
     if not inst_range:
         parser.error('invalid range')
         sys.exit(1)
+    if options.reorder_size < 1:
+        parser.error('invalid reorder size')
+        sys.exit(1)
+    insts['max_threshold'] = options.reorder_size
+
+    # Find the start of the range in the index
+    offset = None
+    if (tick_range[0] > 0 or inst_range[0] > 0) and not options.no_index:
+        index_file = options.index_file or args[0] + '.idx'
+        entries = load_index(args[0], index_file)
+        offset = index_offset(entries, tick_range[0], inst_range[0])
+
     # Process trace
     print 'Processing trace... ',
     with open(args[0], 'r') as trace:
@@ -366,7 +467,7 @@ def main():
             process_trace(trace, out, options.cycle_time, options.width,
                           options.color, options.timestamps,
                           options.only_committed, options.store_completions,
-                          *(tick_range + inst_range))
+                          *(tick_range + inst_range), offset=offset)
     print 'done!'
 
 
@@ -71,8 +71,15 @@
 # with protobuf python messages. For eg, the decode scripts for different
 # types of proto objects can use the same function to decode a single message
 
+import bisect
 import gzip
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
 import struct
+import tempfile
 
 def openFileRd(in_file):
     """
@@ -135,7 +142,9 @@ def decodeMessage(in_file, message):
     """
     try:
         size, pos = _DecodeVarint32(in_file)
-        if size == 0:
+        # An empty message still has a length, only the end of the file
+        # has none
+        if pos == 0:
             return False
         buf = in_file.read(size)
         message.ParseFromString(buf)
@@ -143,19 +152,24 @@ def decodeMessage(in_file, message):
     except IOError:
         return False
 
-def _EncodeVarint32(out_file, value):
+def _VarintBytes(value):
   """
   The encoding of the Varint32 is copied from
   google.protobuf.internal.encoder and is only repeated here to
   avoid depending on the internal functions in the library.
   """
+  pieces = []
   bits = value & 0x7f
   value >>= 7
   while value:
-    out_file.write(struct.pack('<B', 0x80 | bits))
+    pieces.append(struct.pack('<B', 0x80 | bits))
     bits = value & 0x7f
     value >>= 7
-  out_file.write(struct.pack('<B', bits))
+  pieces.append(struct.pack('<B', bits))
+  return "".join(pieces)
+
+def _EncodeVarint32(out_file, value):
+  out_file.write(_VarintBytes(value))
 
 def encodeMessage(out_file, message):
     """
@@ -164,3 +178,456 @@ def encodeMessage(out_file, message):
     out = message.SerializeToString()
     _EncodeVarint32(out_file, len(out))
     out_file.write(out)
+
+def _DecodeVarint32At(buf, pos):
+    """
+    Same as _DecodeVarint32, on the bytes of buf from pos on. Return
+    (value, position after the varint), or (None, pos) if buf ends first.
+    """
+    end = len(buf)
+    start = pos
+    result = 0
+    shift = 0
+    mask = 0xffffffff
+    while 1:
+        if pos == end:
+            return (None, start)
+        b = ord(buf[pos])
+        pos += 1
+        result |= ((b & 0x7f) << shift)
+        if not (b & 0x80):
+            break
+        shift += 7
+        if shift >= 64:
+            raise IOError('Too many bytes when decoding varint.')
+
+    if result > 0x7fffffffffffffff:
+        result -= (1 << 64)
+        result |= ~mask
+    else:
+        result &= mask
+    return (result, pos)
+
+class MessageReader(object):
+    """
+    Reads the length-prefixed messages of a trace from a large buffer,
+    rather than with a few small reads per message. Uncompressed files
+    are memory-mapped, and gzipped files are decompressed chunk_size
+    bytes at a time. Iterating over messages() decodes every remaining
+    message of a type:
+
+        proto_in = protolib.MessageReader(file_name)
+        magic_number = proto_in.read(4)
+        proto_in.decodeMessage(header)
+        for packet in proto_in.messages(packet_pb2.Packet):
+            ...
+    """
+    def __init__(self, in_file, chunk_size=1 << 24):
+        self.chunk_size = chunk_size
+        self._file = openFileRd(in_file)
+        self._buf = ""
+        self._pos = 0
+        # Offset in the uncompressed trace of the start of the buffer
+        self._offset = 0
+
+        if not isinstance(self._file, gzip.GzipFile):
+            try:
+                self._buf = mmap.mmap(self._file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+            except (ValueError, mmap.error):
+                # Empty files and pipes can't be mapped
+                self._buf = self._file.read()
+            self._file.close()
+            self._file = None
+
+    def _fill(self, size):
+        """
+        Make sure that the next size bytes are buffered. Return False if
+        the file ends before.
+        """
+        if self._pos + size <= len(self._buf):
+            return True
+        if self._file is None:
+            return False
+
+        pieces = [self._buf[self._pos:]]
+        buffered = len(pieces[0])
+        while buffered < size:
+            chunk = self._file.read(max(self.chunk_size, size - buffered))
+            if not chunk:
+                break
+            pieces.append(chunk)
+            buffered += len(chunk)
+        self._buf = "".join(pieces)
+        self._offset += self._pos
+        self._pos = 0
+        return buffered >= size
+
+    def _decodeVarint32(self):
+        """
+        Decode a varint from the buffer. Return None at the end of the
+        file.
+        """
+        # A varint is at most 10 bytes
+        self._fill(10)
+        result, self._pos = _DecodeVarint32At(self._buf, self._pos)
+        return result
+
+    def tell(self):
+        """
+        Return the offset of the next message in the uncompressed trace.
+        """
+        return self._offset + self._pos
+
+    def skipMessage(self):
+        """
+        Skip the next message. Return False at the end of the file.
+        """
+        size = self._decodeVarint32()
+        if size is None or not self._fill(size):
+            return False
+        self._pos += size
+        return True
+
+    def read(self, size):
+        """
+        Read size raw bytes, e.g. the magic number of a trace.
+        """
+        self._fill(size)
+        data = self._buf[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def nextMessage(self):
+        """
+        Return the encoded bytes of the next message, or None at the end
+        of the file.
+        """
+        size = self._decodeVarint32()
+        if size is None:
+            return None
+        if not self._fill(size):
+            # A truncated message ends the trace
+            return None
+        data = self._buf[self._pos:self._pos + size]
+        self._pos += size
+        return data
+
+    def decodeMessage(self, message):
+        """
+        Decode the next message into message. Return False if no message
+        could be read.
+        """
+        data = self.nextMessage()
+        if data is None:
+            return False
+        message.ParseFromString(data)
+        return True
+
+    def messages(self, message_type):
+        """
+        Iterate over the remaining messages, each decoded into a new
+        message_type.
+        """
+        while 1:
+            data = self.nextMessage()
+            if data is None:
+                return
+            message = message_type()
+            message.ParseFromString(data)
+            yield message
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        elif isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._buf = ""
+
+class MessageWriter(object):
+    """
+    Encodes messages with their length prepended as a 32-bit varint, like
+    encodeMessage, but writes them out buffer_size bytes at a time.
+    """
+    def __init__(self, out_file, buffer_size=1 << 20):
+        self.buffer_size = buffer_size
+        self._file = out_file
+        self._pieces = []
+        self._buffered = 0
+
+    def write(self, data):
+        """
+        Write raw bytes, e.g. the magic number of a trace.
+        """
+        self._pieces.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def encodeMessage(self, message):
+        out = message.SerializeToString()
+        self.write(_VarintBytes(len(out)))
+        self.write(out)
+
+    def flush(self):
+        self._file.write("".join(self._pieces))
+        self._pieces = []
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+class MessageIndex(object):
+    """
+    The message boundaries of a trace, found by a single scan, so that
+    ranges of messages can be decoded in parallel. Messages are grouped
+    in chunks of chunk_messages, and the index holds the offset in the
+    uncompressed trace and the number of messages of each chunk.
+
+    If a key field is given, e.g. tick, the index also holds the key of
+    the first message of each chunk. When the trace is sorted on the key,
+    as packet traces are on their tick, selectChunks() then finds the
+    chunks of a key range without decoding anything.
+    """
+    def __init__(self, offsets, counts, end, first_keys=None):
+        self.offsets = offsets
+        self.counts = counts
+        self.end = end
+        self.first_keys = first_keys
+        self.sorted = first_keys is not None and \
+            all(a <= b for a, b in zip(first_keys, first_keys[1:]))
+
+    @staticmethod
+    def scan(reader, message_type=None, key=None, chunk_messages=1 << 16):
+        """
+        Index the remaining messages of a MessageReader.
+        """
+        offsets = []
+        counts = []
+        first_keys = [] if key is not None else None
+        while 1:
+            offset = reader.tell()
+            if key is not None:
+                message = message_type()
+                if not reader.decodeMessage(message):
+                    break
+                first_keys.append(getattr(message, key))
+                count = 1
+            else:
+                count = 0
+            while count < chunk_messages and reader.skipMessage():
+                count += 1
+            if count == 0:
+                break
+            offsets.append(offset)
+            counts.append(count)
+            if count < chunk_messages:
+                break
+        return MessageIndex(offsets, counts, reader.tell(), first_keys)
+
+    def numMessages(self):
+        return sum(self.counts)
+
+    def selectChunks(self, key_range=None):
+        """
+        Return the range of chunks that may hold messages with a key in
+        key_range, as (first, last + 1).
+        """
+        if key_range is None or not self.sorted:
+            return (0, len(self.offsets))
+        lo, hi = key_range
+        first = max(bisect.bisect_right(self.first_keys, lo) - 1, 0)
+        last = bisect.bisect_right(self.first_keys, hi)
+        return (first, last)
+
+    def save(self, path, signature):
+        with open(path, 'w') as f:
+            json.dump({'signature': signature, 'offsets': self.offsets,
+                       'counts': self.counts, 'end': self.end,
+                       'first_keys': self.first_keys}, f)
+
+    @staticmethod
+    def load(path, signature):
+        """
+        Load an index saved for the same trace, or return None.
+        """
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if saved['signature'] != signature:
+            return None
+        return MessageIndex(saved['offsets'], saved['counts'], saved['end'],
+                            saved['first_keys'])
+
+def _traceSignature(in_file, key, chunk_messages):
+    st = os.stat(in_file)
+    return [os.path.abspath(in_file), st.st_size, st.st_mtime, key,
+            chunk_messages]
+
+def _uncompressedTrace(in_file, copy_path=None, reuse=False):
+    """
+    Return the path of an uncompressed copy of a trace, which can be
+    memory-mapped by every worker, and whether it is a temporary copy.
+    A gzipped trace is decompressed to copy_path if given, or else to a
+    temporary file. With reuse, an existing copy_path is used as is.
+    """
+    proto_in = openFileRd(in_file)
+    if not isinstance(proto_in, gzip.GzipFile):
+        proto_in.close()
+        return (in_file, False)
+
+    if copy_path is not None and reuse and os.path.exists(copy_path):
+        proto_in.close()
+        return (copy_path, False)
+
+    if copy_path is not None:
+        tmp = open(copy_path + '.tmp', 'wb')
+    else:
+        tmp = tempfile.NamedTemporaryFile(suffix='.trace', delete=False)
+    shutil.copyfileobj(proto_in, tmp, 1 << 24)
+    tmp.close()
+    proto_in.close()
+    if copy_path is None:
+        return (tmp.name, True)
+    # Only a complete copy is ever reused
+    os.rename(tmp.name, copy_path)
+    return (copy_path, False)
+
+def _decodeColumnRange(task):
+    """
+    Decode the messages between two offsets of an uncompressed trace into
+    columns. Runs in a worker process.
+    """
+    (path, start, end, module_name, type_name, columns, key, key_range,
+     csv_path) = task
+    message_type = getattr(__import__(module_name), type_name)
+    names = [name for name, _ in columns]
+    values = [[] for _ in names]
+
+    with open(path, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    pos = start
+    while pos < end:
+        size, pos = _DecodeVarint32At(buf, pos)
+        message = message_type()
+        message.ParseFromString(buf[pos:pos + size])
+        pos += size
+        if key_range is not None and \
+           not key_range[0] <= getattr(message, key) <= key_range[1]:
+            continue
+        for column, name in zip(values, names):
+            column.append(getattr(message, name))
+    buf.close()
+
+    if csv_path is not None:
+        with open(csv_path, 'w') as csv_out:
+            csv_out.write(','.join(names) + '\n')
+            for row in zip(*values):
+                csv_out.write(','.join(str(value) for value in row) + '\n')
+        return len(values[0])
+
+    import numpy
+    return [numpy.array(column, dtype=dtype)
+            for column, (_, dtype) in zip(values, columns)]
+
+def decodeColumns(in_file, header_type, message_type, columns, out_file,
+                  out_format, jobs=None, key=None, key_range=None,
+                  index_file=None, chunk_messages=1 << 16):
+    """
+    Decode the messages of a trace into columns, in parallel, without an
+    intermediate text dump. columns is a list of (field, numpy dtype).
+
+    The message boundaries are found by a single scan into a
+    MessageIndex, which is kept in index_file if given, and reused as
+    long as the trace does not change. Contiguous ranges of messages are
+    then decoded by a pool of jobs processes. Gzipped traces are first
+    decompressed to a file, which every process maps. With an index_file
+    that is <index_file>.trace, kept and reused along with the index, or
+    else a temporary file.
+
+    out_format is one of:
+      npz -- a NumPy .npz archive, with one array per column
+      npy -- a NumPy .npy structured array, with one field per column
+      csv -- CSV files with a header row, sharded per process, named
+             <out_file without .csv>.<shard>.csv
+
+    If key_range is given, only messages with key_range[0] <= key <=
+    key_range[1] are kept. When the trace is sorted on the key, only the
+    chunks that may hold such messages are decoded.
+
+    Return the decoded header and the number of messages kept.
+    """
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+
+    signature = _traceSignature(in_file, key, chunk_messages)
+    index = None
+    copy_path = None
+    if index_file is not None:
+        index = MessageIndex.load(index_file, signature)
+        copy_path = index_file + '.trace'
+
+    path, temporary = _uncompressedTrace(in_file, copy_path,
+                                         index is not None)
+    try:
+        reader = MessageReader(path)
+        if reader.read(4) != "gem5":
+            raise IOError("Unrecognized file %s" % in_file)
+        header = header_type()
+        reader.decodeMessage(header)
+
+        if index is None:
+            index = MessageIndex.scan(reader, message_type, key,
+                                      chunk_messages)
+            if index_file is not None:
+                index.save(index_file, signature)
+        reader.close()
+
+        # One contiguous range of chunks per process
+        first, last = index.selectChunks(key_range)
+        ends = index.offsets[1:] + [index.end]
+        num_chunks = last - first
+        num_tasks = max(min(jobs, num_chunks), 1)
+        csv_base = out_file[:-4] if out_file.endswith('.csv') else out_file
+        tasks = []
+        for i in range(num_tasks):
+            lo = first + num_chunks * i // num_tasks
+            hi = first + num_chunks * (i + 1) // num_tasks
+            start = index.offsets[lo] if lo < hi else index.end
+            end = ends[hi - 1] if lo < hi else index.end
+            csv_path = '%s.%d.csv' % (csv_base, i) \
+                if out_format == 'csv' else None
+            tasks.append((path, start, end, message_type.__module__,
+                          message_type.__name__, columns, key, key_range,
+                          csv_path))
+
+        pool = multiprocessing.Pool(num_tasks)
+        try:
+            results = pool.map(_decodeColumnRange, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        if temporary:
+            os.remove(path)
+
+    if out_format == 'csv':
+        return (header, sum(results))
+
+    import numpy
+    arrays = [numpy.concatenate([result[i] for result in results])
+              for i in range(len(columns))]
+    if out_format == 'npz':
+        numpy.savez(out_file, **dict((name, array) for (name, _), array
+                                     in zip(columns, arrays)))
+    elif out_format == 'npy':
+        table = numpy.empty(len(arrays[0]), dtype=columns)
+        for (name, _), array in zip(columns, arrays):
+            table[name] = array
+        numpy.save(out_file, table)
+    else:
+        raise ValueError("Unknown column format %s" % out_format)
+    return (header, len(arrays[0]))
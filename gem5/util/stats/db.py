@@ -26,7 +26,7 @@
 #
 # Authors: Nathan Binkert
 
-import MySQLdb, re, string
+import math, re, string
 
 def statcmp(a, b):
     v1 = a.split('.')
@@ -43,6 +43,37 @@ def statcmp(a, b):
     else:
         return cmp(len(v1), len(v2))
 
+# Column order that StatData expects, whatever order the table was
+# created in
+statcols = 'st_id,st_name,st_descr,st_type,st_print,st_prereq,st_prec,' \
+           'st_nozero,st_nonan,st_total,st_pdf,st_cdf,st_min,st_max,' \
+           'st_bktsize,st_size'
+
+# The identifiers a formula refers to at its top level, e.g. system and
+# sim_seconds in "system.cpu.numCycles / sim_seconds"
+formula_names = re.compile(r'(?<![\w.])([A-Za-z_]\w*)')
+
+# SQLite aggregate for the population standard deviation, which MySQL has
+# built in as stddev()
+class StdDev(object):
+    def __init__(self):
+        self.n = 0
+        self.sum = 0.0
+        self.squares = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.n += 1
+        self.sum += value
+        self.squares += value * value
+
+    def finalize(self):
+        if not self.n:
+            return None
+        mean = self.sum / self.n
+        return math.sqrt(max(self.squares / self.n - mean * mean, 0.0))
+
 class RunData:
     def __init__(self, row):
         self.run = int(row[0])
@@ -121,12 +152,18 @@ class Result(object):
 
 class Database(object):
     def __init__(self):
+        self.backend = 'mysql'
         self.host = 'zizzer.pool'
         self.user = ''
         self.passwd = ''
         self.db = 'm5stats'
         self.cursor = None
 
+        # Only the runs are read on connect(), stats are loaded the first
+        # time they are looked up, by name or by id
+        self.statNames = None
+        self.loadedTops = set()
+
         self.allStats = []
         self.allStatIds = {}
         self.allStatNames = {}
@@ -147,7 +184,6 @@ class Database(object):
         self.runs = None
         self.ticks = None
         self.method = 'sum'
-        self._method = type(self).sum
 
     def get(self, job, stat, system=None):
         run = self.allRunNames.get(str(job), None)
@@ -174,6 +210,7 @@ class Database(object):
         self.cursor.execute(sql)
 
     def update_dict(self, dict):
+        self.loadAllStats()
         dict.update(self.stattop)
 
     def append(self, stat):
@@ -199,43 +236,105 @@ class Database(object):
 
     def connect(self):
         # connect
-        self.thedb = MySQLdb.connect(db=self.db,
-                                     host=self.host,
-                                     user=self.user,
-                                     passwd=self.passwd)
+        if self.backend == 'sqlite':
+            import sqlite3
+            self.thedb = sqlite3.connect(self.db)
+            self.thedb.create_aggregate('stddev', 1, StdDev)
+        else:
+            import MySQLdb
+            self.thedb = MySQLdb.connect(db=self.db,
+                                         host=self.host,
+                                         user=self.user,
+                                         passwd=self.passwd)
 
         # create a cursor
         self.cursor = self.thedb.cursor()
 
-        self.query('''select rn_id,rn_name,rn_sample,rn_user,rn_project
-                   from runs''')
+        self.query('select rn_id,rn_name,rn_user,rn_project from runs')
         for result in self.cursor.fetchall():
             run = RunData(result);
             self.allRuns.append(run)
             self.allRunIds[run.run] = run
             self.allRunNames[run.name] = run
 
-        self.query('select sd_stat,sd_x,sd_y,sd_name,sd_descr from subdata')
-        for result in self.cursor.fetchall():
-            subdata = SubData(result)
-            if self.allSubData.has_key(subdata.stat):
-                self.allSubData[subdata.stat].append(subdata)
-            else:
-                self.allSubData[subdata.stat] = [ subdata ]
-
-        self.query('select * from formulas')
-        for id,formula in self.cursor.fetchall():
-            self.allFormulas[int(id)] = formula.tostring()
-
-        StatData.db = self
-        self.query('select * from stats')
+    # Name: loadStatNames
+    # Desc: Reads the name and id of every stat, but none of their
+    #       definitions, and groups the ids by top level name
+    def loadStatNames(self):
+        if self.statNames is not None:
+            return self.statNames
+
+        self.statNames = {}
+        self.statTops = {}
+        self.query('select st_id,st_name from stats')
+        for id,name in self.cursor.fetchall():
+            id = int(id)
+            self.statNames[name] = id
+            top = re.sub(':', '__', name).split('.')[0]
+            self.statTops.setdefault(top, []).append(id)
+        return self.statNames
+
+    # Name: topStatIds
+    # Desc: The ids of the stats under the given top level names, which
+    #       have not been loaded yet
+    def topStatIds(self, tops):
+        self.loadStatNames()
+        ids = []
+        for top in tops:
+            if top in self.loadedTops:
+                continue
+            self.loadedTops.add(top)
+            ids.extend(self.statTops.get(top, []))
+        return ids
+
+    # Name: loadStats
+    # Desc: Loads the definitions of the given stats, along with the
+    #       stats that their formulas refer to, so that the formulas can
+    #       be evaluated in stattop
+    def loadStats(self, ids):
         import info
-        for result in self.cursor.fetchall():
-            stat = info.NewStat(self, StatData(result))
-            self.append(stat)
-            self.allStats.append(stat)
-            self.allStatIds[stat.stat] = stat
-            self.allStatNames[stat.name] = stat
+        StatData.db = self
+
+        ids = [ id for id in set(ids) if id not in self.allStatIds ]
+        while ids:
+            tops = set()
+            for i in xrange(0, len(ids), 500):
+                chunk = ids[i:i+500]
+                where = 'in (%s)' % ','.join([ str(id) for id in chunk ])
+
+                self.query('select sd_stat,sd_x,sd_y,sd_name,sd_descr '
+                           'from subdata where sd_stat %s' % where)
+                for result in self.cursor.fetchall():
+                    subdata = SubData(result)
+                    subdatas = self.allSubData.setdefault(subdata.stat, [])
+                    subdatas.append(subdata)
+
+                self.query('select fm_stat,fm_formula from formulas '
+                           'where fm_stat %s' % where)
+                for id,formula in self.cursor.fetchall():
+                    if hasattr(formula, 'tostring'):
+                        formula = formula.tostring()
+                    self.allFormulas[int(id)] = str(formula)
+
+                self.query('select %s from stats where st_id %s' %
+                           (statcols, where))
+                for result in self.cursor.fetchall():
+                    stat = info.NewStat(self, StatData(result))
+                    self.append(stat)
+                    self.allStats.append(stat)
+                    self.allStatIds[stat.stat] = stat
+                    self.allStatNames[stat.name] = stat
+                    if stat.type == 'FORMULA':
+                        formula = re.sub(':', '__', stat.formula)
+                        tops.update(formula_names.findall(formula))
+
+            ids = [ id for id in self.topStatIds(tops)
+                    if id not in self.allStatIds ]
+
+        self.allStats.sort(key=lambda stat: stat.stat)
+
+    def loadAllStats(self):
+        self.loadStats(self.loadStatNames().values())
 
     # Name: listruns
     # Desc: Prints all runs matching a given user, if no argument
@@ -298,6 +397,7 @@ class Database(object):
         if regex != None:
             rx = re.compile(regex)
 
+        self.loadAllStats()
         stats = [ stat.name for stat in self.allStats ]
         stats.sort(statcmp)
         for stat in stats:
@@ -317,6 +417,7 @@ class Database(object):
         if regex != None:
             rx = re.compile(regex)
 
+        self.loadAllStats()
         stats = [ stat.name for stat in self.allStats ]
         stats.sort(statcmp)
         for stat in stats:
@@ -331,19 +432,22 @@ class Database(object):
         ret = []
         for stat in stats:
             if type(stat) is int:
+                self.loadStats([ stat ])
                 ret.append(self.allStatIds[stat])
 
             if type(stat) is str:
                 rx = re.compile(stat)
-                for stat in self.allStats:
-                    if rx.match(stat.name):
-                        ret.append(stat)
+                ids = [ id for name,id in self.loadStatNames().iteritems()
+                        if rx.match(name) ]
+                self.loadStats(ids)
+                for id in sorted(ids):
+                    ret.append(self.allStatIds[id])
         return ret
 
     #########################################
     # get the data
     #
-    def query(self, op, stat, ticks, group=False):
+    def dataQuery(self, op, stat, ticks, group=False):
         sql = 'select '
         sql += 'dt_stat as stat, '
         sql += 'dt_run as run, '
@@ -355,19 +459,22 @@ class Database(object):
         sql += 'from data '
         sql += 'where '
 
+        # Lists of values are matched with in (), rather than or-ing
+        # comparisons, so that the (stat, ...) and (run, stat, tick)
+        # indexes of the data table are used
         if isinstance(stat, list):
-            val = ' or '.join([ 'dt_stat=%d' % s.stat for s in stat ])
-            sql += ' (%s)' % val
+            val = ','.join([ '%d' % s.stat for s in stat ])
+            sql += ' dt_stat in (%s)' % val
         else:
             sql += ' dt_stat=%d' % stat.stat
 
         if self.runs != None and len(self.runs):
-            val = ' or '.join([ 'dt_run=%d' % r for r in self.runs ])
-            sql += ' and (%s)' % val
+            val = ','.join([ '%d' % r for r in self.runs ])
+            sql += ' and dt_run in (%s)' % val
 
         if ticks != None and len(ticks):
-            val = ' or '.join([ 'dt_tick=%d' % s for s in ticks ])
-            sql += ' and (%s)' % val
+            val = ','.join([ '%d' % s for s in ticks ])
+            sql += ' and dt_tick in (%s)' % val
 
         sql += ' group by dt_stat,dt_run,dt_x,dt_y'
         if group:
@@ -377,18 +484,18 @@ class Database(object):
     # Name: sum
     # Desc: given a run, a stat and an array of samples, total the samples
     def sum(self, *args, **kwargs):
-        return self.query('sum', *args, **kwargs)
+        return self.dataQuery('sum', *args, **kwargs)
 
     # Name: avg
     # Desc: given a run, a stat and an array of samples, average the samples
-    def avg(self, stat, ticks):
-        return self.query('avg', *args, **kwargs)
+    def avg(self, *args, **kwargs):
+        return self.dataQuery('avg', *args, **kwargs)
 
     # Name: stdev
     # Desc: given a run, a stat and an array of samples, get the standard
     #       deviation
-    def stdev(self, stat, ticks):
-        return self.query('stddev', *args, **kwargs)
+    def stdev(self, *args, **kwargs):
+        return self.dataQuery('stddev', *args, **kwargs)
 
     def __setattr__(self, attr, value):
         super(Database, self).__setattr__(attr, value)
@@ -407,7 +514,7 @@ class Database(object):
     def data(self, stat, ticks=None):
         if ticks is None:
             ticks = self.ticks
-        sql = self._method(self, stat, ticks)
+        sql = self._method(stat, ticks)
         self.query(sql)
 
         runs = {}
@@ -433,4 +540,5 @@ class Database(object):
         return results
 
     def __getitem__(self, key):
+        self.loadStats(self.topStatIds([ key ]))
         return self.stattop[key]
@@ -26,7 +26,7 @@
 #
 # Authors: Nathan Binkert
 
-import MySQLdb
+import os
 
 class MyDB(object):
     def __init__(self, options):
@@ -38,12 +38,14 @@ class MyDB(object):
         self.cursor = None
 
     def admin(self):
+        import MySQLdb
         self.close()
         self.mydb = MySQLdb.connect(db='mysql', host=self.host, user=self.user,
                                     passwd=self.passwd)
         self.cursor = self.mydb.cursor()
 
     def connect(self):
+        import MySQLdb
         self.close()
         self.mydb = MySQLdb.connect(db=self.name, host=self.host,
                                     user=self.user, passwd=self.passwd)
@@ -383,3 +385,319 @@ class MyDB(object):
         FROM event_names
         LEFT JOIN events ON en_id=ev_event
         WHERE ev_event IS NULL''')
+
+# Name: parseStats
+# Desc: Parses a stats.txt into a list of dumps, one per "Begin Simulation
+#       Statistics" block.  Each dump is a list of (name, subname, value,
+#       descr), where subname is what follows :: in the name of vector and
+#       distribution entries, or '' for scalars.  NaN values are dropped,
+#       since they cannot be stored.
+def parseStats(path):
+    dumps = []
+    stats = None
+    for line in open(path):
+        if line.startswith('---------- Begin Simulation Statistics'):
+            stats = []
+            dumps.append(stats)
+            continue
+        if line.startswith('---------- End Simulation Statistics'):
+            stats = None
+            continue
+        if stats is None:
+            continue
+
+        line, sep, descr = line.partition('#')
+        fields = line.split()
+        if len(fields) < 2:
+            continue
+        try:
+            value = float(fields[1])
+        except ValueError:
+            continue
+        if value != value:
+            continue
+
+        name, sep, subname = fields[0].partition('::')
+        stats.append((name, subname, value, descr.strip()))
+    return dumps
+
+def parseRun(rundir):
+    return rundir, parseStats(os.path.join(rundir, 'stats.txt'))
+
+class SQLiteDB(object):
+    # Rows per executemany() when ingesting
+    batch = 10000
+
+    def __init__(self, options):
+        self.name = options.db
+        self.user = options.user
+        self.mydb = None
+        self.cursor = None
+
+    # There is no server to administer, the database is the file
+    def admin(self):
+        self.close()
+
+    def connect(self):
+        import sqlite3
+        self.close()
+        self.mydb = sqlite3.connect(self.name)
+        self.cursor = self.mydb.cursor()
+        self.query('PRAGMA journal_mode=WAL')
+        self.query('PRAGMA synchronous=NORMAL')
+
+    def close(self):
+        if self.mydb is not None:
+            self.mydb.commit()
+            self.mydb.close()
+            self.mydb = None
+        self.cursor = None
+
+    def query(self, sql, args=()):
+        self.cursor.execute(sql, args)
+
+    def drop(self):
+        for path in (self.name, self.name + '-wal', self.name + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def create(self):
+        pass
+
+    # The same tables as MyDB.populate(), which documents the columns.
+    # On top of those, the data table is indexed on (run, stat, tick), for
+    # queries on the samples of a run.  Its unique index already starts
+    # with the stat, and the new index with the run, so they are not
+    # indexed on their own.
+    def populate(self):
+        self.query('''
+        CREATE TABLE runs(
+            rn_id	INTEGER		PRIMARY KEY AUTOINCREMENT,
+            rn_name	TEXT		NOT NULL,
+            rn_sample	TEXT		NOT NULL DEFAULT '',
+            rn_user	TEXT		NOT NULL,
+            rn_project	TEXT		NOT NULL,
+            rn_date	TIMESTAMP	NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            rn_expire	TIMESTAMP	NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (rn_name,rn_sample)
+        )''')
+
+        self.query('''
+        CREATE TABLE stats(
+            st_id	INTEGER		PRIMARY KEY AUTOINCREMENT,
+            st_name	TEXT		NOT NULL,
+            st_descr	TEXT		NOT NULL,
+            st_type	TEXT		NOT NULL CHECK (st_type IN
+                ("SCALAR", "VECTOR", "DIST", "VECTORDIST", "VECTOR2D",
+                 "FORMULA")),
+            st_print	BOOL		NOT NULL,
+            st_prereq	INTEGER		NOT NULL,
+            st_prec	INTEGER		NOT NULL,
+            st_nozero	BOOL		NOT NULL,
+            st_nonan	BOOL		NOT NULL,
+            st_total	BOOL		NOT NULL,
+            st_pdf	BOOL		NOT NULL,
+            st_cdf	BOOL		NOT NULL,
+            st_min	DOUBLE		NOT NULL,
+            st_max	DOUBLE		NOT NULL,
+            st_bktsize	DOUBLE		NOT NULL,
+            st_size	INTEGER		NOT NULL,
+            UNIQUE (st_name)
+        )''')
+
+        self.query('''
+        CREATE TABLE data(
+            dt_stat	INTEGER		NOT NULL,
+            dt_x	INTEGER		NOT NULL,
+            dt_y	INTEGER		NOT NULL,
+            dt_run	INTEGER		NOT NULL,
+            dt_tick	INTEGER		NOT NULL,
+            dt_data	DOUBLE		NOT NULL,
+            UNIQUE (dt_stat,dt_x,dt_y,dt_run,dt_tick)
+        )''')
+        self.query('CREATE INDEX data_run ON data (dt_run,dt_stat,dt_tick)')
+
+        self.query('''
+        CREATE TABLE subdata(
+            sd_stat	INTEGER		NOT NULL,
+            sd_x	INTEGER		NOT NULL,
+            sd_y	INTEGER		NOT NULL,
+            sd_name	TEXT		NOT NULL,
+            sd_descr	TEXT,
+            UNIQUE (sd_stat,sd_x,sd_y)
+        )''')
+
+        self.query('''
+        CREATE TABLE formulas(
+            fm_stat	INTEGER		NOT NULL PRIMARY KEY,
+            fm_formula	BLOB		NOT NULL
+        )''')
+
+        self.query('''
+        CREATE TABLE formula_ref(
+            fr_stat	INTEGER		NOT NULL,
+            fr_run	INTEGER		NOT NULL,
+            UNIQUE (fr_stat,fr_run)
+        )''')
+        self.query('CREATE INDEX formula_ref_run ON formula_ref (fr_run)')
+
+        self.query('''
+        CREATE TABLE events(
+            ev_event	INTEGER		NOT NULL,
+            ev_run	INTEGER		NOT NULL,
+            ev_tick	INTEGER		NOT NULL,
+            UNIQUE(ev_event,ev_run,ev_tick)
+        )''')
+        self.query('CREATE INDEX events_run ON events (ev_run)')
+        self.query('CREATE INDEX events_tick ON events (ev_tick)')
+
+        self.query('''
+        CREATE TABLE event_names(
+            en_id	INTEGER		PRIMARY KEY AUTOINCREMENT,
+            en_name	TEXT		NOT NULL,
+            UNIQUE (en_name)
+        )''')
+        self.mydb.commit()
+
+    # SQLite has no DELETE ... JOIN, so the same cleanup as MyDB.clean()
+    # is done with subqueries
+    def clean(self):
+        self.query('''
+        DELETE FROM data
+        WHERE dt_run NOT IN (SELECT rn_id FROM runs)''')
+
+        self.query('''
+        DELETE FROM formula_ref
+        WHERE fr_run NOT IN (SELECT rn_id FROM runs)''')
+
+        self.query('''
+        DELETE FROM formulas
+        WHERE fm_stat NOT IN (SELECT fr_stat FROM formula_ref)''')
+
+        self.query('''
+        DELETE FROM stats
+        WHERE st_id NOT IN (SELECT DISTINCT dt_stat FROM data)''')
+
+        self.query('''
+        DELETE FROM subdata
+        WHERE sd_stat NOT IN (SELECT DISTINCT dt_stat FROM data)''')
+
+        self.query('''
+        DELETE FROM events
+        WHERE ev_run NOT IN (SELECT rn_id FROM runs)''')
+
+        self.query('''
+        DELETE FROM event_names
+        WHERE en_id NOT IN (SELECT DISTINCT ev_event FROM events)''')
+        self.mydb.commit()
+
+    # Name: ingest
+    # Desc: Adds every directory under paths that holds a stats.txt as a
+    #       run, named after the directory.  The files are parsed by a
+    #       pool of jobs processes, and the rows of each run are inserted
+    #       in batches, in a transaction of its own.  A run that is
+    #       already in the database is replaced.
+    def ingest(self, paths, jobs=None, project=''):
+        import multiprocessing
+
+        rundirs = []
+        for path in paths:
+            for dirpath, dirnames, filenames in os.walk(path):
+                if 'stats.txt' in filenames:
+                    rundirs.append(os.path.normpath(dirpath))
+        rundirs.sort()
+
+        # Stat ids by name, and the x of each subname by stat id
+        self.statIds = {}
+        self.query('select st_id,st_name from stats')
+        for id,name in self.cursor.fetchall():
+            self.statIds[name] = id
+        self.subnames = {}
+        self.query('select sd_stat,sd_x,sd_name from subdata where sd_y=0')
+        for id,x,name in self.cursor.fetchall():
+            self.subnames.setdefault(id, {})[name] = x
+        for id in self.statIds.itervalues():
+            if id not in self.subnames:
+                self.subnames[id] = { '' : 0 }
+
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for rundir,dumps in pool.imap_unordered(parseRun, rundirs):
+                self.ingestRun(rundir, dumps, project)
+                self.mydb.commit()
+                print 'ingested %s (%d samples)' % (rundir, len(dumps))
+        finally:
+            pool.close()
+            pool.join()
+
+        return len(rundirs)
+
+    def ingestRun(self, name, dumps, project):
+        self.query('select rn_id from runs where rn_name=? and rn_sample=?',
+                   (name, ''))
+        for id, in self.cursor.fetchall():
+            self.query('delete from data where dt_run=?', (id,))
+            self.query('delete from runs where rn_id=?', (id,))
+
+        self.query('''insert into runs (rn_name,rn_user,rn_project)
+                   values (?,?,?)''', (name, self.user, project))
+        run = self.cursor.lastrowid
+
+        rows = []
+        for sample,stats in enumerate(dumps):
+            tick = sample
+            for statname,subname,value,descr in stats:
+                if statname == 'final_tick' and not subname:
+                    tick = int(value)
+                    break
+
+            for statname,subname,value,descr in stats:
+                stat = self.statId(statname, subname, descr)
+                rows.append((stat, self.subnameX(stat, subname), run, tick,
+                             value))
+                if len(rows) >= self.batch:
+                    self.insertData(rows)
+                    rows = []
+        self.insertData(rows)
+
+    def insertData(self, rows):
+        self.cursor.executemany('''insert or replace into data
+                                (dt_stat,dt_x,dt_y,dt_run,dt_tick,dt_data)
+                                values (?,?,0,?,?,?)''', rows)
+
+    # A stat is a SCALAR when it is first seen without a subname, and a
+    # VECTOR otherwise.  Distributions are kept as vectors of their
+    # entries, e.g. samples, mean and each bucket, since stats.txt does
+    # not give their parameters.
+    def statId(self, name, subname, descr):
+        id = self.statIds.get(name)
+        if id is not None:
+            return id
+
+        if subname:
+            type = 'VECTOR'
+        else:
+            type = 'SCALAR'
+        self.query('''insert into stats (st_name,st_descr,st_type,st_print,
+                   st_prereq,st_prec,st_nozero,st_nonan,st_total,st_pdf,
+                   st_cdf,st_min,st_max,st_bktsize,st_size)
+                   values (?,?,?,1,0,6,0,0,0,0,0,0,0,0,0)''',
+                   (name, descr, type))
+        id = self.cursor.lastrowid
+        self.statIds[name] = id
+        return id
+
+    # Entries get an x in the order they are first seen, which is their
+    # index for vectors, as stats.txt lists vectors in order
+    def subnameX(self, stat, subname):
+        subnames = self.subnames.setdefault(stat, {})
+        x = subnames.get(subname)
+        if x is not None:
+            return x
+
+        x = len(subnames)
+        subnames[subname] = x
+        if subname:
+            self.query('''insert into subdata (sd_stat,sd_x,sd_y,sd_name)
+                       values (?,?,0,?)''', (stat, x, subname))
+        return x
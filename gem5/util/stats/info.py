@@ -29,6 +29,19 @@
 from __future__ import division
 import operator, re, types
 
+# With NumPy, vectors and formulas are evaluated as masked arrays with a
+# row per run, rather than an element and a run at a time.  Missing values
+# are masked in the arrays, and None everywhere else.  Unless some value is
+# a float, the arrays hold Python integers, so that they give exactly what
+# the scalar path does, even above 2**53.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Operators for which a zero divisor gives None, rather than an error
+divops = ( operator.__div__, operator.__truediv__, operator.__floordiv__ )
+
 class ProxyError(Exception):
     pass
 
@@ -52,8 +65,41 @@ def value(stat, *args):
     stat = unproxy(stat)
     return stat.__value__(*args)
 
+# Name: arrayvalue
+# Desc: The values of stat for each of runs, as an array with a row per
+#       run, which is a single value for scalars
+def arrayvalue(stat, runs):
+    stat = unproxy(stat)
+    return stat.__arrayvalue__(runs)
+
+# Name: makearray
+# Desc: A masked array of values, which are nested lists with None for the
+#       missing values.  Integers stay Python integers, in an object array,
+#       unless some value is a float.
+def makearray(vals):
+    data = numpy.array(vals, dtype=object)
+    mask = numpy.frompyfunc(lambda val: val is None, 1, 1)(data)
+    mask = numpy.asarray(mask, dtype=bool)
+    data[mask] = 0
+    for val in data.flat:
+        if not isinstance(val, (int, long)):
+            data = data.astype(float)
+            break
+    return numpy.ma.array(data, mask=mask)
+
+# Name: rowvalues
+# Desc: The values of each row of an array from arrayvalue(), or None for
+#       the rows that are missing some of them
+def rowvalues(array):
+    data = numpy.ma.getdata(array).tolist()
+    mask = numpy.ma.getmaskarray(array)
+    return [ None if mask[i].any() else row for i,row in enumerate(data) ]
+
 def values(stat, run):
     stat = unproxy(stat)
+    if numpy is not None:
+        return rowvalues(arrayvalue(stat, [ run ]))[0]
+
     result = []
     for i in xrange(len(stat)):
         val = value(stat, run, i)
@@ -65,6 +111,35 @@ def values(stat, run):
 def total(stat, run):
     return sum(values(stat, run))
 
+# Name: runvalues
+# Desc: value() of a scalar, or values() of a vector, for each of runs,
+#       evaluated in one pass over the runs when NumPy is available
+def runvalues(stat, runs):
+    stat = unproxy(stat)
+    if numpy is None:
+        if scalar(stat):
+            return [ value(stat, run) for run in runs ]
+        return [ values(stat, run) for run in runs ]
+
+    return rowvalues(arrayvalue(stat, runs))
+
+# Name: runtotals
+# Desc: total() of a vector for each of runs, or None for the runs that
+#       are missing some of its values
+def runtotals(stat, runs):
+    stat = unproxy(stat)
+    if numpy is None:
+        result = []
+        for run in runs:
+            vals = values(stat, run)
+            if vals is not None:
+                vals = sum(vals)
+            result.append(vals)
+        return result
+
+    return [ None if vals is None else sum(vals)
+             for vals in rowvalues(arrayvalue(stat, runs)) ]
+
 def len(stat):
     stat = unproxy(stat)
     return stat.__len__()
@@ -118,6 +193,9 @@ class Scalar(Value):
     def __value__(self, run):
         raise AttributeError, '__value__ must be defined'
 
+    def __arrayvalue__(self, runs):
+        return makearray([ value(self, run) for run in runs ])
+
 class VectorItemProxy(Value):
     def __init__(self, proxy, index):
         self.proxy = proxy
@@ -132,6 +210,9 @@ class VectorItemProxy(Value):
     def __value__(self, run):
         return value(self.proxy, run, self.index)
 
+    def __arrayvalue__(self, runs):
+        return arrayvalue(self.proxy, runs)[:, self.index]
+
 class Vector(Value):
     def __scalar__(self):
         return False
@@ -142,6 +223,10 @@ class Vector(Value):
     def __value__(self, run, index):
         raise AttributeError, '__value__ must be defined'
 
+    def __arrayvalue__(self, runs):
+        return makearray([ [ value(self, run, i) for i in xrange(len(self)) ]
+                           for run in runs ])
+
     def __getitem__(self, index):
         return VectorItemProxy(self, index)
 
@@ -150,6 +235,8 @@ class ScalarConstant(Scalar):
         self.constant = constant
     def __value__(self, run):
         return self.constant
+    def __arrayvalue__(self, runs):
+        return makearray([ self.constant ] * len(runs))
     def __str__(self):
         return str(self.constant)
 
@@ -158,6 +245,8 @@ class VectorConstant(Vector):
         self.constant = constant
     def __value__(self, run, index):
         return self.constant[index]
+    def __arrayvalue__(self, runs):
+        return makearray([ list(self.constant) ] * len(runs))
     def __len__(self):
         return len(self.constant)
     def __str__(self):
@@ -230,6 +319,11 @@ class UnaryProxy(ValueProxy):
             return None
         return self.op(val)
 
+    def __arrayvalue__(self, runs):
+        val = arrayvalue(self.arg, runs)
+        return numpy.ma.array(self.op(numpy.ma.getdata(val)),
+                              mask=numpy.ma.getmaskarray(val))
+
     def __vectorlen__(self):
         return len(unproxy(self.arg))
 
@@ -282,6 +376,29 @@ class BinaryProxy(ValueProxy):
         except ZeroDivisionError:
             return None
 
+    # A scalar operand is a column, and is broadcast across the entries of
+    # a vector one.  Dividing by zero masks the result, like None above.
+    def __arrayvalue__(self, runs):
+        val0 = arrayvalue(self.arg0, runs)
+        val1 = arrayvalue(self.arg1, runs)
+        if vector(self):
+            self.__vectorlen__()
+            if scalar(self.arg0):
+                val0 = val0[:, numpy.newaxis]
+            if scalar(self.arg1):
+                val1 = val1[:, numpy.newaxis]
+
+        mask = numpy.ma.getmaskarray(val0) | numpy.ma.getmaskarray(val1)
+        val0 = numpy.ma.getdata(val0)
+        val1 = numpy.ma.getdata(val1)
+        if self.op in divops:
+            zero = numpy.asarray(val1 == 0, dtype=bool)
+            mask = mask | zero
+            val1 = numpy.where(zero, 1, val1)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            result = self.op(val0, val1)
+        return numpy.ma.array(result, mask=mask)
+
     def __vectorlen__(self):
         if vector(self.arg0) and scalar(self.arg1):
             return len(self.arg0)
@@ -373,6 +490,11 @@ class ScalarStat(Statistic,Scalar):
             return None
         return self.data[run][0][0]
 
+    def __arrayvalue__(self, runs):
+        data = self.data
+        return makearray([ data[run][0][0] if run in data else None
+                           for run in runs ])
+
     def display(self, run=None):
         import display
         p = display.Print()
@@ -390,6 +512,11 @@ class VectorStat(Statistic,Vector):
             return None
         return self.data[run][item][0]
 
+    def __arrayvalue__(self, runs):
+        data = self.data
+        return makearray([ [ item[0] for item in data[run] ] if run in data
+                           else [ None ] * self.x for run in runs ])
+
     def __len__(self):
         return self.x
 
@@ -405,7 +532,8 @@ class VectorStat(Statistic,Vector):
 
 class Formula(Value):
     def __getattribute__(self, attr):
-        if attr not in ( '__scalar__', '__vector__', '__value__', '__len__' ):
+        if attr not in ( '__scalar__', '__vector__', '__value__', '__len__',
+                         '__arrayvalue__' ):
             return super(Formula, self).__getattribute__(attr)
 
         formula = re.sub(':', '__', self.formula)
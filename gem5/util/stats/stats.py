@@ -33,8 +33,8 @@ import re, sys, math
 def usage():
     print '''\
 Usage: %s [-E] [-F] [ -G <get> ] [-d <db> ] [-g <graphdir> ] [-h <host>] [-p]
-       [-s <system>] [-r <runs> ] [-T <samples>] [-u <username>]
-       <command> [command args]
+       [-S <sqlite db>] [-s <system>] [-r <runs> ] [-T <samples>]
+       [-u <username>] <command> [command args]
 
        commands    extra parameters   description
        ----------- ------------------ ---------------------------------------
@@ -47,6 +47,11 @@ Usage: %s [-E] [-F] [ -G <get> ] [-d <db> ] [-g <graphdir> ] [-h <host>] [-p]
        stats       [regex]            List all stats (only matching regex)
 
        database    <command>          Where command is drop, init, or clean
+       database    ingest [-n <jobs>] [-P <project>] <dir> [<dir> ...]
+                                      Add every directory holding a
+                                      stats.txt as a run (SQLite only)
+
+       -S uses an SQLite database file instead of a MySQL server.
 
 ''' % sys.argv[0]
     sys.exit(1)
@@ -68,7 +73,10 @@ def commands(options, command, args):
         if len(args) == 0: raise CommandException
 
         import dbinit
-        mydb = dbinit.MyDB(options)
+        if options.backend == 'sqlite':
+            mydb = dbinit.SQLiteDB(options)
+        else:
+            mydb = dbinit.MyDB(options)
 
         if args[0] == 'drop':
             if len(args) > 2: raise CommandException
@@ -96,10 +104,28 @@ def commands(options, command, args):
             mydb.clean()
             return
 
+        if args[0] == 'ingest':
+            if options.backend != 'sqlite':
+                sys.exit('Only SQLite databases (-S) can ingest stats.txt')
+            jobs = None
+            project = ''
+            opts, args = getopts(args[1:], '-n:P:')
+            if len(args) == 0: raise CommandException
+            for o,a in opts:
+                if o == '-n':
+                    jobs = int(a)
+                if o == '-P':
+                    project = a
+            mydb.connect()
+            mydb.ingest(args, jobs, project)
+            mydb.close()
+            return
+
         raise CommandException
 
     import db
     source = db.Database()
+    source.backend = options.backend
     source.host = options.host
     source.db = options.db
     source.passwd = options.passwd
@@ -414,6 +440,7 @@ if __name__ == '__main__':
     import getpass
 
     options = Options()
+    options.backend = 'mysql'
     options.host = None
     options.db = None
     options.passwd = ''
@@ -428,7 +455,7 @@ if __name__ == '__main__':
     options.jobfile = None
     options.all = False
 
-    opts, args = getopts(sys.argv[1:], '-EFJad:g:h:j:m:pr:s:u:T:')
+    opts, args = getopts(sys.argv[1:], '-EFJad:g:h:j:m:pr:S:s:u:T:')
     for o,a in opts:
         if o == '-E':
             options.printmode = 'E'
@@ -453,6 +480,9 @@ if __name__ == '__main__':
             options.passwd = getpass.getpass()
         if o == '-r':
             options.runs = a
+        if o == '-S':
+            options.backend = 'sqlite'
+            options.db = a
         if o == '-u':
             options.user = a
         if o == '-s':
@@ -468,7 +498,7 @@ if __name__ == '__main__':
         if not options.db:
             options.db = options.jobfile.statdb
 
-    if not options.host:
+    if not options.host and options.backend != 'sqlite':
         sys.exit('Database server must be provided from a jobfile or -h')
 
     if not options.db: